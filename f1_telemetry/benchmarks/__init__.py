@@ -0,0 +1 @@
+"""Benchmarks for the F1 telemetry parsers and ingest pipeline."""
@@ -0,0 +1,126 @@
+"""Compare the threaded and the asyncio ingest end to end.
+
+A synthetic 22-car grid is sent over loopback to either the threaded
+IngestPipeline with BufferedMongoWriter or the asyncio ingest with
+AsyncBufferedWriter. Both write to an in-memory database whose bulk calls
+take ``--latency`` milliseconds, standing in for the round trip to MongoDB.
+
+    python -m f1_telemetry.benchmarks.ingest --rate 0 --seconds 5 --latency 5
+"""
+import argparse
+import asyncio
+import socket
+import time
+from f1_telemetry.benchmarks.memory_db import (
+    AsyncMemoryCollection,
+    MemoryCollection,
+    MemoryDatabase,
+)
+from f1_telemetry.benchmarks.synthetic import grid_frame
+from f1_telemetry.data.async_ingest import serve
+from f1_telemetry.data.mongodb_ingest import BufferedMongoWriter, store_packet
+from f1_telemetry.data.pipeline import IngestPipeline
+from f1_telemetry.data.udp_stream import create_udp_socket
+
+
+def send_grid(address: tuple, rate: float, seconds: float) -> int:
+    """Send synthetic grid frames to an address.
+
+    Returns:
+        int: Number of packets sent.
+    """
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    frames = [grid_frame(frame) for frame in range(300)]
+    sent = 0
+    frame = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for packet in frames[frame % len(frames)]:
+            sender.sendto(packet, address)
+            sent += 1
+        frame += 1
+        if rate:
+            delay = start + frame / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    sender.close()
+    return sent
+
+
+def run_threaded(rate: float, seconds: float, latency: float, flush_size: int) -> dict:
+    """Run the threaded pipeline against a synthetic grid."""
+    database = MemoryDatabase(MemoryCollection, latency)
+    udp_socket = create_udp_socket("127.0.0.1", 0)
+    with BufferedMongoWriter(database, flush_size=flush_size) as writer:
+        pipeline = IngestPipeline(
+            lambda data: store_packet(writer, data),
+            on_idle=writer.flush_if_due,
+            udp_socket=udp_socket,
+        )
+        pipeline.start()
+        start = time.perf_counter()
+        sent = send_grid(udp_socket.getsockname(), rate, seconds)
+        time.sleep(0.5)
+        pipeline.stop()
+    elapsed = time.perf_counter() - start
+    udp_socket.close()
+    return {
+        "sent": sent,
+        "received": pipeline.stats()["received"],
+        "stored": database.documents,
+        "seconds": elapsed,
+    }
+
+
+def run_asyncio(rate: float, seconds: float, latency: float, flush_size: int) -> dict:
+    """Run the asyncio ingest against a synthetic grid."""
+    database = MemoryDatabase(AsyncMemoryCollection, latency)
+    probe = create_udp_socket("127.0.0.1", 0)
+    port = probe.getsockname()[1]
+    probe.close()
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        ingest = asyncio.ensure_future(
+            serve(database, [port], "127.0.0.1", stop, flush_size=flush_size)
+        )
+        await asyncio.sleep(0.1)
+        start = time.perf_counter()
+        sent = await loop.run_in_executor(
+            None, send_grid, ("127.0.0.1", port), rate, seconds
+        )
+        await asyncio.sleep(0.5)
+        stop.set()
+        stats = await ingest
+        return sent, stats, time.perf_counter() - start
+
+    sent, stats, elapsed = asyncio.run(main())
+    return {
+        "sent": sent,
+        "received": stats["ports"][port]["received"],
+        "stored": database.documents,
+        "seconds": elapsed,
+    }
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument("--rate", type=float, default=0)
+    argument_parser.add_argument("--seconds", type=float, default=5)
+    argument_parser.add_argument(
+        "--latency", type=float, default=5, help="Milliseconds per bulk call."
+    )
+    argument_parser.add_argument("--flush-size", type=int, default=100)
+    args = argument_parser.parse_args()
+    for name, run in (("threaded", run_threaded), ("asyncio", run_asyncio)):
+        result = run(args.rate, args.seconds, args.latency / 1000, args.flush_size)
+        print(
+            f"{name:<10}sent={result['sent']:<8}received={result['received']:<8}"
+            f"stored={result['stored']:<8}"
+            f"{result['stored'] / result['seconds']:.0f} documents/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
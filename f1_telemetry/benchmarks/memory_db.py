@@ -0,0 +1,113 @@
+"""In-process stand-in for a MongoDB database in benchmarks.
+
+Collections count what they are sent and can sleep for every call to stand
+in for the round trip to a server. With ``encode`` the inserted documents
+are BSON encoded with the bson package that comes with pymongo, so the
+client-side serialization cost stays part of the measurement.
+"""
+import asyncio
+import time
+from collections import defaultdict
+
+try:
+    import bson
+except ImportError:
+    bson = None
+
+
+class MemoryCollection:
+    """Collection that counts documents and sleeps for every bulk call.
+
+    Args:
+        latency (float): Seconds every call takes.
+        encode (bool): BSON encode inserted documents, if bson is installed.
+
+    Attributes:
+        documents (int): Documents and operations received.
+        encoded_bytes (int): Size of the encoded documents.
+        calls (int): Write calls received.
+    """
+
+    def __init__(self, latency: float = 0.0, encode: bool = False):
+        self.latency = latency
+        self.encode = encode and bson is not None
+        self.documents = 0
+        self.encoded_bytes = 0
+        self.calls = 0
+        self.indexes = []
+
+    def _insert(self, documents) -> None:
+        self.calls += 1
+        self.documents += len(documents)
+        if self.encode:
+            self.encoded_bytes += sum(len(bson.encode(document)) for document in documents)
+
+    def insert_many(self, documents, ordered=True):
+        time.sleep(self.latency)
+        self._insert(documents)
+
+    def insert_one(self, document):
+        time.sleep(self.latency)
+        self._insert([document])
+
+    def bulk_write(self, operations, ordered=True):
+        time.sleep(self.latency)
+        self.calls += 1
+        self.documents += len(operations)
+
+    def create_index(self, keys, **options):
+        self.indexes.append((keys, options))
+
+
+class AsyncMemoryCollection(MemoryCollection):
+    """Awaitable variant of MemoryCollection."""
+
+    async def insert_many(self, documents, ordered=True):
+        await asyncio.sleep(self.latency)
+        self._insert(documents)
+
+    async def insert_one(self, document):
+        await asyncio.sleep(self.latency)
+        self._insert([document])
+
+    async def bulk_write(self, operations, ordered=True):
+        await asyncio.sleep(self.latency)
+        self.calls += 1
+        self.documents += len(operations)
+
+
+class MemoryDatabase:
+    """Database handing out memory collections by name.
+
+    Args:
+        collection_class (type): MemoryCollection or AsyncMemoryCollection.
+        latency (float): Seconds every collection call takes.
+        encode (bool): BSON encode inserted documents.
+    """
+
+    def __init__(
+        self,
+        collection_class=MemoryCollection,
+        latency: float = 0.0,
+        encode: bool = False,
+    ):
+        self.collections = defaultdict(lambda: collection_class(latency, encode))
+
+    def __getitem__(self, name: str):
+        return self.collections[name]
+
+    def list_collection_names(self) -> list:
+        return list(self.collections)
+
+    def create_collection(self, name: str, **options):
+        return self.collections[name]
+
+    @property
+    def documents(self) -> int:
+        return sum(collection.documents for collection in self.collections.values())
+
+    @property
+    def encoded_bytes(self) -> int:
+        return sum(
+            collection.encoded_bytes for collection in self.collections.values()
+        )
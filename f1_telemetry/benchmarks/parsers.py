@@ -0,0 +1,144 @@
+"""Microbenchmark for the per-packet decode cost of the struct parsers.
+
+Only the parser functions and packet format constants are used, so the same
+script can be run against older revisions to compare before and after.
+
+    python -m f1_telemetry.benchmarks.parsers
+    python -m f1_telemetry.benchmarks.parsers --columnar --json
+"""
+import argparse
+import json
+import random
+import struct
+import timeit
+import tracemalloc
+from f1_telemetry.data import struct_parsers
+
+PARSERS = {
+    "motion": ("parse_packet_motion_data", "PACKET_MOTION_DATA_FORMAT"),
+    "session": ("parse_packet_session_data", "packet_session_data_format"),
+    "lap": ("parse_packet_lap_data", "PACKET_LAP_DATA_FORMAT"),
+    "participants": (
+        "parse_packet_participants_data",
+        "PACKET_PARTICIPANTS_DATA_FORMAT",
+    ),
+    "car_setup": ("parse_packet_car_setup_data", "PACKET_CAR_SETUP_DATA_FORMAT"),
+    "car_telemetry": (
+        "parse_packet_car_telemetry_data",
+        "PACKET_CAR_TELEMETRY_DATA_FORMAT",
+    ),
+    "car_status": ("parse_packet_car_status_data", "PACKET_CAR_STATUS_DATA_FORMAT"),
+    "car_damage": ("parse_packet_car_damage_data", "PACKET_CAR_DAMAGE_DATA_FORMAT"),
+    "final_classification": (
+        "parse_packet_final_classification_data",
+        "PACKET_FINAL_CLASSIFICATION_DATA_FORMAT",
+    ),
+    "tyre_sets": ("parse_packet_tyre_sets_data", "PACKET_TYRE_SETS_DATA_FORMAT"),
+    "event": ("parse_packet_event_data", "PACKET_EVENT_DATA_FORMAT"),
+    "lobby_info": ("parse_packet_lobby_info_data", "PACKET_LOBBY_INFO_DATA_FORMAT"),
+    "session_history": (
+        "parse_packet_session_history_data",
+        "PACKET_SESSION_HISTORY_DATA_FORMAT",
+    ),
+    "motion_ex": ("parse_packet_motion_ex_data", "PACKET_MOTION_EX_DATA_FORMAT"),
+}
+
+
+COLUMNAR_PARSERS = {
+    name: (parser_name.replace("_data", "_columns"), format_name)
+    for name, (parser_name, format_name) in PARSERS.items()
+    if name in ("motion", "lap", "car_setup", "car_telemetry", "car_status", "car_damage")
+}
+
+
+def measure(parser, data: bytes, number: int, repeat: int) -> float:
+    """Measure the best per-call time of a parser.
+
+    Returns:
+        float: Nanoseconds per parsed packet.
+    """
+    timer = timeit.Timer(lambda: parser(data))
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def measure_allocations(parser, data: bytes, number: int) -> dict:
+    """Measure the memory allocated per call and kept by the result.
+
+    Returns:
+        dict: Allocated blocks and bytes per parsed packet.
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        results = [parser(data) for _ in range(number)]
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    differences = after.compare_to(before, "filename")
+    blocks = sum(difference.count_diff for difference in differences)
+    size = sum(difference.size_diff for difference in differences)
+    del results
+    return {"blocks_per_packet": blocks / number, "bytes_per_packet": size / number}
+
+
+def run(
+    number: int = 2000,
+    repeat: int = 5,
+    columnar: bool = False,
+    allocations: bool = False,
+    seed: int = None,
+) -> dict:
+    """Benchmark every packet parser on a zero filled or random packet.
+
+    Args:
+        number (int): Calls per timing run.
+        repeat (int): Timing runs, the best one is reported.
+        columnar (bool): Benchmark the columnar parsers instead.
+        allocations (bool): Also measure allocations with tracemalloc.
+        seed (int): Fill the packets with random bytes from this seed.
+
+    Returns:
+        dict: Packet name mapped to nanoseconds per packet, or to a dict
+        with ns_per_packet and the allocation counts.
+    """
+    results = {}
+    parsers = COLUMNAR_PARSERS if columnar else PARSERS
+    for name, (parser_name, format_name) in parsers.items():
+        parser = getattr(struct_parsers, parser_name)
+        size = struct.calcsize(getattr(struct_parsers, format_name))
+        if seed is None:
+            data = bytes(size)
+        else:
+            data = random.Random(seed).randbytes(size)
+        nanoseconds = measure(parser, data, number, repeat)
+        if allocations:
+            results[name] = {
+                "ns_per_packet": nanoseconds,
+                **measure_allocations(parser, data, number),
+            }
+        else:
+            results[name] = nanoseconds
+    return results
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument("--number", type=int, default=2000)
+    argument_parser.add_argument("--repeat", type=int, default=5)
+    argument_parser.add_argument("--columnar", action="store_true")
+    argument_parser.add_argument("--seed", type=int, default=None)
+    argument_parser.add_argument(
+        "--json", action="store_true", help="Print results with allocations as JSON."
+    )
+    args = argument_parser.parse_args()
+    if args.json:
+        results = run(args.number, args.repeat, args.columnar, True, args.seed)
+        print(json.dumps(results, indent=2))
+        return
+    results = run(args.number, args.repeat, args.columnar, seed=args.seed)
+    for name, nanoseconds in results.items():
+        print(f"{name:<22}{nanoseconds / 1000:>10.2f} us/packet")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Benchmark the UDP receive loop against a synthetic 22-car grid.
+
+Compares the previous ``recvfrom`` loop, which allocates a bytes object per
+datagram and unpacks the header separately, with the ``recvfrom_into``
+buffer pool loop used by the ingest. Packets are sent over loopback at a
+given frame rate (0 sends as fast as possible).
+
+    python -m f1_telemetry.benchmarks.receive --rate 60 --seconds 5
+    python -m f1_telemetry.benchmarks.receive --rate 0 --seconds 5
+"""
+import argparse
+import socket
+import threading
+import time
+from f1_telemetry.benchmarks.synthetic import grid_frame
+from f1_telemetry.data.struct_parsers import parse_packet_header
+from f1_telemetry.data.udp_stream import BufferPool, PACKET_PARSERS, parse_packet
+
+
+def recvfrom_loop(udp_socket: socket.socket, stop: threading.Event) -> int:
+    """Receive loop as it was before the buffer pool."""
+    received = 0
+    while not stop.is_set():
+        try:
+            message, _ = udp_socket.recvfrom(2048)
+        except socket.timeout:
+            continue
+        packet_header = parse_packet_header(message)
+        parser = PACKET_PARSERS.get(packet_header["m_packetId"])
+        if parser is not None:
+            parser(message)
+        received += 1
+    return received
+
+
+def recvfrom_into_loop(udp_socket: socket.socket, stop: threading.Event) -> int:
+    """Receive loop reading into a preallocated buffer pool slot."""
+    received = 0
+    buffer_pool = BufferPool(1)
+    slot = buffer_pool.acquire()
+    while not stop.is_set():
+        try:
+            message, _ = buffer_pool.receive(udp_socket, slot)
+        except socket.timeout:
+            continue
+        parse_packet(message)
+        received += 1
+    return received
+
+
+def run(loop, rate: float, seconds: float) -> dict:
+    """Send a synthetic grid to a receive loop and measure it.
+
+    Args:
+        loop (callable): Receive loop to benchmark.
+        rate (float): Frames per second, 0 for as fast as possible.
+        seconds (float): Duration of the run.
+
+    Returns:
+        dict: Sent and received packets and receiver CPU time per packet.
+    """
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(0.1)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    address = receiver.getsockname()
+
+    stop = threading.Event()
+    result = {}
+
+    def receive():
+        start = time.thread_time()
+        result["received"] = loop(receiver, stop)
+        result["cpu_seconds"] = time.thread_time() - start
+
+    thread = threading.Thread(target=receive)
+    thread.start()
+
+    frames = [grid_frame(frame) for frame in range(300)]
+    sent = 0
+    frame = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for packet in frames[frame % len(frames)]:
+            sender.sendto(packet, address)
+            sent += 1
+        frame += 1
+        if rate:
+            delay = start + frame / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    time.sleep(0.5)
+    stop.set()
+    thread.join()
+    receiver.close()
+    sender.close()
+
+    received = result["received"]
+    return {
+        "sent": sent,
+        "received": received,
+        "lost": sent - received,
+        "us_cpu_per_packet": result["cpu_seconds"] / max(received, 1) * 1e6,
+    }
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument("--rate", type=float, default=60)
+    argument_parser.add_argument("--seconds", type=float, default=5)
+    args = argument_parser.parse_args()
+    for name, loop in (("recvfrom", recvfrom_loop), ("recvfrom_into", recvfrom_into_loop)):
+        result = run(loop, args.rate, args.seconds)
+        print(
+            f"{name:<15}sent={result['sent']:<8}received={result['received']:<8}"
+            f"lost={result['lost']:<8}{result['us_cpu_per_packet']:.2f} us cpu/packet"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Run all benchmarks on synthetic packets and emit the results as JSON.
+
+Needs neither a running game nor a MongoDB server: packets come from the
+synthetic generator and documents go to the in-process MemoryDatabase. The
+JSON output is meant to be stored per commit to track regressions.
+
+    python -m f1_telemetry.benchmarks.suite --output results.json
+    python -m f1_telemetry.benchmarks.suite --quick
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from f1_telemetry.benchmarks import memory_db, parsers
+from f1_telemetry.benchmarks.ingest import run_threaded
+from f1_telemetry.benchmarks.memory_db import MemoryDatabase
+from f1_telemetry.benchmarks.synthetic import grid_frame
+from f1_telemetry.data.mongodb_ingest import BufferedMongoWriter, store_packet
+from f1_telemetry.data.packet_filter import PACKET_ID_OFFSET
+from f1_telemetry.data.packet_schema import np
+from f1_telemetry.data.packet_views import packet_view
+from f1_telemetry.data.udp_stream import parse_packet
+
+LAP = 2
+TELEMETRY = 6
+
+
+def environment() -> dict:
+    """Interpreter, platform, optional packages and commit of the run."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "numpy": np is not None,
+        "bson": memory_db.bson is not None,
+    }
+
+
+def grid_packets(frames: int, seed: int = None) -> list:
+    """Raw packets of a number of grid frames."""
+    packets = []
+    for frame in range(frames):
+        packets.extend(grid_frame(frame, seed=seed))
+    return packets
+
+
+def measure_dispatch(packets: list) -> dict:
+    """Time parse_packet over a realistic packet mix.
+
+    Returns:
+        dict: Nanoseconds per packet.
+    """
+    start = time.perf_counter_ns()
+    for packet in packets:
+        parse_packet(packet)
+    elapsed = time.perf_counter_ns() - start
+    return {"packets": len(packets), "ns_per_packet": elapsed / len(packets)}
+
+
+def measure_views(packets: list) -> dict:
+    """Time reading a few player car fields with lazy views and parsers.
+
+    Speed and gear are read from telemetry packets and the lap number from
+    lap packets, the access pattern of a dashboard.
+
+    Returns:
+        dict: Nanoseconds per packet for views and for parse_packet.
+    """
+    packets = [
+        packet for packet in packets if packet[PACKET_ID_OFFSET] in (LAP, TELEMETRY)
+    ]
+    start = time.perf_counter_ns()
+    for packet in packets:
+        view = packet_view(packet)
+        player = view.m_header.m_playerCarIndex
+        if packet[PACKET_ID_OFFSET] == TELEMETRY:
+            car = view.m_carTelemetryData[player]
+            car.m_speed, car.m_gear
+        else:
+            view.m_lapData[player].m_currentLapNum
+    views = time.perf_counter_ns() - start
+    start = time.perf_counter_ns()
+    for packet in packets:
+        data = parse_packet(packet)
+        player = data["m_header"]["m_playerCarIndex"]
+        if packet[PACKET_ID_OFFSET] == TELEMETRY:
+            car = data["m_carTelemetryData"][player]
+            car["m_speed"], car["m_gear"]
+        else:
+            data["m_lapData"][player]["m_currentLapNum"]
+    parsed = time.perf_counter_ns() - start
+    return {
+        "packets": len(packets),
+        "views_ns_per_packet": views / len(packets),
+        "parse_ns_per_packet": parsed / len(packets),
+    }
+
+
+def measure_store(packets: list, flush_size: int = 500, encoding: str = "full") -> dict:
+    """Parse and store a packet mix in one thread into a MemoryDatabase.
+
+    Documents are BSON encoded if bson is installed, so this is the CPU
+    cost of the ingest without the network on either side.
+
+    Args:
+        packets (list): Raw packets.
+        flush_size (int): Documents per insert_many.
+        encoding (str): "full" or "compact" documents.
+
+    Returns:
+        dict: Throughput and size of the stored documents.
+    """
+    database = MemoryDatabase(encode=True)
+    start = time.perf_counter()
+    with BufferedMongoWriter(database, flush_size=flush_size) as writer:
+        for packet in packets:
+            store_packet(writer, parse_packet(packet), encoding=encoding)
+    elapsed = time.perf_counter() - start
+    return {
+        "packets": len(packets),
+        "documents": database.documents,
+        "seconds": elapsed,
+        "packets_per_second": len(packets) / elapsed,
+        "bson_bytes_per_document": (
+            database.encoded_bytes / database.documents if database.encoded_bytes else None
+        ),
+    }
+
+
+def run(quick: bool = False, seed: int = 1, pipeline_rate: float = 600) -> dict:
+    """Run all benchmarks.
+
+    Args:
+        quick (bool): Fewer iterations and a shorter pipeline run.
+        seed (int): Random packet body seed.
+        pipeline_rate (float): Grid frames per second sent to the pipeline,
+            the game sends 60. 0 sends as fast as possible.
+
+    Returns:
+        dict: Results of every benchmark with the environment.
+    """
+    number = 200 if quick else 2000
+    repeat = 3 if quick else 5
+    frames = 120 if quick else 1200
+    packets = grid_packets(frames, seed)
+    results = {"environment": environment()}
+    results["parsers"] = parsers.run(number, repeat, allocations=True, seed=seed)
+    results["columnar_parsers"] = parsers.run(
+        number, repeat, columnar=True, allocations=True, seed=seed
+    )
+    results["dispatch"] = measure_dispatch(packets)
+    results["views"] = measure_views(packets)
+    results["store"] = measure_store(packets)
+    results["store_compact"] = measure_store(packets, encoding="compact")
+    pipeline = run_threaded(
+        rate=pipeline_rate, seconds=1 if quick else 5, latency=0.0, flush_size=500
+    )
+    pipeline["documents_per_second"] = pipeline["stored"] / pipeline["seconds"]
+    pipeline["lost"] = pipeline["sent"] - pipeline["received"]
+    results["pipeline"] = pipeline
+    return results
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument("--output", default=None, help="JSON file to write.")
+    argument_parser.add_argument("--quick", action="store_true")
+    argument_parser.add_argument("--seed", type=int, default=1)
+    argument_parser.add_argument(
+        "--pipeline-rate", type=float, default=600,
+        help="Grid frames per second sent to the pipeline, 0 for max rate.",
+    )
+    args = argument_parser.parse_args()
+    results = run(args.quick, args.seed, args.pipeline_rate)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
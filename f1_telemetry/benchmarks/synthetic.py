@@ -0,0 +1,76 @@
+"""Synthetic F1 telemetry packets for benchmarks."""
+import random
+from f1_telemetry.data.struct_parsers import PACKET_HEADER_LAYOUT, PACKET_SIZES
+
+# Packets sent per frame by a full grid at the game's 60 Hz send rate,
+# with the low rate packets spread over the frames.
+GRID_FRAME_PACKETS = (0, 2, 6, 7)
+GRID_PERIODIC_PACKETS = {10: 6, 1: 30, 4: 300, 5: 30}
+
+
+def make_packet(
+    packet_id: int,
+    frame: int = 0,
+    session_uid: int = 1,
+    session_time: float = 0.0,
+    seed: int = None,
+) -> bytes:
+    """Build a packet with a valid header.
+
+    Args:
+        packet_id (int): Packet id from the F1 UDP specification.
+        frame (int): Frame identifier written to the header.
+        session_uid (int): Session UID written to the header.
+        session_time (float): Session time written to the header.
+        seed (int): Fill the body with reproducible random bytes instead of
+            zeros, so every field holds a non-trivial value.
+
+    Returns:
+        bytes: Packet of the correct size for its id.
+    """
+    size = PACKET_SIZES[packet_id]
+    if seed is None:
+        packet = bytearray(size)
+    else:
+        packet = bytearray(random.Random(seed * 256 + packet_id).randbytes(size))
+    PACKET_HEADER_LAYOUT.struct.pack_into(
+        packet, 0, 2023, 23, 1, 0, 1, packet_id,
+        session_uid, session_time, frame, frame, 0, 255,
+    )
+    return bytes(packet)
+
+
+def grid_frame(frame: int, session_uid: int = 1, seed: int = None) -> list:
+    """Packets the game sends for one frame of a full 22-car grid.
+
+    Args:
+        frame (int): Frame identifier.
+        session_uid (int): Session UID written to the headers.
+        seed (int): Random body seed, zero filled bodies if omitted.
+
+    Returns:
+        list: Raw packets of the frame.
+    """
+    packet_ids = list(GRID_FRAME_PACKETS)
+    packet_ids += [
+        packet_id
+        for packet_id, every in GRID_PERIODIC_PACKETS.items()
+        if frame % every == 0
+    ]
+    session_time = frame / 60
+    return [
+        make_packet(packet_id, frame, session_uid, session_time, seed)
+        for packet_id in packet_ids
+    ]
+
+
+def all_packets(seed: int = None) -> dict:
+    """One packet of every supported id.
+
+    Args:
+        seed (int): Random body seed, zero filled bodies if omitted.
+
+    Returns:
+        dict: Packet id mapped to the raw packet.
+    """
+    return {packet_id: make_packet(packet_id, seed=seed) for packet_id in PACKET_SIZES}
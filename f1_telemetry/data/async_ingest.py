@@ -0,0 +1,391 @@
+"""asyncio ingest of F1 telemetry with an async MongoDB driver.
+
+One event loop listens on several UDP ports through DatagramProtocol
+endpoints, e.g. one per rig or player. Datagrams are parsed with the same
+parsers as the threaded pipeline and buffered per collection. Flushes run
+as tasks with up to ``F1_ASYNC_MAX_IN_FLIGHT`` insert_many calls in flight,
+so the loop never waits on a database round trip. Documents are stored
+in the per-packet layout, in one collection per packet type. Collection
+routing, retention and the per-car layout set up collections and indexes
+with the synchronous driver and are rejected at startup.
+
+Requires the optional ``motor`` package.
+"""
+import asyncio
+import os
+import time
+from collections import defaultdict
+from dotenv import load_dotenv
+from pymongo.errors import BulkWriteError, PyMongoError
+from f1_telemetry.data.mongodb_ingest import (
+    MONGODB_CONNECTION_STRING,
+    MONGODB_FLUSH_INTERVAL,
+    MONGODB_FLUSH_SIZE,
+    MONGODB_RETRIES,
+    MONGODB_RETRY_BACKOFF,
+    PACKET_COLLECTIONS,
+    applied_count,
+    inserted_count,
+    store_packet,
+)
+from f1_telemetry.data.metadata import MetadataCache
+from f1_telemetry.data.metrics import Histogram
+from f1_telemetry.data.packet_filter import PacketFilter
+from f1_telemetry.data.pipeline import RECEIVED_NS_KEY
+from f1_telemetry.data.routing import (
+    F1_COLLECTION_ROUTING,
+    F1_RETENTION_DAYS,
+    SINGLE,
+    packet_indexes,
+)
+from f1_telemetry.data.sampling import Sampler
+from f1_telemetry.data.timeseries import F1_STORAGE_LAYOUT, PACKETS
+from f1_telemetry.data.udp_stream import (
+    F1_UDP_SERVER_ADDRESS,
+    F1_UDP_SERVER_PORTS,
+    format_source,
+    parse_packet,
+    parse_ports,
+)
+
+load_dotenv()
+
+F1_ASYNC_MAX_IN_FLIGHT = int(os.environ.get("F1_ASYNC_MAX_IN_FLIGHT", 8))
+# Flushes running or waiting for a slot, further batches are dropped.
+F1_ASYNC_MAX_PENDING = int(os.environ.get("F1_ASYNC_MAX_PENDING", 32))
+
+
+class AsyncBufferedWriter:
+    """Buffer documents per collection and flush them as concurrent tasks.
+
+    ``write`` and ``write_operation`` only append to a buffer, so the writer
+    can be used from protocol callbacks and with ``store_packet``. Flushes
+    are started as tasks and at most ``max_in_flight`` run at once. Once
+    ``max_pending`` flushes are running or waiting, the database can't keep
+    up and new batches are dropped and counted, like the drop_newest policy
+    of the pipeline queues, instead of piling up as tasks.
+    Connection errors are retried and counted like in BufferedMongoWriter,
+    so a flush task never fails with a database error.
+
+    Attributes:
+        flushed (int): Documents written to MongoDB.
+        failed (int): Documents rejected by MongoDB or not written because
+            of a connection error.
+        flushes (int): Number of bulk calls issued.
+        retries (int): insert_many calls retried after a connection error.
+        dropped (int): Documents dropped because too many flushes were
+            pending.
+        last_error (Exception): Last error of a flush, None if none failed.
+        stored_latency (Histogram): Time from receive until a document was
+            flushed, for writes that carry their receive time.
+    """
+
+    def __init__(
+        self,
+        database,
+        flush_size: int = MONGODB_FLUSH_SIZE,
+        flush_interval: float = MONGODB_FLUSH_INTERVAL,
+        max_in_flight: int = F1_ASYNC_MAX_IN_FLIGHT,
+        max_pending: int = F1_ASYNC_MAX_PENDING,
+        retries: int = MONGODB_RETRIES,
+        retry_backoff: float = MONGODB_RETRY_BACKOFF,
+    ):
+        if flush_size < 1:
+            raise ValueError("flush_size must be at least 1.")
+        if max_pending < max_in_flight:
+            raise ValueError("max_pending must be at least max_in_flight.")
+        self.database = database
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_retries = retries
+        self.retry_backoff = retry_backoff
+        self.max_pending = max_pending
+        self.flushed = 0
+        self.failed = 0
+        self.flushes = 0
+        self.retries = 0
+        self.dropped = 0
+        self.last_error = None
+        self.stored_latency = Histogram()
+        self._buffers = defaultdict(list)
+        self._operations = defaultdict(list)
+        self._received = defaultdict(list)
+        self._in_flight = set()
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._last_flush = time.monotonic()
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered documents not yet handed to a flush."""
+        buffers = list(self._buffers.values()) + list(self._operations.values())
+        return sum(len(buffer) for buffer in buffers)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of flushes running or waiting for a slot."""
+        return len(self._in_flight)
+
+    def write(self, collection: str, document: dict, received_ns: int = None) -> None:
+        """Buffer a document and start a flush if a size or time limit is hit."""
+        buffer = self._buffers[collection]
+        buffer.append(document)
+        if received_ns is not None:
+            self._received[collection].append(received_ns)
+        if len(buffer) >= self.flush_size:
+            self._start_flush(collection)
+        self.flush_if_due()
+
+    def write_operation(
+        self, collection: str, operation, received_ns: int = None
+    ) -> None:
+        """Buffer a write operation and start a flush if a limit is hit."""
+        buffer = self._operations[collection]
+        buffer.append(operation)
+        if received_ns is not None:
+            self._received[collection].append(received_ns)
+        if len(buffer) >= self.flush_size:
+            self._start_flush(collection)
+        self.flush_if_due()
+
+    def flush_if_due(self) -> None:
+        """Start flushes for all collections if the interval has elapsed."""
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Start flushes for all buffered documents."""
+        for collection in set(self._buffers) | set(self._operations):
+            self._start_flush(collection)
+        self._last_flush = time.monotonic()
+
+    async def close(self) -> None:
+        """Flush remaining documents and wait for all flushes."""
+        self.flush()
+        while self._in_flight:
+            await asyncio.gather(*self._in_flight)
+
+    def _start_flush(self, collection: str) -> None:
+        documents = self._buffers.pop(collection, None)
+        operations = self._operations.pop(collection, None)
+        # Documents and operations of a collection are flushed separately,
+        # their receive times go with whichever flush comes first.
+        received = self._received.pop(collection, None)
+        if documents:
+            self._track(self._insert, collection, documents, received)
+            received = None
+        if operations:
+            self._track(self._bulk_write, collection, operations, received)
+
+    def _track(self, flush, collection: str, batch: list, received: list) -> None:
+        if len(self._in_flight) >= self.max_pending:
+            self.dropped += len(batch)
+            return
+        task = asyncio.ensure_future(flush(collection, batch, received))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _insert(self, collection: str, documents: list, received: list) -> None:
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                self.flushes += 1
+                try:
+                    await self.database[collection].insert_many(
+                        documents, ordered=False
+                    )
+                    self.flushed += len(documents)
+                    if received:
+                        self.stored_latency.observe_since(received)
+                    return
+                except BulkWriteError as error:
+                    inserted = inserted_count(error, attempt > 0)
+                    self.flushed += inserted
+                    self.failed += len(documents) - inserted
+                    self.last_error = error
+                    return
+                except PyMongoError as error:
+                    self.last_error = error
+                if attempt < self.max_retries:
+                    self.retries += 1
+                    await asyncio.sleep(self.retry_backoff * 2**attempt)
+            self.failed += len(documents)
+
+    async def _bulk_write(self, collection: str, operations: list, received: list) -> None:
+        async with self._semaphore:
+            self.flushes += 1
+            try:
+                await self.database[collection].bulk_write(operations, ordered=True)
+                self.flushed += len(operations)
+                if received:
+                    self.stored_latency.observe_since(received)
+            except BulkWriteError as error:
+                applied = applied_count(error)
+                self.flushed += applied
+                self.failed += len(operations) - applied
+                self.last_error = error
+            except PyMongoError as error:
+                self.failed += len(operations)
+                self.last_error = error
+
+
+def check_async_settings(
+    routing: str = F1_COLLECTION_ROUTING,
+    retention_days: int = F1_RETENTION_DAYS,
+    layout: str = F1_STORAGE_LAYOUT,
+) -> None:
+    """Reject settings the asyncio ingest doesn't support.
+
+    Raises:
+        ValueError: If collections are routed, documents expire or the
+            per-car layout is configured.
+    """
+    if routing != SINGLE:
+        raise ValueError(
+            f"The asyncio ingest only supports F1_COLLECTION_ROUTING={SINGLE}, "
+            f"not {routing!r}."
+        )
+    if retention_days:
+        raise ValueError("The asyncio ingest doesn't support F1_RETENTION_DAYS.")
+    if layout != PACKETS:
+        raise ValueError(
+            f"The asyncio ingest only supports F1_STORAGE_LAYOUT={PACKETS}, "
+            f"not {layout!r}."
+        )
+
+
+class F1DatagramProtocol(asyncio.DatagramProtocol):
+    """Parse datagrams of one UDP port and hand them to a callback.
+
+    Args:
+        handle_packet (callable): Called with every parsed packet and its
+            sender address as "host:port".
+        packet_filter (PacketFilter): Packet types and cars to keep.
+    """
+
+    def __init__(self, handle_packet, packet_filter: PacketFilter = None):
+        self.handle_packet = handle_packet
+        self.packet_filter = packet_filter
+        self.received = 0
+        self.parsed = 0
+        self.errors = 0
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        received_ns = time.perf_counter_ns()
+        self.received += 1
+        try:
+            packet = parse_packet(data, packet_filter=self.packet_filter)
+            if packet is None:
+                return
+            self.parsed += 1
+            packet[RECEIVED_NS_KEY] = received_ns
+            self.handle_packet(packet, format_source(addr))
+        except Exception:
+            self.errors += 1
+
+
+async def serve(
+    database,
+    ports: list,
+    address: str = F1_UDP_SERVER_ADDRESS,
+    stop: asyncio.Event = None,
+    **writer_options,
+) -> dict:
+    """Ingest from several UDP ports in the running event loop.
+
+    Args:
+        database: Async MongoDB database, e.g. from Motor.
+        ports (list): UDP ports to listen on.
+        address (str): Address to bind to.
+        stop (asyncio.Event): Stops the ingest once set, runs until
+            cancelled if omitted.
+        **writer_options: Passed on to AsyncBufferedWriter.
+
+    Returns:
+        dict: Counters per port and of the writer.
+
+    Raises:
+        ValueError: If unsupported settings are configured, see
+            check_async_settings.
+    """
+    check_async_settings()
+    loop = asyncio.get_running_loop()
+    stop = stop or asyncio.Event()
+    writer = AsyncBufferedWriter(database, **writer_options)
+    sampler = Sampler.from_env()
+    packet_filter = PacketFilter.from_env(PACKET_COLLECTIONS)
+    metadata = MetadataCache.from_env()
+
+    def handle_packet(packet, source):
+        store_packet(
+            writer, packet, sampler=sampler, source=source, metadata=metadata
+        )
+
+    endpoints = {}
+    try:
+        for port in ports:
+            transport, protocol = await loop.create_datagram_endpoint(
+                lambda: F1DatagramProtocol(handle_packet, packet_filter),
+                local_addr=(address, port),
+            )
+            endpoints[transport.get_extra_info("sockname")[1]] = (transport, protocol)
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), writer.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            writer.flush_if_due()
+    finally:
+        for transport, _ in endpoints.values():
+            transport.close()
+        await writer.close()
+
+    return {
+        "ports": {
+            port: {
+                "received": protocol.received,
+                "parsed": protocol.parsed,
+                "errors": protocol.errors,
+            }
+            for port, (_, protocol) in endpoints.items()
+        },
+        "flushed": writer.flushed,
+        "failed": writer.failed,
+        "dropped": writer.dropped,
+        "flushes": writer.flushes,
+    }
+
+
+async def verify_async_mongodb_setup(database) -> None:
+    """Create the packet collections and their indexes if they don't exist."""
+    existing = set(await database.list_collection_names())
+    for collection in PACKET_COLLECTIONS.values():
+        if collection not in existing:
+            await database.create_collection(collection)
+        for keys in packet_indexes(collection):
+            await database[collection].create_index(keys)
+
+
+def run_async_f1_telemetry_ingest(ports: list = None) -> None:
+    """Run the asyncio ingest until interrupted with Ctrl+C.
+
+    Args:
+        ports (list): UDP ports, F1_UDP_SERVER_PORTS if omitted.
+    """
+    try:
+        from motor.motor_asyncio import AsyncIOMotorClient
+    except ImportError as error:
+        raise ImportError("The asyncio ingest requires the motor package.") from error
+    if not MONGODB_CONNECTION_STRING:
+        raise ValueError("MONGODB_CONNECTION_STRING is missing.")
+    check_async_settings()
+    ports = ports or parse_ports(F1_UDP_SERVER_PORTS)
+
+    async def main():
+        database = AsyncIOMotorClient(MONGODB_CONNECTION_STRING).f1
+        await verify_async_mongodb_setup(database)
+        return await serve(database, ports)
+
+    try:
+        stats = asyncio.run(main())
+    except KeyboardInterrupt:
+        return
+    print(f"Ingest stopped: {stats}")
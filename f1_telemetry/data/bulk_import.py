@@ -0,0 +1,204 @@
+"""Bulk import capture files into MongoDB without going through UDP.
+
+The capture file is memory-mapped and its records are grouped by session
+UID, only the record and packet headers are read. Every session is decoded
+by one worker process with the struct parsers, in capture order, so the
+sampler, metadata cache and per-car buckets see its packets in sequence.
+Sessions are imported in parallel and bulk-loaded per collection by the
+worker's own writer.
+"""
+import mmap
+import multiprocessing
+import os
+import time
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from pymongo.mongo_client import MongoClient
+from f1_telemetry.data.capture import CAPTURE_MAGIC, RECORD_HEADER
+from f1_telemetry.data.mongodb_ingest import (
+    MONGODB_CONNECTION_STRING,
+    PACKET_COLLECTIONS,
+    BufferedMongoWriter,
+    create_per_car_store,
+    create_router,
+    store_packet,
+    verify_mongodb_setup,
+)
+from f1_telemetry.data.metadata import MetadataCache
+from f1_telemetry.data.metrics import SESSION_UID, SESSION_UID_OFFSET
+from f1_telemetry.data.packet_filter import PacketFilter
+from f1_telemetry.data.sampling import Sampler
+from f1_telemetry.data.udp_stream import parse_packet
+
+load_dotenv()
+
+F1_IMPORT_PROCESSES = int(os.environ.get("F1_IMPORT_PROCESSES", os.cpu_count() or 1))
+IMPORT_FLUSH_SIZE = 2000
+
+_worker = None
+
+
+def split_sessions(buffer) -> dict:
+    """Group the records of a capture buffer by session UID.
+
+    Only the record headers and the session UIDs are read. Consecutive
+    records of a session are merged into one range.
+
+    Args:
+        buffer (bytes): Whole capture file, e.g. an mmap.
+
+    Returns:
+        dict: Lists of start and end byte offsets in capture order by
+        session UID. Records too short for a packet header are grouped
+        under None.
+    """
+    if buffer[: len(CAPTURE_MAGIC)] != CAPTURE_MAGIC:
+        raise ValueError("Not an F1 capture file.")
+    sessions = {}
+    offset = len(CAPTURE_MAGIC)
+    end = len(buffer)
+    header_size = RECORD_HEADER.size
+    uid_end = SESSION_UID_OFFSET + SESSION_UID.size
+    previous = None
+    while offset + header_size <= end:
+        _, length = RECORD_HEADER.unpack_from(buffer, offset)
+        record_end = offset + header_size + length
+        if record_end > end:
+            break
+        session_uid = None
+        if length >= uid_end:
+            (session_uid,) = SESSION_UID.unpack_from(
+                buffer, offset + header_size + SESSION_UID_OFFSET
+            )
+        ranges = sessions.setdefault(session_uid, [])
+        if session_uid == previous and ranges:
+            ranges[-1] = (ranges[-1][0], record_end)
+        else:
+            ranges.append((offset, record_end))
+        previous = session_uid
+        offset = record_end
+    return sessions
+
+
+class ImportWorker:
+    """Decoders, caches and writer of one import process.
+
+    They are built once per process and kept across sessions. Collections
+    and indexes are expected to exist, see import_capture.
+
+    Args:
+        database: MongoDB database.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.packet_filter = PacketFilter(PACKET_COLLECTIONS)
+        self.sampler = Sampler.from_env()
+        self.per_car = create_per_car_store(database, setup=False)
+        self.router = create_router(database)
+        self.metadata = MetadataCache.from_env()
+        self.writer = BufferedMongoWriter(
+            database, flush_size=IMPORT_FLUSH_SIZE, flush_interval=float("inf")
+        )
+
+    def import_ranges(self, path: str, ranges: list) -> dict:
+        """Decode and store the records in the given ranges, in order.
+
+        Args:
+            path (str): Capture file.
+            ranges (list): Start and end byte offsets of whole records.
+
+        Returns:
+            dict: Decoded, stored and failed packet counts of these ranges.
+        """
+        writer = self.writer
+        flushed, failed = writer.flushed, writer.failed
+        header_size = RECORD_HEADER.size
+        packets = 0
+        with open(path, "rb") as capture_file, mmap.mmap(
+            capture_file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as buffer:
+            for start, end in ranges:
+                offset = start
+                while offset < end:
+                    timestamp_ns, length = RECORD_HEADER.unpack_from(buffer, offset)
+                    offset += header_size
+                    message = buffer[offset : offset + length]
+                    offset += length
+                    packets += 1
+                    data = parse_packet(message, packet_filter=self.packet_filter)
+                    if data is not None:
+                        received_at = datetime.fromtimestamp(
+                            timestamp_ns / 1e9, timezone.utc
+                        ).replace(tzinfo=None)
+                        store_packet(
+                            writer,
+                            data,
+                            received_at,
+                            self.sampler,
+                            self.per_car,
+                            router=self.router,
+                            metadata=self.metadata,
+                        )
+        writer.flush()
+        return {
+            "packets": packets,
+            "stored": writer.flushed - flushed,
+            "failed": writer.failed - failed,
+        }
+
+
+def _init_worker() -> None:
+    global _worker
+    _worker = ImportWorker(MongoClient(MONGODB_CONNECTION_STRING).f1)
+
+
+def _import_session_worker(task: tuple) -> dict:
+    return _worker.import_ranges(*task)
+
+
+def import_capture(path: str, processes: int = F1_IMPORT_PROCESSES) -> dict:
+    """Import a capture file into MongoDB.
+
+    Collections and indexes are set up once before the workers start.
+
+    Args:
+        path (str): Capture file.
+        processes (int): Worker processes, 1 imports in this process.
+
+    Returns:
+        dict: Packet counts, elapsed seconds and packets per second.
+    """
+    verify_mongodb_setup()
+    create_per_car_store()
+    start_time = time.perf_counter()
+    with open(path, "rb") as capture_file, mmap.mmap(
+        capture_file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buffer:
+        sessions = split_sessions(buffer)
+
+    totals = {"packets": 0, "stored": 0, "failed": 0}
+    # Largest sessions first, so a long session doesn't start last.
+    tasks = sorted(
+        ((path, ranges) for ranges in sessions.values()),
+        key=lambda task: sum(end - start for start, end in task[1]),
+        reverse=True,
+    )
+    if processes <= 1:
+        _init_worker()
+        results = map(_import_session_worker, tasks)
+        for result in results:
+            for key in totals:
+                totals[key] += result[key]
+    else:
+        context = multiprocessing.get_context("spawn")
+        processes = min(processes, len(tasks)) or 1
+        with context.Pool(processes, initializer=_init_worker) as pool:
+            for result in pool.imap_unordered(_import_session_worker, tasks):
+                for key in totals:
+                    totals[key] += result[key]
+
+    elapsed = time.perf_counter() - start_time
+    totals["seconds"] = elapsed
+    totals["packets_per_second"] = totals["packets"] / elapsed if elapsed else 0.0
+    return totals
@@ -0,0 +1,214 @@
+"""Capture raw F1 UDP datagrams to a file and replay them.
+
+A capture file starts with an 8 byte magic followed by one record per
+datagram: an 8 byte receive timestamp in nanoseconds since the epoch, a
+2 byte payload length and the raw payload, all little-endian.
+"""
+import os
+import socket
+import struct
+import time
+from dotenv import load_dotenv
+from f1_telemetry.data.pipeline import IngestPipeline
+from f1_telemetry.data.udp_stream import (
+    F1_UDP_SERVER_ADDRESS,
+    F1_UDP_SERVER_PORT,
+    BufferPool,
+    create_udp_socket,
+)
+
+load_dotenv()
+
+CAPTURE_MAGIC = b"F1CAP1\n\x00"
+RECORD_HEADER = struct.Struct("<QH")
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+class CaptureWriter:
+    """Append raw datagrams with their receive timestamps to a capture file.
+
+    Args:
+        path (str): Capture file, created with a magic header if missing.
+
+    Attributes:
+        written (int): Datagrams written by this writer.
+    """
+
+    def __init__(self, path: str):
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "ab", buffering=WRITE_BUFFER_SIZE)
+        if is_new:
+            self._file.write(CAPTURE_MAGIC)
+        else:
+            with open(path, "rb") as existing:
+                if existing.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+                    self._file.close()
+                    raise ValueError(f"{path} is not an F1 capture file.")
+        self.written = 0
+
+    def write(self, message, timestamp_ns: int = None) -> None:
+        """Append one datagram.
+
+        Args:
+            message (bytes): Raw datagram or a memoryview of it.
+            timestamp_ns (int): Receive time, now if omitted.
+        """
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+        self._file.write(RECORD_HEADER.pack(timestamp_ns, len(message)))
+        self._file.write(message)
+        self.written += 1
+
+    def close(self) -> None:
+        """Flush and close the file."""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_records(buffer):
+    """Split a capture buffer into records.
+
+    Args:
+        buffer (bytes): Whole capture file, e.g. an mmap.
+
+    Returns:
+        Generator: Tuples of receive timestamp in ns and a memoryview of
+        the datagram.
+    """
+    view = memoryview(buffer)
+    if bytes(view[: len(CAPTURE_MAGIC)]) != CAPTURE_MAGIC:
+        raise ValueError("Not an F1 capture file.")
+    offset = len(CAPTURE_MAGIC)
+    end = len(view)
+    unpack_from = RECORD_HEADER.unpack_from
+    header_size = RECORD_HEADER.size
+    while offset + header_size <= end:
+        timestamp_ns, length = unpack_from(view, offset)
+        offset += header_size
+        if offset + length > end:
+            break
+        yield timestamp_ns, view[offset : offset + length]
+        offset += length
+
+
+def read_capture(path: str):
+    """Read all records of a capture file.
+
+    Returns:
+        Generator: Tuples of receive timestamp in ns and the datagram.
+    """
+    with open(path, "rb") as capture_file:
+        if capture_file.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError(f"{path} is not an F1 capture file.")
+        while True:
+            record_header = capture_file.read(RECORD_HEADER.size)
+            if len(record_header) < RECORD_HEADER.size:
+                return
+            timestamp_ns, length = RECORD_HEADER.unpack(record_header)
+            message = capture_file.read(length)
+            if len(message) < length:
+                return
+            yield timestamp_ns, message
+
+
+def capture(path: str, udp_socket: socket.socket = None) -> int:
+    """Capture datagrams from the F1 UDP socket until Ctrl+C.
+
+    Args:
+        path (str): Capture file to append to.
+        udp_socket (socket.socket): Socket to read from, bound to the
+            configured F1 address if omitted.
+
+    Returns:
+        int: Number of captured datagrams.
+    """
+    udp_socket = udp_socket or create_udp_socket()
+    buffer_pool = BufferPool(1)
+    slot = buffer_pool.acquire()
+    with CaptureWriter(path) as writer:
+        try:
+            while True:
+                message, _ = buffer_pool.receive(udp_socket, slot)
+                writer.write(message)
+        except KeyboardInterrupt:
+            pass
+    return writer.written
+
+
+def replay(
+    path: str,
+    address: str = F1_UDP_SERVER_ADDRESS,
+    port: int = F1_UDP_SERVER_PORT,
+    speed: float = 1.0,
+) -> dict:
+    """Send the datagrams of a capture file to a UDP port.
+
+    Args:
+        path (str): Capture file.
+        address (str): Target address.
+        port (int): Target port.
+        speed (float): Replay speed relative to the capture, e.g. 1 for real
+            time or 10 for ten times faster. 0 sends as fast as possible.
+
+    Returns:
+        dict: Sent packets, elapsed seconds and packets per second.
+    """
+    udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    target = (address, port)
+    sent = 0
+    first_timestamp_ns = None
+    start = time.perf_counter()
+    try:
+        for timestamp_ns, message in read_capture(path):
+            if speed:
+                if first_timestamp_ns is None:
+                    first_timestamp_ns = timestamp_ns
+                due = start + (timestamp_ns - first_timestamp_ns) / 1e9 / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            udp_socket.sendto(message, target)
+            sent += 1
+    finally:
+        udp_socket.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "sent": sent,
+        "seconds": elapsed,
+        "packets_per_second": sent / elapsed if elapsed else 0.0,
+    }
+
+
+def replay_into_pipeline(path: str, speed: float = 0, **pipeline_options) -> dict:
+    """Replay a capture into an in-process ingest pipeline and compare counts.
+
+    The pipeline listens on an ephemeral loopback port and discards parsed
+    packets unless ``handle_packet`` is passed, so this measures how much of
+    the replayed traffic the receive and parse stages kept up with.
+
+    Args:
+        path (str): Capture file.
+        speed (float): Replay speed, 0 for as fast as possible.
+        **pipeline_options: Passed on to IngestPipeline.
+
+    Returns:
+        dict: Replay results merged with the pipeline counters.
+    """
+    pipeline_options.setdefault("handle_packet", lambda packet: None)
+    udp_socket = create_udp_socket("127.0.0.1", 0)
+    pipeline = IngestPipeline(udp_socket=udp_socket, **pipeline_options)
+    pipeline.start()
+    try:
+        result = replay(path, *udp_socket.getsockname(), speed=speed)
+        time.sleep(0.5)
+    finally:
+        pipeline.stop()
+        udp_socket.close()
+    result.update(pipeline.stats())
+    result["lost"] = result["sent"] - result["received"]
+    return result
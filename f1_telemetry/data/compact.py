@@ -0,0 +1,271 @@
+"""Compact document encoding for stored packets.
+
+A packet document repeats every field name once per car, 22 times for
+``m_tyresSurfaceTemperatureRL`` alone, plus the full header dict, so most
+of its BSON size is key names. The compact encoding stores
+
+    _e   encoding version
+    u    session UID as int64
+    t    session time
+    f    frame identifier
+    o    overall frame identifier
+    h    remaining header fields as an array in layout order
+    d    packet fields under short codes
+
+Codes are assigned from the field order of the packet layouts, ``a`` for
+the first field, ``b`` for the second and so on. Arrays of records, such
+as the 22 cars, are stored as one array per field, so every car field
+name appears once per document. Positions of cars that were filtered out
+are listed under ``_n``, fields a sampler dropped are null. Top-level
+keys starting with an underscore, e.g. ``_ingested_at``, are kept as they
+are.
+
+``decode_document`` restores a document with the full field names, in the
+same shape as the packet layout stores it.
+"""
+import os
+from operator import itemgetter
+from dotenv import load_dotenv
+from f1_telemetry.data.packet_schema import RecordLayout
+from f1_telemetry.data.struct_parsers import PACKET_HEADER_LAYOUT, PACKET_LAYOUTS
+from f1_telemetry.data.timeseries import int64_session_uid
+
+load_dotenv()
+
+# "full" stores the packet layout field names, "compact" short codes.
+F1_DOCUMENT_ENCODING = str(os.environ.get("F1_DOCUMENT_ENCODING", "full"))
+
+FULL = "full"
+COMPACT = "compact"
+COMPACT_VERSION = 1
+CODE_ALPHABET = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+NULL_POSITIONS = "_n"
+
+HOISTED_HEADER = {
+    "m_sessionUID": "u",
+    "m_sessionTime": "t",
+    "m_frameIdentifier": "f",
+    "m_overallFrameIdentifier": "o",
+}
+HEADER_ARRAY = tuple(
+    name for name in PACKET_HEADER_LAYOUT.names if name not in HOISTED_HEADER
+)
+
+
+def field_code(index: int) -> str:
+    """Short code of the field at a position of a layout."""
+    code = CODE_ALPHABET[index % len(CODE_ALPHABET)]
+    index //= len(CODE_ALPHABET)
+    while index:
+        index -= 1
+        code = CODE_ALPHABET[index % len(CODE_ALPHABET)] + code
+        index //= len(CODE_ALPHABET)
+    return code
+
+
+class FieldPlan:
+    """Codes of the fields of a layout.
+
+    Args:
+        layout (RecordLayout): Layout to assign codes to.
+        skip (tuple): Field names left out, e.g. the header.
+
+    Attributes:
+        fields (tuple): Tuples of code, name, nested FieldPlan and array
+            length of every field.
+        row (operator.itemgetter): Reads all fields of a record at once if
+            the layout is flat, for transposing arrays of full records.
+    """
+
+    def __init__(self, layout: RecordLayout, skip: tuple = ()):
+        self.fields = tuple(
+            (
+                field_code(index),
+                name,
+                FieldPlan(kind) if isinstance(kind, RecordLayout) else None,
+                count,
+            )
+            for index, (name, kind, count) in enumerate(layout.fields)
+            if name not in skip
+        )
+        self.codes = tuple(code for code, _, _, _ in self.fields)
+        flat = all(nested is None for _, _, nested, _ in self.fields)
+        names = [name for _, name, _, _ in self.fields]
+        self.row = itemgetter(*names) if flat and len(names) > 1 else None
+
+
+def _encode_value(nested: FieldPlan, count: int, value):
+    if nested is None or value is None:
+        return value
+    if count is None:
+        return _encode_record(nested, value)
+    return _encode_records(nested, value)
+
+
+def _encode_record(plan: FieldPlan, record: dict) -> dict:
+    return {
+        code: _encode_value(nested, count, record[name])
+        for code, name, nested, count in plan.fields
+        if name in record
+    }
+
+
+def _encode_records(plan: FieldPlan, records: list) -> dict:
+    """One array per field of a list of records."""
+    if plan.row is not None:
+        # Arrays of complete records are transposed in C, filtered cars or
+        # sampled fields take the slow path below.
+        try:
+            return dict(zip(plan.codes, zip(*map(plan.row, records))))
+        except (KeyError, TypeError):
+            pass
+    encoded = {}
+    for code, name, nested, count in plan.fields:
+        if nested is None:
+            encoded[code] = [
+                record.get(name) if record else None for record in records
+            ]
+        else:
+            encoded[code] = [
+                _encode_value(nested, count, record.get(name)) if record else None
+                for record in records
+            ]
+    nulls = [index for index, record in enumerate(records) if record is None]
+    if nulls:
+        encoded[NULL_POSITIONS] = nulls
+    return encoded
+
+
+def _decode_value(nested: FieldPlan, count: int, value):
+    if nested is None or value is None:
+        return value
+    if count is None:
+        return _decode_record(nested, value)
+    return _decode_records(nested, value)
+
+
+def _decode_record(plan: FieldPlan, encoded: dict) -> dict:
+    return {
+        name: _decode_value(nested, count, encoded[code])
+        for code, name, nested, count in plan.fields
+        if code in encoded
+    }
+
+
+def _decode_records(plan: FieldPlan, encoded: dict) -> list:
+    nulls = set(encoded.get(NULL_POSITIONS, ()))
+    columns = [
+        (name, nested, count, encoded[code])
+        for code, name, nested, count in plan.fields
+        if code in encoded
+    ]
+    length = len(columns[0][3]) if columns else 0
+    records = []
+    for index in range(length):
+        if index in nulls:
+            records.append(None)
+            continue
+        record = {}
+        for name, nested, count, values in columns:
+            value = values[index]
+            if value is not None:
+                record[name] = _decode_value(nested, count, value)
+        records.append(record)
+    return records
+
+
+# Plans of the packet fields without the header, by packet id.
+PACKET_PLANS = {
+    packet_id: FieldPlan(layout, skip=("m_header",))
+    for packet_id, layout in PACKET_LAYOUTS.items()
+}
+
+
+def is_compact(document: dict) -> bool:
+    """Check whether a stored document has the compact encoding."""
+    return "_e" in document
+
+
+def encode_packet(data: dict) -> dict:
+    """Compact document of a parsed packet.
+
+    Args:
+        data (dict): Parsed packet with the raw integer session UID, e.g.
+            after sampling, with underscore metadata such as _source.
+
+    Returns:
+        dict: Compact document.
+    """
+    header = data["m_header"]
+    document = {
+        "_e": COMPACT_VERSION,
+        "u": int64_session_uid(int(header["m_sessionUID"])),
+        "t": header["m_sessionTime"],
+        "f": header["m_frameIdentifier"],
+        "o": header["m_overallFrameIdentifier"],
+        "h": [header[name] for name in HEADER_ARRAY],
+        "d": _encode_record(PACKET_PLANS[header["m_packetId"]], data),
+    }
+    for key, value in data.items():
+        if key.startswith("_"):
+            document[key] = value
+    return document
+
+
+def decode_document(document: dict) -> dict:
+    """Restore the full field names of a compact document.
+
+    Documents that are not compact are returned unchanged.
+
+    Returns:
+        dict: Document as the packet layout stores it, with the session
+        UID as a string.
+    """
+    if not is_compact(document):
+        return document
+    header = dict(zip(HEADER_ARRAY, document["h"]))
+    session_uid = document["u"]
+    if session_uid < 0:
+        session_uid += 1 << 64
+    header["m_sessionUID"] = str(session_uid)
+    header["m_sessionTime"] = document["t"]
+    header["m_frameIdentifier"] = document["f"]
+    header["m_overallFrameIdentifier"] = document["o"]
+    decoded = {"m_header": {name: header[name] for name in PACKET_HEADER_LAYOUT.names}}
+    decoded.update(_decode_record(PACKET_PLANS[header["m_packetId"]], document["d"]))
+    for key, value in document.items():
+        if key.startswith("_") and key != "_e":
+            decoded[key] = value
+    return decoded
+
+
+def compact_path(packet_id: int, path: str) -> str:
+    """Compact document path of a full field path, for queries.
+
+    ``compact_path(6, "m_carTelemetryData.m_speed")`` is ``"d.b.a"``: the
+    field holds the speeds of all cars.
+
+    Args:
+        packet_id (int): Packet id of the collection.
+        path (str): Dotted path of full field names.
+
+    Returns:
+        str: Dotted path in the compact document.
+    """
+    names = path.split(".")
+    if names[0] == "m_header":
+        name = names[1]
+        if name in HOISTED_HEADER:
+            return HOISTED_HEADER[name]
+        return f"h.{HEADER_ARRAY.index(name)}"
+    plan = PACKET_PLANS[packet_id]
+    codes = ["d"]
+    for name in names:
+        for code, field_name, nested, _ in plan.fields:
+            if field_name == name:
+                codes.append(code)
+                plan = nested
+                break
+        else:
+            raise KeyError(f"No field {name!r} in packet {packet_id}.")
+    return ".".join(codes)
@@ -0,0 +1,521 @@
+"""Export sessions to Parquet or Arrow IPC files for analytics.
+
+Every packet type becomes its own table with one row per car, so a car
+array of 22 entries turns into 22 rows. The header fields the rows need
+are hoisted into columns of their own and the column types come from the
+struct formats of the parser layouts, e.g. ``H`` becomes uint16 and ``f``
+float32. Tables are partitioned by session:
+
+    <output>/car_telemetry/session_uid=<uid>/part-00000.parquet
+
+Rows are buffered per table and session and written as a row group once
+``F1_EXPORT_ROW_GROUP_SIZE`` rows are buffered, so memory stays bounded
+however long the session is. Packets can come from a capture file, from
+the packet collections of a session in MongoDB, or straight from the
+ingest as a subscriber next to MongoDB when ``F1_EXPORT_DIR`` is set.
+
+The live export writes smaller row groups of ``F1_EXPORT_LIVE_ROW_GROUP_SIZE``
+rows and closes the files of a session once its final classification
+arrives or no packet came for ``F1_EXPORT_IDLE_TIMEOUT`` seconds, so
+finished sessions neither hold buffered rows nor open writers and only the
+sessions still running are lost in a crash.
+
+Needs pyarrow.
+"""
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from f1_telemetry.data.capture import read_capture
+from f1_telemetry.data.compact import decode_document
+from f1_telemetry.data.struct_parsers import (
+    PACKET_CAR_DAMAGE_DATA_LAYOUT,
+    PACKET_CAR_SETUP_DATA_LAYOUT,
+    PACKET_CAR_STATUS_DATA_LAYOUT,
+    PACKET_CAR_TELEMETRY_DATA_LAYOUT,
+    PACKET_EVENT_DATA_LAYOUT,
+    PACKET_FINAL_CLASSIFICATION_DATA_LAYOUT,
+    PACKET_HEADER_LAYOUT,
+    PACKET_LAP_DATA_LAYOUT,
+    PACKET_LOBBY_INFO_DATA_LAYOUT,
+    PACKET_MOTION_DATA_LAYOUT,
+    PACKET_MOTION_EX_DATA_LAYOUT,
+    PACKET_PARTICIPANTS_DATA_LAYOUT,
+    PACKET_SESSION_DATA_LAYOUT,
+    PACKET_SESSION_HISTORY_DATA_LAYOUT,
+    PACKET_TYRE_SETS_DATA_LAYOUT,
+)
+from f1_telemetry.data.packet_schema import RecordLayout
+from f1_telemetry.data.timeseries import int64_session_uid
+from f1_telemetry.data.udp_stream import parse_packet
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+load_dotenv()
+
+# Directory the ingest exports to next to MongoDB, disabled if empty.
+F1_EXPORT_DIR = str(os.environ.get("F1_EXPORT_DIR", ""))
+# "parquet" or "arrow" for Arrow IPC files.
+F1_EXPORT_FORMAT = str(os.environ.get("F1_EXPORT_FORMAT", "parquet"))
+F1_EXPORT_ROW_GROUP_SIZE = int(os.environ.get("F1_EXPORT_ROW_GROUP_SIZE", 65536))
+F1_EXPORT_COMPRESSION = str(os.environ.get("F1_EXPORT_COMPRESSION", "zstd"))
+F1_EXPORT_LIVE_ROW_GROUP_SIZE = int(
+    os.environ.get("F1_EXPORT_LIVE_ROW_GROUP_SIZE", 4096)
+)
+# Seconds without a packet after which the live export closes a session.
+F1_EXPORT_IDLE_TIMEOUT = float(os.environ.get("F1_EXPORT_IDLE_TIMEOUT", 60))
+
+PARQUET = "parquet"
+ARROW = "arrow"
+FILE_EXTENSIONS = {PARQUET: ".parquet", ARROW: ".arrow"}
+FINAL_CLASSIFICATION_PACKET_ID = 8
+
+# Table name, layout, array exploded into rows and the column of the row's
+# position in that array. Session, event, session history and motion ex
+# packets are one row per packet.
+EXPORT_TABLES = {
+    0: ("motion", PACKET_MOTION_DATA_LAYOUT, "m_carMotionData", "car_index"),
+    1: ("session", PACKET_SESSION_DATA_LAYOUT, None, None),
+    2: ("lap", PACKET_LAP_DATA_LAYOUT, "m_lapData", "car_index"),
+    3: ("event", PACKET_EVENT_DATA_LAYOUT, None, None),
+    4: ("participants", PACKET_PARTICIPANTS_DATA_LAYOUT, "m_participants", "car_index"),
+    5: ("car_setup", PACKET_CAR_SETUP_DATA_LAYOUT, "m_carSetups", "car_index"),
+    6: (
+        "car_telemetry",
+        PACKET_CAR_TELEMETRY_DATA_LAYOUT,
+        "m_carTelemetryData",
+        "car_index",
+    ),
+    7: ("car_status", PACKET_CAR_STATUS_DATA_LAYOUT, "m_carStatusData", "car_index"),
+    8: (
+        "final_classification",
+        PACKET_FINAL_CLASSIFICATION_DATA_LAYOUT,
+        "m_classificationData",
+        "car_index",
+    ),
+    9: ("lobby_info", PACKET_LOBBY_INFO_DATA_LAYOUT, "m_lobbyPlayers", "car_index"),
+    10: ("car_damage", PACKET_CAR_DAMAGE_DATA_LAYOUT, "m_carDamageData", "car_index"),
+    11: ("session_history", PACKET_SESSION_HISTORY_DATA_LAYOUT, None, None),
+    12: ("tyre_sets", PACKET_TYRE_SETS_DATA_LAYOUT, "m_tyreSetData", "set_index"),
+    13: ("motion_ex", PACKET_MOTION_EX_DATA_LAYOUT, None, None),
+}
+
+HEADER_COLUMNS = (
+    "m_sessionUID",
+    "m_frameIdentifier",
+    "m_overallFrameIdentifier",
+    "m_sessionTime",
+    "m_playerCarIndex",
+)
+INGESTED_AT = "ingested_at"
+
+ARROW_TYPES = {
+    "B": "uint8",
+    "b": "int8",
+    "H": "uint16",
+    "h": "int16",
+    "I": "uint32",
+    "L": "uint32",
+    "i": "int32",
+    "l": "int32",
+    "Q": "uint64",
+    "q": "int64",
+    "f": "float32",
+    "d": "float64",
+    "?": "bool_",
+}
+
+
+def arrow_type(kind, count: int = None):
+    """Arrow type of a layout field.
+
+    Args:
+        kind: Struct format code, string format such as "48s" or a nested
+            RecordLayout.
+        count (int): Array length, None for a single value.
+
+    Returns:
+        pyarrow.DataType: Scalar, struct or fixed-size list type.
+    """
+    if isinstance(kind, RecordLayout):
+        value_type = pa.struct(
+            [pa.field(name, arrow_type(*field)) for name, *field in kind.fields]
+        )
+    elif kind.endswith("s"):
+        value_type = pa.string()
+    else:
+        value_type = getattr(pa, ARROW_TYPES[kind])()
+    return value_type if count is None else pa.list_(value_type, count)
+
+
+class PacketTable:
+    """Schema of one packet type's table and its rows.
+
+    Args:
+        name (str): Table name, the directory the table is written to.
+        layout (RecordLayout): Layout of the packet.
+        rows_field (str): Array of the packet exploded into rows, one row
+            per packet if None.
+        index_column (str): Column of a row's position in that array.
+
+    Attributes:
+        schema (pyarrow.Schema): Header columns, the row index, the
+            remaining packet fields and the fields of the exploded array.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        layout: RecordLayout,
+        rows_field: str = None,
+        index_column: str = None,
+    ):
+        self.name = name
+        self.rows_field = rows_field
+        header_kinds = {name: kind for name, kind, _ in PACKET_HEADER_LAYOUT.fields}
+        fields = [pa.field(name, arrow_type(header_kinds[name])) for name in HEADER_COLUMNS]
+        fields.append(pa.field(INGESTED_AT, pa.timestamp("us")))
+        if rows_field is not None:
+            fields.append(pa.field(index_column, pa.uint8()))
+        row_fields = []
+        self.packet_fields = ()
+        self.row_fields = ()
+        for name, kind, count in layout.fields:
+            if name == "m_header":
+                continue
+            if name == rows_field:
+                self.row_fields = kind.names
+                row_fields = [
+                    pa.field(row_name, arrow_type(row_kind, row_count))
+                    for row_name, row_kind, row_count in kind.fields
+                ]
+            else:
+                self.packet_fields += (name,)
+                fields.append(pa.field(name, arrow_type(kind, count)))
+        self.schema = pa.schema(fields + row_fields)
+
+    def rows(self, data: dict, ingested_at: datetime):
+        """Rows of a parsed packet or a stored packet document.
+
+        Cars that were filtered out are skipped and fields a sampler
+        dropped are null.
+
+        Returns:
+            Generator: Tuples of column values in schema order.
+        """
+        header = data["m_header"]
+        prefix = (
+            int(header["m_sessionUID"]),
+            header["m_frameIdentifier"],
+            header["m_overallFrameIdentifier"],
+            header["m_sessionTime"],
+            header["m_playerCarIndex"],
+            ingested_at,
+        )
+        packet_values = tuple(data.get(name) for name in self.packet_fields)
+        if self.rows_field is None:
+            yield prefix + packet_values
+            return
+        row_fields = self.row_fields
+        for index, record in enumerate(data[self.rows_field]):
+            if not record:
+                continue
+            yield (
+                prefix
+                + (index,)
+                + packet_values
+                + tuple(record.get(name) for name in row_fields)
+            )
+
+
+class PartitionWriter:
+    """Buffer the rows of one table partition and write them as row groups.
+
+    The file is created on the first flush, numbered after the files
+    already in the partition so earlier exports are kept.
+
+    Args:
+        directory (str): Partition directory.
+        schema (pyarrow.Schema): Table schema.
+        file_format (str): "parquet" or "arrow".
+        row_group_size (int): Rows per row group.
+
+    Attributes:
+        rows (int): Rows written.
+        row_groups (int): Row groups written.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        schema,
+        file_format: str = PARQUET,
+        row_group_size: int = F1_EXPORT_ROW_GROUP_SIZE,
+    ):
+        self.directory = directory
+        self.schema = schema
+        self.file_format = file_format
+        self.row_group_size = row_group_size
+        self.columns = [[] for _ in schema.names]
+        self.buffered = 0
+        self.rows = 0
+        self.row_groups = 0
+        self.path = None
+        self._writer = None
+
+    def add(self, values: tuple) -> None:
+        for column, value in zip(self.columns, values):
+            column.append(value)
+        self.buffered += 1
+        if self.buffered >= self.row_group_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered rows as one row group."""
+        if not self.buffered:
+            return
+        table = pa.Table.from_arrays(
+            [
+                pa.array(column, type=field.type)
+                for column, field in zip(self.columns, self.schema)
+            ],
+            schema=self.schema,
+        )
+        if self._writer is None:
+            self._open()
+        if self.file_format == PARQUET:
+            self._writer.write_table(table, row_group_size=self.buffered)
+        else:
+            self._writer.write_table(table, max_chunksize=self.buffered)
+        self.rows += self.buffered
+        self.row_groups += 1
+        self.columns = [[] for _ in self.schema.names]
+        self.buffered = 0
+
+    def _open(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        extension = FILE_EXTENSIONS[self.file_format]
+        part = len(
+            [name for name in os.listdir(self.directory) if name.endswith(extension)]
+        )
+        self.path = os.path.join(self.directory, f"part-{part:05d}{extension}")
+        if self.file_format == PARQUET:
+            self._writer = pq.ParquetWriter(
+                self.path, self.schema, compression=F1_EXPORT_COMPRESSION
+            )
+        else:
+            self._writer = pa.ipc.new_file(self.path, self.schema)
+
+    def close(self) -> None:
+        """Write what is left and close the file."""
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class SessionExporter:
+    """Write parsed packets to per-type tables partitioned by session.
+
+    ``write`` takes parsed packets as well as stored packet documents, so
+    the exporter can be fed from a capture, from MongoDB or as a fan-out
+    subscriber during the ingest.
+
+    Args:
+        output (str): Root directory of the tables.
+        file_format (str): "parquet" or "arrow".
+        row_group_size (int): Rows buffered per table and session before
+            they are written.
+        idle_timeout (float): Seconds without a packet after which a
+            session's files are closed by close_idle, never if None.
+
+    Attributes:
+        packets (int): Packets exported.
+        sessions_closed (int): Sessions whose files were closed before the
+            exporter was.
+    """
+
+    def __init__(
+        self,
+        output: str,
+        file_format: str = F1_EXPORT_FORMAT,
+        row_group_size: int = F1_EXPORT_ROW_GROUP_SIZE,
+        idle_timeout: float = None,
+    ):
+        if pa is None:
+            raise ImportError("pyarrow is required for the export.")
+        if file_format not in FILE_EXTENSIONS:
+            raise ValueError(f"Unknown export format {file_format!r}.")
+        self.output = output
+        self.file_format = file_format
+        self.row_group_size = row_group_size
+        self.idle_timeout = idle_timeout
+        self.tables = {
+            packet_id: PacketTable(*table) for packet_id, table in EXPORT_TABLES.items()
+        }
+        self.partitions = {}
+        self.packets = 0
+        self.sessions_closed = 0
+        # Partition keys of each open session, least recently written first.
+        self._sessions = OrderedDict()
+        self._last_write = {}
+        self._closed = {"rows": 0, "row_groups": 0, "files": 0}
+
+    def write(self, data: dict, ingested_at: datetime = None) -> None:
+        """Add the rows of a packet.
+
+        The session's files are closed after its final classification and,
+        with an idle timeout, those of sessions idle for longer.
+
+        Args:
+            data (dict): Parsed packet or stored packet document.
+            ingested_at (datetime): Receive time in UTC, the document's
+                _ingested_at or now if omitted.
+        """
+        header = data["m_header"]
+        packet_id = header["m_packetId"]
+        table = self.tables.get(packet_id)
+        if table is None:
+            return
+        if ingested_at is None:
+            ingested_at = data.get("_ingested_at") or datetime.utcnow()
+        session_uid = str(header["m_sessionUID"])
+        key = (packet_id, session_uid)
+        partition = self.partitions.get(key)
+        if partition is None:
+            directory = os.path.join(self.output, table.name, f"session_uid={session_uid}")
+            partition = self.partitions[key] = PartitionWriter(
+                directory, table.schema, self.file_format, self.row_group_size
+            )
+            self._sessions.setdefault(session_uid, set()).add(key)
+        for row in table.rows(data, ingested_at):
+            partition.add(row)
+        self.packets += 1
+        if self.idle_timeout is not None:
+            self._sessions.move_to_end(session_uid)
+            self._last_write[session_uid] = time.monotonic()
+            self.close_idle()
+        if packet_id == FINAL_CLASSIFICATION_PACKET_ID:
+            self.close_session(session_uid)
+
+    def close_session(self, session_uid) -> None:
+        """Write the buffered rows of a session and close its files.
+
+        Packets of the session that arrive later go to new files.
+        """
+        session_uid = str(session_uid)
+        keys = self._sessions.pop(session_uid, ())
+        self._last_write.pop(session_uid, None)
+        if not keys:
+            return
+        for key in keys:
+            partition = self.partitions.pop(key)
+            partition.close()
+            self._closed["rows"] += partition.rows
+            self._closed["row_groups"] += partition.row_groups
+            self._closed["files"] += partition.path is not None
+        self.sessions_closed += 1
+
+    def close_idle(self) -> None:
+        """Close the sessions that received no packet for idle_timeout seconds."""
+        if self.idle_timeout is None:
+            return
+        deadline = time.monotonic() - self.idle_timeout
+        while self._sessions:
+            session_uid = next(iter(self._sessions))
+            if self._last_write.get(session_uid, deadline) > deadline:
+                break
+            self.close_session(session_uid)
+
+    def close(self) -> None:
+        """Write all buffered rows and close the files."""
+        for partition in self.partitions.values():
+            partition.close()
+
+    def stats(self) -> dict:
+        """Rows, row groups and files written."""
+        partitions = self.partitions.values()
+        return {
+            "packets": self.packets,
+            "rows": self._closed["rows"]
+            + sum(partition.rows for partition in partitions),
+            "row_groups": self._closed["row_groups"]
+            + sum(partition.row_groups for partition in partitions),
+            "files": self._closed["files"]
+            + sum(partition.path is not None for partition in partitions),
+            "sessions_closed": self.sessions_closed,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def export_capture(path: str, output: str, **exporter_options) -> dict:
+    """Export a capture file.
+
+    Args:
+        path (str): Capture file.
+        output (str): Root directory of the tables.
+        **exporter_options: Passed on to SessionExporter.
+
+    Returns:
+        dict: Exporter stats with the elapsed seconds.
+    """
+    start = time.perf_counter()
+    with SessionExporter(output, **exporter_options) as exporter:
+        for timestamp_ns, message in read_capture(path):
+            data = parse_packet(message)
+            if data is None:
+                continue
+            received_at = datetime.fromtimestamp(timestamp_ns / 1e9, timezone.utc)
+            exporter.write(data, received_at.replace(tzinfo=None))
+    return {**exporter.stats(), "seconds": time.perf_counter() - start}
+
+
+def export_mongodb(
+    session_uid: int, output: str, database=None, **exporter_options
+) -> dict:
+    """Export one session from the packet collections in MongoDB.
+
+    Documents are streamed with a cursor per collection. Only the packet
+    storage layout is read, in full or compact encoding, per-car
+    measurements are not exported. Per-session and per-day collections of
+    the packet types are read as well.
+
+    Args:
+        session_uid (int): Session to export.
+        output (str): Root directory of the tables.
+        database: MongoDB database, the f1 database if omitted.
+        **exporter_options: Passed on to SessionExporter.
+
+    Returns:
+        dict: Exporter stats with the elapsed seconds.
+    """
+    from f1_telemetry.data.mongodb_ingest import get_mongo_client
+    from f1_telemetry.data.routing import session_collections
+
+    if database is None:
+        database = get_mongo_client().f1
+    start = time.perf_counter()
+    query = {
+        "$or": [
+            {"m_header.m_sessionUID": str(session_uid)},
+            {"u": int64_session_uid(session_uid)},
+        ]
+    }
+    names = database.list_collection_names()
+    with SessionExporter(output, **exporter_options) as exporter:
+        for table in exporter.tables.values():
+            for name in session_collections(names, table.name, session_uid):
+                for document in database[name].find(query, {"_id": False}):
+                    exporter.write(decode_document(document))
+    return {**exporter.stats(), "seconds": time.perf_counter() - start}
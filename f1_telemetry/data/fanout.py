@@ -0,0 +1,228 @@
+"""Fan-out of parsed packets to several consumers in the ingest process.
+
+Every datagram is parsed once and published to all subscriptions of its
+packet type. Each subscription has its own bounded queue and full-queue
+policy, so a slow consumer only ever loses or delays its own packets and
+never holds up the receiver or the other consumers, unless it opts into
+the block policy.
+
+Published packets are shared between consumers and must not be modified.
+
+    publisher = Publisher()
+    archive = publisher.subscribe("archive", policy=BLOCK)
+    dashboard = publisher.subscribe("dashboard", packet_ids=(6, 2), maxsize=64)
+    start_consumer(dashboard, live_state.update)
+    pipeline = IngestPipeline(publisher.publish)
+"""
+import queue
+import threading
+import time
+import traceback
+from f1_telemetry.data.metrics import Histogram
+from f1_telemetry.data.pipeline import (
+    DROP_OLDEST,
+    F1_QUEUE_SIZE,
+    IDLE_TIMEOUT,
+    BoundedQueue,
+    QueueClosed,
+)
+
+
+class Subscription:
+    """Bounded queue of the packets a consumer subscribed to.
+
+    Args:
+        name (str): Name of the consumer, used in the stats.
+        packet_ids (frozenset): Packet ids to receive, all if None.
+        maxsize (int): Capacity of the queue.
+        policy (str): Full-queue policy, "drop_oldest", "drop_newest" or
+            "block".
+
+    Attributes:
+        published (int): Packets offered to this subscription.
+        handled (int): Packets its consumer handled.
+        errors (int): Packets its consumer failed on.
+        first_error (Exception): First exception of its consumer, None if
+            it never failed.
+        lag (Histogram): Time packets waited in the queue.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        packet_ids: frozenset = None,
+        maxsize: int = F1_QUEUE_SIZE,
+        policy: str = DROP_OLDEST,
+    ):
+        self.name = name
+        self.packet_ids = packet_ids
+        self.queue = BoundedQueue(maxsize, policy)
+        self.published = 0
+        self.handled = 0
+        self.errors = 0
+        self.first_error = None
+        self.lag = Histogram()
+
+    def accepts(self, packet_id: int) -> bool:
+        return self.packet_ids is None or packet_id in self.packet_ids
+
+    def put(self, data: dict) -> bool:
+        self.published += 1
+        return self.queue.put((time.perf_counter_ns(), data))
+
+    def get(self, timeout: float = None) -> dict:
+        """Next packet, see BoundedQueue.get."""
+        published_ns, data = self.queue.get(timeout)
+        self.lag.observe_ns(time.perf_counter_ns() - published_ns)
+        return data
+
+    def __iter__(self):
+        while True:
+            try:
+                yield self.get()
+            except QueueClosed:
+                return
+
+    def close(self) -> None:
+        self.queue.close()
+
+    def stats(self) -> dict:
+        return {
+            "published": self.published,
+            "handled": self.handled,
+            "errors": self.errors,
+            "dropped": self.queue.dropped,
+            "queued": len(self.queue),
+            "high_water": self.queue.high_water,
+        }
+
+
+class Publisher:
+    """Route parsed packets to the subscriptions of their packet type.
+
+    The routing table per packet id is rebuilt on every (un)subscribe, so
+    publishing needs no lock and only touches the matching subscriptions.
+    """
+
+    def __init__(self):
+        self.subscriptions = ()
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def subscribe(
+        self,
+        name: str,
+        packet_ids=None,
+        maxsize: int = F1_QUEUE_SIZE,
+        policy: str = DROP_OLDEST,
+    ) -> Subscription:
+        """Add a subscription.
+
+        Args:
+            name (str): Name of the consumer.
+            packet_ids (iterable): Packet ids to receive, all if None.
+            maxsize (int): Capacity of the subscription's queue.
+            policy (str): Full-queue policy of the subscription's queue.
+
+        Returns:
+            Subscription: Queue to consume from.
+        """
+        if packet_ids is not None:
+            packet_ids = frozenset(packet_ids)
+        subscription = Subscription(name, packet_ids, maxsize, policy)
+        with self._lock:
+            self.subscriptions = self.subscriptions + (subscription,)
+            self._routes = {}
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscription and close its queue."""
+        with self._lock:
+            self.subscriptions = tuple(
+                other for other in self.subscriptions if other is not subscription
+            )
+            self._routes = {}
+        subscription.close()
+
+    def publish(self, data: dict) -> None:
+        """Offer a parsed packet to all subscriptions of its packet type."""
+        packet_id = data["m_header"]["m_packetId"]
+        routes = self._routes
+        subscriptions = routes.get(packet_id)
+        if subscriptions is None:
+            subscriptions = tuple(
+                subscription
+                for subscription in self.subscriptions
+                if subscription.accepts(packet_id)
+            )
+            routes[packet_id] = subscriptions
+        for subscription in subscriptions:
+            subscription.put(data)
+
+    def close(self) -> None:
+        """Close all subscriptions, consumers stop once they drained them."""
+        for subscription in self.subscriptions:
+            subscription.close()
+
+    def stats(self) -> dict:
+        """Counters per subscription."""
+        return {
+            subscription.name: subscription.stats()
+            for subscription in self.subscriptions
+        }
+
+
+def consume(subscription: Subscription, handle_packet, on_idle=None) -> dict:
+    """Hand the packets of a subscription to a callback until it is closed.
+
+    A packet the callback fails on is counted in the subscription's errors
+    and skipped. The first exception is printed with its traceback and kept
+    as the subscription's first_error.
+
+    Args:
+        subscription (Subscription): Subscription to consume.
+        handle_packet (callable): Called with every packet.
+        on_idle (callable): Called whenever no packet arrived for a short
+            while, e.g. to flush time-based buffers.
+
+    Returns:
+        dict: Handled packets and errors.
+    """
+    while True:
+        try:
+            packet = subscription.get(IDLE_TIMEOUT)
+        except queue.Empty:
+            if on_idle is not None:
+                on_idle()
+            continue
+        except QueueClosed:
+            break
+        try:
+            handle_packet(packet)
+            subscription.handled += 1
+        except Exception as error:
+            subscription.errors += 1
+            if subscription.first_error is None:
+                subscription.first_error = error
+                print(f"Consumer {subscription.name} failed, skipping its failing packets:")
+                traceback.print_exc()
+    return {"handled": subscription.handled, "errors": subscription.errors}
+
+
+def start_consumer(
+    subscription: Subscription, handle_packet, on_idle=None
+) -> threading.Thread:
+    """Run consume in a thread named after the subscription.
+
+    Returns:
+        threading.Thread: Started thread, it ends once the subscription is
+        closed and drained.
+    """
+    thread = threading.Thread(
+        target=consume,
+        args=(subscription, handle_packet, on_idle),
+        name=f"f1-{subscription.name}",
+        daemon=True,
+    )
+    thread.start()
+    return thread
@@ -0,0 +1,354 @@
+"""Append-only local segment files as an ingest sink without MongoDB.
+
+A sink is what ``store_packet`` writes to: ``write(collection, document)``
+buffers a document, ``flush_if_due()``, ``flush()`` and ``close()`` write
+them, and ``flushed``, ``failed``, ``pending`` and ``flush_latency`` are
+exposed for stats and metrics. BufferedMongoWriter is the MongoDB sink,
+FileSink the local one.
+
+FileSink buffers documents per collection like the MongoDB writer and
+appends every flushed buffer as one block to the current segment file:
+
+    segment: magic, blocks
+    block:   1 byte collection name length, 4 byte document count,
+             4 byte payload length, collection name, zlib compressed
+             concatenation of the BSON encoded documents
+
+Segments are rotated once they reach ``F1_SEGMENT_SIZE`` bytes and a
+small JSON index with the documents per collection is written next to
+every closed segment. A block is only complete once it was fully written,
+so a segment cut short by a crash loses the last block at most. Documents
+get their ``_id`` when they are encoded, so loading a segment twice inserts
+nothing new. Time-series collections don't enforce a unique ``_id``, their
+documents are checked against the stored ones before they are inserted.
+"""
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import defaultdict
+from dotenv import load_dotenv
+from f1_telemetry.data.metrics import Histogram
+
+try:
+    import bson
+    from bson.codec_options import CodecOptions
+    from bson.raw_bson import RawBSONDocument
+except ImportError:
+    bson = None
+
+load_dotenv()
+
+F1_SINK_DIR = str(os.environ.get("F1_SINK_DIR", "segments"))
+F1_SEGMENT_SIZE = int(os.environ.get("F1_SEGMENT_SIZE", 64 * 1024 * 1024))
+
+SEGMENT_MAGIC = b"F1SEG1\n\x00"
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".f1seg"
+INDEX_SUFFIX = ".json"
+BLOCK_HEADER = struct.Struct("<BII")
+COMPRESSION_LEVEL = 1
+LOAD_FLUSH_SIZE = 2000
+
+
+def segment_paths(directory: str) -> list:
+    """Segment files of a directory in write order."""
+    if not os.path.isdir(directory):
+        return []
+    return [
+        os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+    ]
+
+
+class FileSink:
+    """Append documents to rotating, compressed local segment files.
+
+    Writes are serialized with a lock, so consumers on several threads can
+    share one sink.
+
+    Args:
+        directory (str): Directory of the segments, created if missing.
+            Numbering continues after the segments already in it.
+        segment_size (int): Bytes after which a new segment is started.
+        flush_size (int): Documents per collection buffered before a block
+            is written.
+        flush_interval (float): Seconds after which all buffers are written.
+
+    Attributes:
+        flushed (int): Documents written to segments.
+        failed (int): Always 0, kept for the sink interface.
+        flushes (int): Blocks written.
+        written_bytes (int): Compressed bytes written, headers included.
+        encoded_bytes (int): BSON bytes before compression.
+        segments (int): Segments started by this sink.
+        flush_latency (Histogram): Duration of encoding and writing a block.
+        stored_latency (Histogram): Time from receive until a document was
+            written, for writes that carry their receive time.
+    """
+
+    def __init__(
+        self,
+        directory: str = F1_SINK_DIR,
+        segment_size: int = F1_SEGMENT_SIZE,
+        flush_size: int = 500,
+        flush_interval: float = 1.0,
+    ):
+        if bson is None:
+            raise ImportError("bson from pymongo is required for the file sink.")
+        if flush_size < 1:
+            raise ValueError("flush_size must be at least 1.")
+        self.directory = directory
+        self.segment_size = segment_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.flushed = 0
+        self.failed = 0
+        self.flushes = 0
+        self.written_bytes = 0
+        self.encoded_bytes = 0
+        self.segments = 0
+        self.flush_latency = Histogram()
+        self.stored_latency = Histogram()
+        self._buffers = defaultdict(list)
+        self._received = defaultdict(list)
+        self._lock = threading.RLock()
+        self._last_flush = time.monotonic()
+        self._file = None
+        self._path = None
+        self._segment_bytes = 0
+        self._segment_documents = defaultdict(int)
+        os.makedirs(directory, exist_ok=True)
+        existing = segment_paths(directory)
+        self._next_segment = (
+            int(os.path.basename(existing[-1])[len(SEGMENT_PREFIX) : -len(SEGMENT_SUFFIX)])
+            + 1
+            if existing
+            else 0
+        )
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered documents not yet written."""
+        return sum(len(buffer) for buffer in list(self._buffers.values()))
+
+    def write(self, collection: str, document: dict, received_ns: int = None) -> None:
+        """Buffer a document and flush if a size or time limit is hit.
+
+        Args:
+            collection (str): Target collection name.
+            document (dict): Document to store.
+            received_ns (int): perf_counter_ns receive time of the packet,
+                observed in stored_latency once the document is written.
+        """
+        with self._lock:
+            buffer = self._buffers[collection]
+            buffer.append(document)
+            if received_ns is not None:
+                self._received[collection].append(received_ns)
+            if len(buffer) >= self.flush_size:
+                self._flush_collection(collection)
+            self.flush_if_due()
+
+    def write_operation(self, collection: str, operation, received_ns: int = None) -> None:
+        """Update operations can't be replayed from a segment.
+
+        Raises:
+            ValueError: Always, the file sink only stores documents.
+        """
+        raise ValueError(
+            "The file sink stores documents only, per-car buckets need MongoDB."
+        )
+
+    def flush_if_due(self) -> None:
+        """Flush all collections if the flush interval has elapsed."""
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all buffered documents."""
+        with self._lock:
+            for collection in list(self._buffers):
+                self._flush_collection(collection)
+            if self._file is not None:
+                self._file.flush()
+            self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        """Flush remaining documents and close the current segment."""
+        with self._lock:
+            self.flush()
+            self._close_segment()
+
+    def _flush_collection(self, collection: str) -> None:
+        documents = self._buffers.pop(collection, None)
+        if not documents:
+            return
+        started = time.perf_counter()
+        encode = bson.encode
+        encoded = []
+        for document in documents:
+            if "_id" not in document:
+                document["_id"] = bson.ObjectId()
+            encoded.append(encode(document))
+        payload = b"".join(encoded)
+        compressed = zlib.compress(payload, COMPRESSION_LEVEL)
+        name = collection.encode()
+        if self._file is None:
+            self._open_segment()
+        block = BLOCK_HEADER.pack(len(name), len(documents), len(compressed))
+        self._file.write(block + name + compressed)
+        size = len(block) + len(name) + len(compressed)
+        self._segment_bytes += size
+        self._segment_documents[collection] += len(documents)
+        self.written_bytes += size
+        self.encoded_bytes += len(payload)
+        self.flushed += len(documents)
+        self.flushes += 1
+        self.flush_latency.observe(time.perf_counter() - started)
+        received = self._received.pop(collection, None)
+        if received:
+            self.stored_latency.observe_since(received)
+        if self._segment_bytes >= self.segment_size:
+            self._close_segment()
+
+    def _open_segment(self) -> None:
+        self._path = os.path.join(
+            self.directory, f"{SEGMENT_PREFIX}{self._next_segment:06d}{SEGMENT_SUFFIX}"
+        )
+        self._next_segment += 1
+        self._file = open(self._path, "xb")
+        self._file.write(SEGMENT_MAGIC)
+        self._segment_bytes = len(SEGMENT_MAGIC)
+        self._segment_documents = defaultdict(int)
+        self.segments += 1
+
+    def _close_segment(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        with open(self._path + INDEX_SUFFIX, "w") as index_file:
+            json.dump(
+                {
+                    "bytes": self._segment_bytes,
+                    "documents": dict(self._segment_documents),
+                },
+                index_file,
+            )
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_segment(path: str, raw: bool = False):
+    """Read the blocks of a segment file.
+
+    A block cut short at the end of the file is ignored.
+
+    Args:
+        path (str): Segment file.
+        raw (bool): Return RawBSONDocument objects, which insert_many sends
+            without decoding and re-encoding them.
+
+    Returns:
+        Generator: Tuples of collection name and list of documents.
+    """
+    if bson is None:
+        raise ImportError("bson from pymongo is required to read segments.")
+    codec_options = CodecOptions(document_class=RawBSONDocument) if raw else None
+    with open(path, "rb") as segment_file:
+        if segment_file.read(len(SEGMENT_MAGIC)) != SEGMENT_MAGIC:
+            raise ValueError(f"{path} is not an F1 segment file.")
+        while True:
+            header = segment_file.read(BLOCK_HEADER.size)
+            if len(header) < BLOCK_HEADER.size:
+                return
+            name_length, _, payload_length = BLOCK_HEADER.unpack(header)
+            name = segment_file.read(name_length)
+            compressed = segment_file.read(payload_length)
+            if len(name) < name_length or len(compressed) < payload_length:
+                return
+            payload = zlib.decompress(compressed)
+            if codec_options is None:
+                documents = bson.decode_all(payload)
+            else:
+                documents = bson.decode_all(payload, codec_options)
+            yield name.decode(), documents
+
+
+def stored_ids(collection, documents) -> set:
+    """_ids of a block's documents that are already stored in a collection."""
+    ids = [document["_id"] for document in documents]
+    return {
+        document["_id"]
+        for document in collection.find({"_id": {"$in": ids}}, {"_id": True})
+    }
+
+
+def load_segments(directory: str = F1_SINK_DIR, database=None) -> dict:
+    """Load the segments of a file sink into MongoDB.
+
+    Documents keep the _id they got when they were written, so documents
+    that are already stored are rejected and counted as failed. Per-car
+    time-series collections accept duplicate _ids, so documents already
+    stored there are looked up per block and skipped instead. Packet
+    collections, routed ones included, get their indexes.
+
+    Args:
+        directory (str): Segment directory.
+        database: MongoDB database. If omitted, the f1 database is set up
+            like for the ingest and used.
+
+    Returns:
+        dict: Segments read, documents stored, rejected and skipped as
+        duplicates, elapsed seconds.
+    """
+    from f1_telemetry.data.mongodb_ingest import (
+        BufferedMongoWriter,
+        create_per_car_store,
+        create_router,
+        get_mongo_client,
+        verify_mongodb_setup,
+    )
+    from f1_telemetry.data.timeseries import TIMESERIES_SUFFIX
+
+    if database is None:
+        verify_mongodb_setup()
+        create_per_car_store()
+        database = get_mongo_client().f1
+    start = time.perf_counter()
+    paths = segment_paths(directory)
+    router = create_router(database)
+    collections = set()
+    duplicates = 0
+    with BufferedMongoWriter(database, flush_size=LOAD_FLUSH_SIZE) as writer:
+        for path in paths:
+            for collection, documents in read_segment(path, raw=True):
+                if collection not in collections:
+                    collections.add(collection)
+                    router.ensure_indexes(collection)
+                if collection.endswith(TIMESERIES_SUFFIX):
+                    stored = stored_ids(database[collection], documents)
+                    if stored:
+                        duplicates += len(stored)
+                        documents = [
+                            document
+                            for document in documents
+                            if document["_id"] not in stored
+                        ]
+                for document in documents:
+                    writer.write(collection, document)
+    return {
+        "segments": len(paths),
+        "stored": writer.flushed,
+        "failed": writer.failed,
+        "duplicates": duplicates,
+        "seconds": time.perf_counter() - start,
+    }
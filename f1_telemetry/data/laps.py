@@ -0,0 +1,297 @@
+"""Per-car lap summaries aggregated while packets arrive.
+
+Lap packets tell which lap each car is on, telemetry and status packets are
+accumulated into that lap. When a car's lap number goes up, or the final
+classification arrives, the finished lap is summarized once: lap and sector
+times, speed, throttle and brake statistics, tyre temperature ranges and
+fuel used. Summaries go to the ``lap_summary`` collection.
+
+The time of a lap is the last lap time of the lap packets once the car is
+on the next lap. The final lap has no next lap, its time is taken from the
+lap packets if they already carry it, otherwise from the total race time of
+the final classification minus the laps before it. Sessions without a
+final classification are forgotten once more than ``MAX_SESSIONS`` newer
+sessions sent lap packets.
+"""
+import os
+from collections import OrderedDict
+from dotenv import load_dotenv
+from pymongo import ASCENDING
+
+load_dotenv()
+
+F1_LAP_SUMMARY = str(os.environ.get("F1_LAP_SUMMARY", "1")) not in ("0", "false", "")
+
+LAP_SUMMARY_COLLECTION = "lap_summary"
+LAP_SUMMARY_PACKET_IDS = frozenset((2, 6, 7, 8))
+CORNERS = ("RL", "RR", "FL", "FR")
+SURFACE_TEMPERATURES = tuple(f"m_tyresSurfaceTemperature{corner}" for corner in CORNERS)
+INNER_TEMPERATURES = tuple(f"m_tyresInnerTemperature{corner}" for corner in CORNERS)
+FULL_THROTTLE = 0.99
+MAX_SESSIONS = 64
+
+
+def setup_lap_summary(database) -> None:
+    """Create the index for per-driver lap queries on lap_summary."""
+    database[LAP_SUMMARY_COLLECTION].create_index(
+        [("session_uid", ASCENDING), ("car_index", ASCENDING), ("lap", ASCENDING)]
+    )
+
+
+def _sector_ms(lap: dict, sector: int) -> int:
+    return (
+        lap[f"m_sector{sector}TimeMinutes"] * 60000 + lap[f"m_sector{sector}TimeInMS"]
+    )
+
+
+class LapAccumulator:
+    """Running statistics of one car on one lap.
+
+    Args:
+        lap_number (int): Lap number.
+        session_time (float): Session time of the first lap packet.
+        previous_lap_ms (int): Last lap time when the lap started, the time
+            of the lap before.
+    """
+
+    def __init__(self, lap_number: int, session_time: float, previous_lap_ms: int = 0):
+        self.lap_number = lap_number
+        self.previous_lap_ms = previous_lap_ms
+        self.started_at = session_time
+        self.ended_at = session_time
+        self.samples = 0
+        self.speed_min = None
+        self.speed_max = None
+        self.speed_sum = 0
+        self.throttle_sum = 0.0
+        self.full_throttle = 0
+        self.brake_sum = 0.0
+        self.braking = 0
+        self.surface_temperatures = [[None, None] for _ in CORNERS]
+        self.inner_temperatures = [[None, None] for _ in CORNERS]
+        self.fuel_start = None
+        self.fuel_end = None
+        self.sector1_ms = 0
+        self.sector2_ms = 0
+        self.invalid = False
+        self.pitted = False
+
+    def add_lap(self, lap: dict, session_time: float) -> None:
+        self.ended_at = session_time
+        if lap["m_sector1TimeInMS"] or lap["m_sector1TimeMinutes"]:
+            self.sector1_ms = _sector_ms(lap, 1)
+        if lap["m_sector2TimeInMS"] or lap["m_sector2TimeMinutes"]:
+            self.sector2_ms = _sector_ms(lap, 2)
+        self.invalid = self.invalid or bool(lap["m_currentLapInvalid"])
+        self.pitted = self.pitted or bool(lap["m_pitStatus"])
+
+    def add_telemetry(self, telemetry: dict) -> None:
+        speed = telemetry["m_speed"]
+        throttle = telemetry["m_throttle"]
+        brake = telemetry["m_brake"]
+        self.samples += 1
+        self.speed_sum += speed
+        if self.speed_min is None or speed < self.speed_min:
+            self.speed_min = speed
+        if self.speed_max is None or speed > self.speed_max:
+            self.speed_max = speed
+        self.throttle_sum += throttle
+        self.full_throttle += throttle >= FULL_THROTTLE
+        self.brake_sum += brake
+        self.braking += brake > 0
+        _update_ranges(self.surface_temperatures, telemetry, SURFACE_TEMPERATURES)
+        _update_ranges(self.inner_temperatures, telemetry, INNER_TEMPERATURES)
+
+    def add_status(self, status: dict) -> None:
+        fuel = status["m_fuelInTank"]
+        if self.fuel_start is None:
+            self.fuel_start = fuel
+        self.fuel_end = fuel
+
+    def summary(self, session_uid: int, car_index: int, lap_time_ms: int) -> dict:
+        """Summary document of the finished lap, lap_time_ms None if unknown."""
+        samples = self.samples or 1
+        sector3_ms = None
+        if lap_time_ms is not None and self.sector1_ms and self.sector2_ms:
+            sector3_ms = lap_time_ms - self.sector1_ms - self.sector2_ms
+        return {
+            "session_uid": str(session_uid),
+            "car_index": car_index,
+            "lap": self.lap_number,
+            "lap_time_ms": lap_time_ms,
+            "sector1_ms": self.sector1_ms,
+            "sector2_ms": self.sector2_ms,
+            "sector3_ms": sector3_ms,
+            "invalid": self.invalid,
+            "pitted": self.pitted,
+            "started_at": self.started_at,
+            "ended_at": self.ended_at,
+            "samples": self.samples,
+            "speed_min": self.speed_min,
+            "speed_max": self.speed_max,
+            "speed_avg": self.speed_sum / samples if self.samples else None,
+            "throttle_avg_pct": 100 * self.throttle_sum / samples,
+            "full_throttle_pct": 100 * self.full_throttle / samples,
+            "brake_avg_pct": 100 * self.brake_sum / samples,
+            "braking_pct": 100 * self.braking / samples,
+            "tyre_surface_temperature": _ranges(self.surface_temperatures),
+            "tyre_inner_temperature": _ranges(self.inner_temperatures),
+            "fuel_start": self.fuel_start,
+            "fuel_end": self.fuel_end,
+            "fuel_used": (
+                self.fuel_start - self.fuel_end if self.fuel_start is not None else None
+            ),
+        }
+
+
+def _update_ranges(ranges: list, telemetry: dict, fields: tuple) -> None:
+    for value_range, field in zip(ranges, fields):
+        value = telemetry[field]
+        if value_range[0] is None or value < value_range[0]:
+            value_range[0] = value
+        if value_range[1] is None or value > value_range[1]:
+            value_range[1] = value
+
+
+def _ranges(ranges: list) -> dict:
+    return {
+        corner: {"min": low, "max": high}
+        for corner, (low, high) in zip(CORNERS, ranges)
+    }
+
+
+class CarLaps:
+    """Open lap and finished lap times of one car in one session.
+
+    Attributes:
+        open (LapAccumulator): Lap the car is on, None before its first lap
+            packet.
+        last_lap_ms (int): m_lastLapTimeInMS of the latest lap packet.
+        raced_ms (int): Sum of the times of the first ``raced_laps`` laps,
+            only kept while every lap from lap 1 was summarized.
+    """
+
+    def __init__(self):
+        self.open = None
+        self.last_lap_ms = 0
+        self.raced_ms = 0
+        self.raced_laps = 0
+
+
+class LapAggregator:
+    """Build per-car lap summaries incrementally from parsed packets.
+
+    Sessions are kept in the order of their last lap packet and the idlest
+    one is forgotten once more than ``max_sessions`` are open.
+
+    Args:
+        on_lap (callable): Called with every finished lap's summary.
+        max_sessions (int): Sessions with open laps kept.
+
+    Attributes:
+        laps (int): Summaries emitted.
+        evicted (int): Sessions forgotten without a final classification.
+    """
+
+    def __init__(self, on_lap, max_sessions: int = MAX_SESSIONS):
+        self.on_lap = on_lap
+        self.max_sessions = max_sessions
+        self.laps = 0
+        self.evicted = 0
+        self._sessions = OrderedDict()
+
+    def update(self, data: dict) -> None:
+        """Apply a parsed packet with the raw header."""
+        header = data["m_header"]
+        packet_id = header["m_packetId"]
+        session_uid = header["m_sessionUID"]
+        session_time = header["m_sessionTime"]
+        if packet_id == 2:
+            self._update_laps(session_uid, session_time, data["m_lapData"])
+        elif packet_id == 6:
+            cars = self._sessions.get(session_uid)
+            if cars is None:
+                return
+            for car_index, telemetry in enumerate(data["m_carTelemetryData"]):
+                car = cars.get(car_index)
+                if telemetry and car is not None:
+                    car.open.add_telemetry(telemetry)
+        elif packet_id == 7:
+            cars = self._sessions.get(session_uid)
+            if cars is None:
+                return
+            for car_index, status in enumerate(data["m_carStatusData"]):
+                car = cars.get(car_index)
+                if status and car is not None:
+                    car.open.add_status(status)
+        elif packet_id == 8:
+            self._finish_session(session_uid, data["m_classificationData"])
+
+    def _session(self, session_uid: int) -> dict:
+        cars = self._sessions.get(session_uid)
+        if cars is None:
+            cars = self._sessions[session_uid] = {}
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+        else:
+            self._sessions.move_to_end(session_uid)
+        return cars
+
+    def _update_laps(self, session_uid: int, session_time: float, laps: list) -> None:
+        cars = self._session(session_uid)
+        for car_index, lap in enumerate(laps):
+            if not lap or not lap["m_currentLapNum"]:
+                continue
+            car = cars.get(car_index)
+            if car is None:
+                car = cars[car_index] = CarLaps()
+            lap_number = lap["m_currentLapNum"]
+            car.last_lap_ms = lap["m_lastLapTimeInMS"]
+            accumulator = car.open
+            if accumulator is not None and lap_number > accumulator.lap_number:
+                self._emit(session_uid, car_index, car, car.last_lap_ms)
+                accumulator = None
+            if accumulator is None or lap_number < accumulator.lap_number:
+                if accumulator is not None:
+                    # Restarted, the laps raced so far don't count.
+                    car.raced_ms = car.raced_laps = 0
+                accumulator = car.open = LapAccumulator(
+                    lap_number, session_time, car.last_lap_ms
+                )
+            accumulator.add_lap(lap, session_time)
+
+    def _finish_session(self, session_uid: int, classification: list) -> None:
+        cars = self._sessions.pop(session_uid, None)
+        if cars is None:
+            return
+        for car_index, result in enumerate(classification):
+            car = cars.get(car_index)
+            if car is None or not result:
+                continue
+            # The last lap is complete if it is within the classified laps.
+            if car.open.lap_number <= result["m_numLaps"]:
+                self._emit(session_uid, car_index, car, self._final_lap_ms(car, result))
+
+    @staticmethod
+    def _final_lap_ms(car: CarLaps, result: dict) -> int:
+        """Time of the final lap of a car, None if it can't be told."""
+        accumulator = car.open
+        if car.last_lap_ms != accumulator.previous_lap_ms:
+            # The lap packets already carry the time of the final lap.
+            return car.last_lap_ms
+        if result["m_numLaps"] == 1:
+            return result["m_bestLapTimeInMS"]
+        if result["m_totalRaceTime"] and car.raced_laps == accumulator.lap_number - 1:
+            return round(result["m_totalRaceTime"] * 1000) - car.raced_ms
+        return None
+
+    def _emit(
+        self, session_uid: int, car_index: int, car: CarLaps, lap_time_ms: int
+    ) -> None:
+        accumulator = car.open
+        if lap_time_ms is not None and car.raced_laps == accumulator.lap_number - 1:
+            car.raced_ms += lap_time_ms
+            car.raced_laps += 1
+        self.laps += 1
+        self.on_lap(accumulator.summary(session_uid, car_index, lap_time_ms))
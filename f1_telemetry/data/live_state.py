@@ -0,0 +1,227 @@
+"""In-memory latest state per session, served over local HTTP.
+
+The ingest updates a LiveState from every parsed packet, before sampling,
+so dashboards can read each car's current telemetry, lap, status, damage
+and participant name without querying MongoDB. The state is served as JSON:
+
+    GET /sessions                        known sessions, newest first
+    GET /state                           newest session
+    GET /state/<session_uid>             one session
+    GET /state/<session_uid>/cars/<i>    one car of a session
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+load_dotenv()
+
+F1_LIVE_STATE_ADDRESS = str(os.environ.get("F1_LIVE_STATE_ADDRESS", "127.0.0.1"))
+# Port of the live state endpoint, disabled if empty.
+F1_LIVE_STATE_PORT = str(os.environ.get("F1_LIVE_STATE_PORT", ""))
+
+NUMBER_OF_CARS = 22
+
+# Packet id mapped to the car array and the key it is stored under per car.
+CAR_PACKETS = {
+    2: ("m_lapData", "lap"),
+    6: ("m_carTelemetryData", "telemetry"),
+    7: ("m_carStatusData", "status"),
+    10: ("m_carDamageData", "damage"),
+}
+SESSION_PACKET_ID = 1
+PARTICIPANTS_PACKET_ID = 4
+LIVE_STATE_PACKET_IDS = frozenset(CAR_PACKETS) | {SESSION_PACKET_ID, PARTICIPANTS_PACKET_ID}
+# Only the latest packets matter, so a short queue is enough.
+LIVE_STATE_QUEUE_SIZE = 256
+MAX_SESSIONS = 64
+
+
+class SessionState:
+    """Latest state of one session."""
+
+    def __init__(self, session_uid: str):
+        self.session_uid = session_uid
+        self.session = None
+        self.player_car_index = None
+        self.session_time = None
+        self.frame = None
+        self.updated_at = None
+        self.cars = [{} for _ in range(NUMBER_OF_CARS)]
+        self.version = 0
+        self._json = None
+        self._json_version = -1
+
+    def to_dict(self) -> dict:
+        return {
+            "session_uid": self.session_uid,
+            "session": self.session,
+            "player_car_index": self.player_car_index,
+            "session_time": self.session_time,
+            "frame": self.frame,
+            "updated_at": self.updated_at,
+            "cars": self.cars,
+        }
+
+    def to_json(self) -> bytes:
+        """Serialized state, cached until the next update."""
+        if self._json_version != self.version:
+            self._json = json.dumps(self.to_dict(), default=str).encode()
+            self._json_version = self.version
+        return self._json
+
+
+class LiveState:
+    """Latest state per session, updated incrementally from parsed packets.
+
+    Updates come from the ingest thread and reads from the HTTP server
+    threads, both under one lock. An update only swaps references to the
+    parsed entries, so it stays cheap. Once more than ``max_sessions``
+    sessions are known, the least recently updated one is forgotten.
+
+    Args:
+        max_sessions (int): Sessions kept.
+
+    Attributes:
+        evicted (int): Sessions forgotten.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self.evicted = 0
+        # Least recently updated session first.
+        self.sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, data: dict) -> None:
+        """Apply a parsed packet.
+
+        Args:
+            data (dict): Parsed packet with the raw header.
+        """
+        header = data["m_header"]
+        packet_id = header["m_packetId"]
+        if packet_id not in LIVE_STATE_PACKET_IDS:
+            return
+        car_packet = CAR_PACKETS.get(packet_id)
+        session_uid = str(header["m_sessionUID"])
+        with self._lock:
+            state = self.sessions.get(session_uid)
+            if state is None:
+                state = self.sessions[session_uid] = SessionState(session_uid)
+                if len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self.sessions.move_to_end(session_uid)
+            state.player_car_index = header["m_playerCarIndex"]
+            state.session_time = header["m_sessionTime"]
+            state.frame = header["m_frameIdentifier"]
+            state.updated_at = time.time()
+            state.version += 1
+            if car_packet is not None:
+                array, key = car_packet
+                for car, entry in zip(state.cars, data[array]):
+                    if entry:
+                        car[key] = entry
+            elif packet_id == PARTICIPANTS_PACKET_ID:
+                participants = data["m_participants"]
+                for car, participant in zip(state.cars, participants):
+                    if participant:
+                        car["name"] = participant["m_name"]
+                        car["team_id"] = participant["m_teamId"]
+                        car["race_number"] = participant["m_raceNumber"]
+            else:
+                state.session = {
+                    name: value
+                    for name, value in data.items()
+                    if name != "m_header" and not name.startswith("_")
+                }
+
+    def session_uids(self) -> list:
+        """Known session UIDs, most recently updated first."""
+        with self._lock:
+            return list(reversed(self.sessions))
+
+    def session_json(self, session_uid: str = None) -> bytes:
+        """Serialized state of a session, the newest if omitted.
+
+        Returns:
+            bytes: JSON or None if the session is unknown.
+        """
+        with self._lock:
+            state = self._find(session_uid)
+            return state.to_json() if state else None
+
+    def car(self, session_uid: str, car_index: int) -> dict:
+        """Latest entries of one car or None if unknown."""
+        with self._lock:
+            state = self._find(session_uid)
+            if state is None or not 0 <= car_index < NUMBER_OF_CARS:
+                return None
+            return dict(state.cars[car_index])
+
+    def _find(self, session_uid: str):
+        if session_uid is not None:
+            return self.sessions.get(session_uid)
+        if not self.sessions:
+            return None
+        return self.sessions[next(reversed(self.sessions))]
+
+
+class LiveStateHandler(BaseHTTPRequestHandler):
+    """Serve a LiveState as JSON, see the module docstring for the routes."""
+
+    live_state = None
+
+    def do_GET(self) -> None:
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+        if parts == ["sessions"]:
+            body = json.dumps(self.live_state.session_uids()).encode()
+        elif parts and parts[0] == "state" and len(parts) <= 2:
+            body = self.live_state.session_json(parts[1] if len(parts) == 2 else None)
+        elif len(parts) == 4 and parts[0] == "state" and parts[2] == "cars":
+            try:
+                car = self.live_state.car(parts[1], int(parts[3]))
+            except ValueError:
+                car = None
+            body = json.dumps(car, default=str).encode() if car is not None else None
+        else:
+            body = None
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def serve_live_state(
+    live_state: LiveState, address: str = F1_LIVE_STATE_ADDRESS, port: int = None
+) -> ThreadingHTTPServer:
+    """Serve a LiveState from a background thread.
+
+    Args:
+        live_state (LiveState): State to serve.
+        address (str): Address to bind to, loopback by default.
+        port (int): Port to listen on, F1_LIVE_STATE_PORT if omitted.
+
+    Returns:
+        ThreadingHTTPServer: Running server, stop it with shutdown().
+    """
+    if port is None:
+        port = int(F1_LIVE_STATE_PORT)
+    handler = type("Handler", (LiveStateHandler,), {"live_state": live_state})
+    server = ThreadingHTTPServer((address, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
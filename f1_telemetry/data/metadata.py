@@ -0,0 +1,151 @@
+"""Per-session cache of participants and session metadata.
+
+Participants and session packets arrive every few seconds but rarely
+change. With ``F1_METADATA_DEDUP`` the cache hashes their content, without
+the header, and a packet is only stored if its hash differs from the last
+stored one of the same session and sender. ``m_sessionTimeLeft`` counts
+down every second and is left out of the session hash, the stored session
+documents carry the time left at their last change.
+
+The latest participants of every session are kept as well, so selected
+participant fields, ``F1_DENORMALIZE`` e.g. ``m_name,m_teamId``, can be
+joined into the documents of the car packets at ingest time. Packet
+documents get them as ``_cars``, one entry per car index next to the car
+arrays, per-car measurements in their ``meta``.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+F1_METADATA_DEDUP = str(os.environ.get("F1_METADATA_DEDUP", "0")) not in ("0", "false", "")
+# Comma separated participant fields joined into car packets, e.g. m_name,m_teamId.
+F1_DENORMALIZE = str(os.environ.get("F1_DENORMALIZE", ""))
+
+METADATA_COLLECTIONS = ("participants", "session")
+VOLATILE_FIELDS = {"session": frozenset(("m_sessionTimeLeft",))}
+CARS_KEY = "_cars"
+MAX_SESSIONS = 64
+
+
+def parse_fields(value: str) -> tuple:
+    """Parse a comma separated list of participant fields."""
+    return tuple(field.strip() for field in value.split(",") if field.strip())
+
+
+def content_hash(collection: str, data: dict) -> bytes:
+    """Hash of a parsed packet without its header and underscore keys."""
+    volatile = VOLATILE_FIELDS.get(collection, ())
+    content = [
+        (name, value)
+        for name, value in data.items()
+        if name != "m_header" and not name.startswith("_") and name not in volatile
+    ]
+    return hashlib.blake2b(repr(content).encode(), digest_size=16).digest()
+
+
+class MetadataCache:
+    """Skip unchanged metadata packets and remember the participants.
+
+    Sessions are kept in the order of their last metadata packet and the
+    idlest one is forgotten once more than ``max_sessions`` are cached.
+
+    Args:
+        dedup (bool): Drop participants and session packets whose content
+            didn't change.
+        fields (tuple): Participant fields joined into car packets, none
+            if empty.
+        max_sessions (int): Sessions kept in the cache.
+
+    Attributes:
+        stored (int): Metadata packets that changed and are stored.
+        skipped (int): Unchanged metadata packets that were dropped.
+    """
+
+    def __init__(
+        self,
+        dedup: bool = F1_METADATA_DEDUP,
+        fields: tuple = parse_fields(F1_DENORMALIZE),
+        max_sessions: int = MAX_SESSIONS,
+    ):
+        self.dedup = dedup
+        self.fields = tuple(fields)
+        self.max_sessions = max_sessions
+        self.stored = 0
+        self.skipped = 0
+        self._sessions = OrderedDict()
+
+    @classmethod
+    def from_env(cls):
+        """Build the cache from F1_METADATA_DEDUP and F1_DENORMALIZE.
+
+        Returns:
+            MetadataCache: The cache or None if both are disabled.
+        """
+        if not F1_METADATA_DEDUP and not F1_DENORMALIZE:
+            return None
+        return cls()
+
+    def _session(self, session_uid: int) -> dict:
+        session = self._sessions.get(session_uid)
+        if session is None:
+            session = {"hashes": {}, "cars": None}
+            self._sessions[session_uid] = session
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_uid)
+        return session
+
+    def update(self, collection: str, data: dict, source: str = None) -> bool:
+        """Remember a metadata packet and decide whether to store it.
+
+        Args:
+            collection (str): Packet collection name.
+            data (dict): Parsed packet with the raw integer session UID.
+            source (str): Sender of the packet.
+
+        Returns:
+            bool: False if the packet is unchanged metadata to drop.
+        """
+        if collection not in METADATA_COLLECTIONS:
+            return True
+        session = self._session(data["m_header"]["m_sessionUID"])
+        if collection == "participants" and self.fields:
+            fields = self.fields
+            session["cars"] = [
+                {field: participant[field] for field in fields if field in participant}
+                if participant
+                else None
+                for participant in data["m_participants"]
+            ]
+        if not self.dedup:
+            return True
+        digest = content_hash(collection, data)
+        key = (collection, source)
+        if session["hashes"].get(key) == digest:
+            self.skipped += 1
+            return False
+        session["hashes"][key] = digest
+        self.stored += 1
+        return True
+
+    def cars(self, session_uid: int) -> list:
+        """Selected participant fields per car index of a session.
+
+        Returns:
+            list: One dict per car, None before the first participants
+            packet of the session or without fields to join.
+        """
+        session = self._sessions.get(session_uid)
+        return session["cars"] if session is not None else None
+
+    def stats(self) -> dict:
+        """Stored and skipped metadata packets and cached sessions."""
+        return {
+            "stored": self.stored,
+            "skipped": self.skipped,
+            "sessions": len(self._sessions),
+        }
@@ -0,0 +1,397 @@
+"""Sequence tracking, stage latencies and a Prometheus metrics endpoint.
+
+The receiver hands every datagram's header to a SequenceTracker, which
+follows ``m_overallFrameIdentifier`` per session and packet type and counts
+gaps, missing frames, duplicates and reordered arrivals. Only the packet
+types sent with every frame are tracked. Two packets of a type are expected
+``F1_FRAME_STEP`` frames apart, 1 unless the UDP send rate is below the
+frame rate, e.g. 2 for 30 Hz at 60 frames per second.
+
+Stage latencies are recorded in fixed-bucket histograms and everything is
+rendered in the Prometheus text format on ``F1_METRICS_PORT``.
+"""
+import bisect
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+from f1_telemetry.data.struct_parsers import PACKET_HEADER_LAYOUT
+
+load_dotenv()
+
+F1_METRICS_ADDRESS = str(os.environ.get("F1_METRICS_ADDRESS", "127.0.0.1"))
+# Port of the metrics endpoint, disabled if empty.
+F1_METRICS_PORT = str(os.environ.get("F1_METRICS_PORT", ""))
+# Frames between two packets of a type sent with every frame.
+F1_FRAME_STEP = int(os.environ.get("F1_FRAME_STEP", 1))
+
+# Upper bounds in seconds, from 50 us to 5 s.
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+# Motion, lap, car telemetry, car status and motion ex packets are sent
+# with every frame, the others periodically or on events.
+SEQUENCED_PACKET_IDS = frozenset((0, 2, 6, 7, 13))
+RECENT_FRAMES = 64
+MAX_SESSIONS = 64
+
+PACKET_ID = struct.Struct("<B")
+SESSION_UID = struct.Struct("<Q")
+OVERALL_FRAME = struct.Struct("<I")
+PACKET_ID_OFFSET = PACKET_HEADER_LAYOUT.offsets["m_packetId"]
+SESSION_UID_OFFSET = PACKET_HEADER_LAYOUT.offsets["m_sessionUID"]
+OVERALL_FRAME_OFFSET = PACKET_HEADER_LAYOUT.offsets["m_overallFrameIdentifier"]
+PACKET_HEADER_SIZE = PACKET_HEADER_LAYOUT.size
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed buckets.
+
+    Each histogram is observed from a single thread, so no lock is taken.
+    """
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def observe_ns(self, nanoseconds: int) -> None:
+        self.observe(nanoseconds / 1e9)
+
+    def observe_since(self, started_ns) -> None:
+        """Observe the time since each of several perf_counter_ns stamps."""
+        now = time.perf_counter_ns()
+        for value in started_ns:
+            self.observe((now - value) / 1e9)
+
+    def cumulative(self) -> list:
+        """Tuples of upper bound and cumulative count, ending with +Inf."""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class SequenceState:
+    """Sequence counters of one packet type in one session."""
+
+    def __init__(self, step: int = F1_FRAME_STEP):
+        if step < 1:
+            raise ValueError("step must be at least 1.")
+        self.last = None
+        self.step = step
+        self.recent = deque(maxlen=RECENT_FRAMES)
+        self.received = 0
+        self.gaps = 0
+        self.missing = 0
+        self.duplicates = 0
+        self.reordered = 0
+
+    def observe(self, frame: int) -> None:
+        self.received += 1
+        last = self.last
+        if last is None:
+            self.last = frame
+            self.recent.append(frame)
+            return
+        delta = frame - last
+        if delta > 0:
+            missing = round(delta / self.step) - 1
+            if missing > 0:
+                self.gaps += 1
+                self.missing += missing
+            self.last = frame
+            self.recent.append(frame)
+        elif frame in self.recent:
+            self.duplicates += 1
+        else:
+            # A late packet was counted as missing when the gap was seen.
+            self.reordered += 1
+            self.missing = max(self.missing - 1, 0)
+            self.recent.append(frame)
+
+
+class SequenceTracker:
+    """Track frame sequences per session and packet type from raw headers.
+
+    Sessions are kept in the order of their last packet and the idlest one
+    is forgotten once more than ``max_sessions`` are tracked, so the
+    exported label sets stay bounded.
+
+    Args:
+        step (int): Frames between two packets of a type.
+        max_sessions (int): Sessions tracked.
+
+    Attributes:
+        evicted (int): Sessions forgotten.
+    """
+
+    def __init__(self, step: int = F1_FRAME_STEP, max_sessions: int = MAX_SESSIONS):
+        if step < 1:
+            raise ValueError("step must be at least 1.")
+        self.step = step
+        self.max_sessions = max_sessions
+        self.evicted = 0
+        self._sessions = OrderedDict()
+
+    def observe(self, message) -> None:
+        """Update the counters from a raw datagram's header.
+
+        Datagrams shorter than the header are ignored.
+        """
+        if len(message) < PACKET_HEADER_SIZE:
+            return
+        (packet_id,) = PACKET_ID.unpack_from(message, PACKET_ID_OFFSET)
+        if packet_id not in SEQUENCED_PACKET_IDS:
+            return
+        (session_uid,) = SESSION_UID.unpack_from(message, SESSION_UID_OFFSET)
+        (frame,) = OVERALL_FRAME.unpack_from(message, OVERALL_FRAME_OFFSET)
+        states = self._sessions.get(session_uid)
+        if states is None:
+            states = self._sessions[session_uid] = {}
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+        else:
+            self._sessions.move_to_end(session_uid)
+        state = states.get(packet_id)
+        if state is None:
+            state = states[packet_id] = SequenceState(self.step)
+        state.observe(frame)
+
+    def stats(self) -> dict:
+        """Counters per session UID and packet id."""
+        return {
+            (session_uid, packet_id): {
+                "received": state.received,
+                "gaps": state.gaps,
+                "missing": state.missing,
+                "duplicates": state.duplicates,
+                "reordered": state.reordered,
+            }
+            for session_uid, states in list(self._sessions.items())
+            for packet_id, state in list(states.items())
+        }
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    items = ",".join(f'{name}="{value}"' for name, value in labels.items())
+    return "{" + items + "}"
+
+
+class MetricsRegistry:
+    """Collect counters, gauges and histograms and render them for Prometheus.
+
+    Collectors are callables returning tuples of metric name, type, help
+    text and samples. Samples are tuples of a label dict and a value, or of
+    a label dict and a Histogram for histogram metrics.
+    """
+
+    def __init__(self):
+        self.collectors = []
+
+    def add_collector(self, collector) -> None:
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        lines = []
+        for collector in self.collectors:
+            for name, metric_type, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    if metric_type == "histogram":
+                        for bound, count in value.cumulative():
+                            le = "+Inf" if bound == float("inf") else repr(bound)
+                            bucket_labels = _labels({**labels, "le": le})
+                            lines.append(f"{name}_bucket{bucket_labels} {count}")
+                        lines.append(f"{name}_sum{_labels(labels)} {value.sum}")
+                        lines.append(f"{name}_count{_labels(labels)} {value.count}")
+                    else:
+                        lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def pipeline_collector(pipeline):
+    """Collector for the counters and stage latencies of an IngestPipeline."""
+
+    def collect():
+        stats = pipeline.stats()
+        metrics = []
+        for key, value in stats.items():
+            metric_type = "gauge" if key.endswith("_queued") else "counter"
+            suffix = "" if metric_type == "gauge" else "_total"
+            metrics.append(
+                (
+                    f"f1_pipeline_{key}{suffix}",
+                    metric_type,
+                    f"Ingest pipeline {key.replace('_', ' ')}.",
+                    [({}, value)],
+                )
+            )
+        metrics.append(
+            (
+                "f1_stage_latency_seconds",
+                "histogram",
+                "Latency of the ingest stages since receive.",
+                [({"stage": stage}, histogram) for stage, histogram in pipeline.latency.items()],
+            )
+        )
+        return metrics
+
+    return collect
+
+
+def sequence_collector(tracker: SequenceTracker):
+    """Collector for the sequence counters of a SequenceTracker."""
+
+    def collect():
+        stats = tracker.stats()
+        metrics = []
+        for counter in ("received", "gaps", "missing", "duplicates", "reordered"):
+            samples = [
+                (
+                    {"session_uid": session_uid, "packet_id": packet_id},
+                    counters[counter],
+                )
+                for (session_uid, packet_id), counters in stats.items()
+            ]
+            metrics.append(
+                (
+                    f"f1_sequence_{counter}_total",
+                    "counter",
+                    f"Packets {counter} per session and packet type.",
+                    samples,
+                )
+            )
+        return metrics
+
+    return collect
+
+
+def publisher_collector(publisher):
+    """Collector for the subscriptions of a fan-out Publisher."""
+
+    def collect():
+        subscriptions = publisher.subscriptions
+        metrics = []
+        for counter in ("published", "handled", "errors", "dropped"):
+            samples = [
+                ({"subscriber": subscription.name}, subscription.stats()[counter])
+                for subscription in subscriptions
+            ]
+            metrics.append(
+                (
+                    f"f1_subscriber_{counter}_total",
+                    "counter",
+                    f"Packets {counter} per subscriber.",
+                    samples,
+                )
+            )
+        metrics.append(
+            (
+                "f1_subscriber_queued",
+                "gauge",
+                "Packets waiting per subscriber.",
+                [
+                    ({"subscriber": subscription.name}, len(subscription.queue))
+                    for subscription in subscriptions
+                ],
+            )
+        )
+        metrics.append(
+            (
+                "f1_subscriber_lag_seconds",
+                "histogram",
+                "Time packets waited in a subscriber's queue.",
+                [
+                    ({"subscriber": subscription.name}, subscription.lag)
+                    for subscription in subscriptions
+                ],
+            )
+        )
+        return metrics
+
+    return collect
+
+
+def writer_collector(writer):
+    """Collector for a BufferedMongoWriter."""
+
+    def collect():
+        return [
+            ("f1_mongodb_flushed_total", "counter", "Documents written.", [({}, writer.flushed)]),
+            ("f1_mongodb_failed_total", "counter", "Documents rejected.", [({}, writer.failed)]),
+            ("f1_mongodb_pending", "gauge", "Documents buffered.", [({}, writer.pending)]),
+            (
+                "f1_mongodb_flush_seconds",
+                "histogram",
+                "Duration of bulk writes.",
+                [({}, writer.flush_latency)],
+            ),
+            (
+                "f1_receive_to_flushed_seconds",
+                "histogram",
+                "Time from receive until a document was flushed.",
+                [({}, writer.stored_latency)],
+            ),
+        ]
+
+    return collect
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serve the metrics of a registry on /metrics."""
+
+    registry = None
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def serve_metrics(
+    registry: MetricsRegistry, address: str = F1_METRICS_ADDRESS, port: int = None
+) -> ThreadingHTTPServer:
+    """Serve a MetricsRegistry from a background thread.
+
+    Args:
+        registry (MetricsRegistry): Metrics to serve.
+        address (str): Address to bind to, loopback by default.
+        port (int): Port to listen on, F1_METRICS_PORT if omitted.
+
+    Returns:
+        ThreadingHTTPServer: Running server, stop it with shutdown().
+    """
+    if port is None:
+        port = int(F1_METRICS_PORT)
+    handler = type("Handler", (MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((address, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
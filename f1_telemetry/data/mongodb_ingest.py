@@ -1,60 +1,562 @@
 """Ingest F1 Telemetry to InfluxDB.
 """
-from f1_telemetry.data.udp_stream import get_udp_messages
+from f1_telemetry.data.compact import COMPACT, F1_DOCUMENT_ENCODING, encode_packet
+from f1_telemetry.data.export import (
+    EXPORT_TABLES,
+    F1_EXPORT_DIR,
+    F1_EXPORT_IDLE_TIMEOUT,
+    F1_EXPORT_LIVE_ROW_GROUP_SIZE,
+    SessionExporter,
+)
+from f1_telemetry.data.fanout import Publisher, start_consumer
+from f1_telemetry.data.file_sink import FileSink
+from f1_telemetry.data.laps import (
+    F1_LAP_SUMMARY,
+    LAP_SUMMARY_COLLECTION,
+    LAP_SUMMARY_PACKET_IDS,
+    LapAggregator,
+    setup_lap_summary,
+)
+from f1_telemetry.data.live_state import (
+    F1_LIVE_STATE_PORT,
+    LIVE_STATE_PACKET_IDS,
+    LIVE_STATE_QUEUE_SIZE,
+    LiveState,
+    serve_live_state,
+)
+from f1_telemetry.data.metadata import CARS_KEY, MetadataCache
+from f1_telemetry.data.metrics import (
+    F1_METRICS_PORT,
+    Histogram,
+    MetricsRegistry,
+    SequenceTracker,
+    pipeline_collector,
+    publisher_collector,
+    sequence_collector,
+    serve_metrics,
+    writer_collector,
+)
+from f1_telemetry.data.packet_filter import PacketFilter
+from f1_telemetry.data.pipeline import (
+    BLOCK,
+    F1_QUEUE_POLICY,
+    RECEIVED_NS_KEY,
+    IngestPipeline,
+)
+from f1_telemetry.data.routing import CollectionRouter
+from f1_telemetry.data.sampling import Sampler
+from f1_telemetry.data.timeseries import (
+    CAR_ARRAYS,
+    F1_STORAGE_LAYOUT,
+    PER_CAR,
+    PerCarStore,
+    supports_timeseries,
+)
+from f1_telemetry.data.udp_stream import PARSER_REGISTRY
 from dotenv import load_dotenv
 import os
+import time
+from collections import defaultdict
+from pymongo.errors import BulkWriteError, PyMongoError
 from pymongo.mongo_client import MongoClient
 from datetime import datetime
 
 load_dotenv()
 
 MONGODB_CONNECTION_STRING = os.environ.get("MONGODB_CONNECTION_STRING")
+MONGODB_FLUSH_SIZE = int(os.environ.get("MONGODB_FLUSH_SIZE", 500))
+MONGODB_FLUSH_INTERVAL = float(os.environ.get("MONGODB_FLUSH_INTERVAL", 1.0))
+# Retries of an insert_many that failed with a connection error, with a
+# backoff doubling from MONGODB_RETRY_BACKOFF seconds.
+MONGODB_RETRIES = int(os.environ.get("MONGODB_RETRIES", 3))
+MONGODB_RETRY_BACKOFF = float(os.environ.get("MONGODB_RETRY_BACKOFF", 0.5))
+DUPLICATE_KEY = 11000
+# "mongodb" or "file" for local segment files, see file_sink.py.
+F1_SINK = str(os.environ.get("F1_SINK", "mongodb"))
 
-mongo_client = MongoClient(MONGODB_CONNECTION_STRING)
+MONGODB_SINK = "mongodb"
+FILE_SINK = "file"
+
+_mongo_client = None
+
+PACKET_COLLECTIONS = {
+    0: "motion",
+    1: "session",
+    2: "lap",
+    3: "event",
+    4: "participants",
+    5: "car_setup",
+    6: "car_telemetry",
+    7: "car_status",
+    8: "final_classification",
+    9: "lobby_info",
+    10: "car_damage",
+    11: "session_history",
+    12: "tyre_sets",
+    13: "motion_ex",
+}
+
+
+def inserted_count(error: BulkWriteError, retried: bool) -> int:
+    """Documents of a failed insert_many that are stored.
+
+    A retried insert_many sends documents that may have been stored by the
+    attempt that failed. They have their _id already, so they come back as
+    duplicate key errors and are stored as well.
+    """
+    inserted = error.details.get("nInserted", 0)
+    if retried:
+        inserted += sum(
+            1
+            for write_error in error.details.get("writeErrors", ())
+            if write_error.get("code") == DUPLICATE_KEY
+        )
+    return inserted
+
+
+def applied_count(error: BulkWriteError) -> int:
+    """Operations of a failed bulk_write that were applied."""
+    details = error.details
+    return (
+        details.get("nInserted", 0)
+        + details.get("nMatched", 0)
+        + details.get("nUpserted", 0)
+    )
+
+
+def get_mongo_client() -> MongoClient:
+    """MongoDB client, created on first use so that importing the ingest
+    needs no MongoDB."""
+    global _mongo_client
+    if _mongo_client is None:
+        _mongo_client = MongoClient(MONGODB_CONNECTION_STRING)
+    return _mongo_client
+
+
+class BufferedMongoWriter:
+    """Buffer documents per collection and write them with insert_many.
+
+    A collection is flushed once it holds `flush_size` documents, and all
+    collections are flushed once `flush_interval` seconds have passed since
+    the last flush. Closing the writer flushes whatever is left. Write
+    operations such as UpdateOne are buffered the same way and sent with
+    an ordered bulk_write.
+
+    An insert_many that fails with a connection error, e.g. AutoReconnect
+    or ServerSelectionTimeoutError, is retried ``retries`` times with a
+    doubling backoff, documents that still can't be written are counted as
+    failed. Write operations aren't retried, a $push applied by the failed
+    attempt would be applied twice.
+
+    Attributes:
+        flushed (int): Documents written to MongoDB.
+        failed (int): Documents rejected by MongoDB or not written because
+            of a connection error.
+        flushes (int): Number of insert_many calls issued.
+        retries (int): insert_many calls retried after a connection error.
+        last_error (Exception): Last error of a flush, None if none failed.
+        flush_latency (Histogram): Duration of the bulk calls.
+        stored_latency (Histogram): Time from receive until a document was
+            flushed, for writes that carry their receive time.
+    """
+
+    def __init__(
+        self,
+        database,
+        flush_size: int = MONGODB_FLUSH_SIZE,
+        flush_interval: float = MONGODB_FLUSH_INTERVAL,
+        retries: int = MONGODB_RETRIES,
+        retry_backoff: float = MONGODB_RETRY_BACKOFF,
+    ):
+        if flush_size < 1:
+            raise ValueError("flush_size must be at least 1.")
+        self.database = database
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_retries = retries
+        self.retry_backoff = retry_backoff
+        self.flushed = 0
+        self.failed = 0
+        self.flushes = 0
+        self.retries = 0
+        self.last_error = None
+        self.flush_latency = Histogram()
+        self.stored_latency = Histogram()
+        self._buffers = defaultdict(list)
+        self._operations = defaultdict(list)
+        self._received = defaultdict(list)
+        self._last_flush = time.monotonic()
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered documents not yet written."""
+        buffers = list(self._buffers.values()) + list(self._operations.values())
+        return sum(len(buffer) for buffer in buffers)
+
+    def write(self, collection: str, document: dict, received_ns: int = None) -> None:
+        """Buffer a document and flush if a size or time limit is hit.
+
+        Args:
+            collection (str): Target collection name.
+            document (dict): Document to insert.
+            received_ns (int): perf_counter_ns receive time of the packet,
+                observed in stored_latency once the document is flushed.
+        """
+        buffer = self._buffers[collection]
+        buffer.append(document)
+        if received_ns is not None:
+            self._received[collection].append(received_ns)
+        if len(buffer) >= self.flush_size:
+            self._flush_collection(collection)
+        self.flush_if_due()
+
+    def write_operation(
+        self, collection: str, operation, received_ns: int = None
+    ) -> None:
+        """Buffer a write operation and flush if a size or time limit is hit.
+
+        Args:
+            collection (str): Target collection name.
+            operation: pymongo write operation, e.g. UpdateOne.
+            received_ns (int): perf_counter_ns receive time of the packet.
+        """
+        buffer = self._operations[collection]
+        buffer.append(operation)
+        if received_ns is not None:
+            self._received[collection].append(received_ns)
+        if len(buffer) >= self.flush_size:
+            self._flush_collection(collection)
+        self.flush_if_due()
+
+    def flush_if_due(self) -> None:
+        """Flush all collections if the flush interval has elapsed."""
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all buffered documents."""
+        for collection in set(self._buffers) | set(self._operations):
+            self._flush_collection(collection)
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        """Flush remaining documents."""
+        self.flush()
+
+    def _flush_collection(self, collection: str) -> None:
+        received = self._received.pop(collection, None)
+        failed = self.failed
+        documents = self._buffers.pop(collection, None)
+        if documents:
+            self._insert(collection, documents)
+        operations = self._operations.pop(collection, None)
+        if operations:
+            self._bulk_write(collection, operations)
+        if received and self.failed == failed:
+            self.stored_latency.observe_since(received)
+
+    def _insert(self, collection: str, documents: list) -> None:
+        for attempt in range(self.max_retries + 1):
+            self.flushes += 1
+            started = time.perf_counter()
+            try:
+                self.database[collection].insert_many(documents, ordered=False)
+                self.flushed += len(documents)
+                return
+            except BulkWriteError as error:
+                inserted = inserted_count(error, attempt > 0)
+                self.flushed += inserted
+                self.failed += len(documents) - inserted
+                self.last_error = error
+                return
+            except PyMongoError as error:
+                self.last_error = error
+            finally:
+                self.flush_latency.observe(time.perf_counter() - started)
+            if attempt < self.max_retries:
+                self.retries += 1
+                time.sleep(self.retry_backoff * 2**attempt)
+        self.failed += len(documents)
+
+    def _bulk_write(self, collection: str, operations: list) -> None:
+        self.flushes += 1
+        started = time.perf_counter()
+        try:
+            self.database[collection].bulk_write(operations, ordered=True)
+            self.flushed += len(operations)
+        except BulkWriteError as error:
+            applied = applied_count(error)
+            self.flushed += applied
+            self.failed += len(operations) - applied
+            self.last_error = error
+        except PyMongoError as error:
+            self.failed += len(operations)
+            self.last_error = error
+        finally:
+            self.flush_latency.observe(time.perf_counter() - started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
 
 def verify_mongodb_setup() -> None:
     """Verify that db and collections exist in mongodb.
-    If they don't exist, they will be created.
+    If they don't exist, they will be created with their indexes, see
+    routing.py. Routed collections are set up when first written to.
     """
     if not MONGODB_CONNECTION_STRING:
         raise ValueError("MONGODB_CONNECTION_STRING is missing.")
-    db = mongo_client.f1
-    collections = [
-        "car_telemetry",
-        "car_status",
-        "car_setup",
-        "lap",
-        "motion",
-        "participants",
-        "session",
-        "car_damage",
-        "final_classification",
-        "tyre_sets"
-    ]
-    for collection in collections:
-        if collection not in db.list_collection_names():
-            db.create_collection(collection)
-
-
-def run_f1_telemetry_ingest() -> None:
-    """Run F1 telemetry ingestion."""
-    verify_mongodb_setup()
-    for data in get_udp_messages():
-        data["m_header"]["m_sessionUID"] = str(data["m_header"]["m_sessionUID"])
-        data["_ingested_at"] = datetime.utcnow()
-        packet_ids = {
-            0: "motion",
-            1: "session",
-            2: "lap",
-            4: "participants",
-            5: "car_setup",
-            6: "car_telemetry",
-            7: "car_status",
-            8: "final_classification",
-            10: "car_damage",
-            12: "tyre_sets"
-        }
-        message_type = packet_ids.get(data["m_header"]["m_packetId"], None)
-        if message_type is not None:
-            mongo_client.f1[message_type].insert_one(data)
+    create_router(get_mongo_client().f1).setup()
+
+
+def create_router(database=None, sink: str = MONGODB_SINK) -> CollectionRouter:
+    """Create the router of packet documents to collections.
+
+    Args:
+        database: MongoDB database, the f1 database if omitted.
+        sink (str): "mongodb" or "file". The file sink only gets the names
+            routed, indexes are created when its segments are loaded.
+
+    Returns:
+        CollectionRouter: Router for store_packet.
+    """
+    if sink == FILE_SINK:
+        database = None
+    elif database is None:
+        database = get_mongo_client().f1
+    return CollectionRouter(database, PACKET_COLLECTIONS.values())
+
+
+def store_packet(
+    writer: BufferedMongoWriter,
+    data: dict,
+    ingested_at: datetime = None,
+    sampler: Sampler = None,
+    per_car: PerCarStore = None,
+    source: str = None,
+    encoding: str = F1_DOCUMENT_ENCODING,
+    router: CollectionRouter = None,
+    metadata: MetadataCache = None,
+) -> None:
+    """Prepare a parsed packet for MongoDB and buffer it.
+
+    Args:
+        writer (BufferedMongoWriter): Writer buffering the documents.
+        data (dict): Parsed packet.
+        ingested_at (datetime): Time the packet was received, now if omitted.
+        sampler (Sampler): Downsampling policies per collection.
+        per_car (PerCarStore): Store car packets as per-car measurements.
+        source (str): Sender of the packet, e.g. "10.0.0.2:20777", stored
+            as _source to tell rigs apart.
+        encoding (str): "full" field names or "compact" short codes, see
+            compact.py. Per-car measurements are not affected.
+        router (CollectionRouter): Routes documents into per-session or
+            per-day collections, the packet collection if omitted.
+        metadata (MetadataCache): Drops unchanged participants and session
+            packets and joins participant fields into car packets.
+    """
+    message_type = PACKET_COLLECTIONS.get(data["m_header"]["m_packetId"], None)
+    if message_type is None:
+        return
+    received_ns = data.get(RECEIVED_NS_KEY)
+    if sampler is not None:
+        data = sampler.apply(message_type, data)
+        if data is None:
+            return
+    if metadata is not None and not metadata.update(message_type, data, source):
+        return
+    ingested_at = ingested_at or datetime.utcnow()
+    # Parsed packets may be shared with other consumers, so they are copied
+    # rather than modified.
+    data = dict(data)
+    data.pop(RECEIVED_NS_KEY, None)
+    if source is not None:
+        data["_source"] = source
+    if metadata is not None and message_type in CAR_ARRAYS:
+        cars = metadata.cars(data["m_header"]["m_sessionUID"])
+        if cars is not None:
+            data[CARS_KEY] = cars
+    if per_car is not None and message_type in per_car.collections:
+        per_car.store(writer, message_type, data, ingested_at, received_ns)
+        return
+    data["_ingested_at"] = ingested_at
+    header = data["m_header"]
+    collection = message_type
+    if router is not None:
+        collection = router.collection(message_type, header["m_sessionUID"], ingested_at)
+    if encoding == COMPACT:
+        writer.write(collection, encode_packet(data), received_ns)
+        return
+    data["m_header"] = {**header, "m_sessionUID": str(header["m_sessionUID"])}
+    writer.write(collection, data, received_ns)
+
+
+def create_sink(sink: str = F1_SINK):
+    """Create the sink stored packets are written to.
+
+    Args:
+        sink (str): "mongodb" or "file".
+
+    Returns:
+        BufferedMongoWriter or FileSink: Sink, use it as a context manager.
+    """
+    if sink == FILE_SINK:
+        return FileSink(
+            flush_size=MONGODB_FLUSH_SIZE, flush_interval=MONGODB_FLUSH_INTERVAL
+        )
+    if sink != MONGODB_SINK:
+        raise ValueError(f"Unknown sink {sink!r}.")
+    return BufferedMongoWriter(get_mongo_client().f1)
+
+
+def create_per_car_store(
+    database=None, sink: str = MONGODB_SINK, setup: bool = True
+) -> PerCarStore:
+    """Create the per-car store if F1_STORAGE_LAYOUT is "per_car".
+
+    Native time-series collections are used if the server supports them,
+    fixed-size buckets otherwise. Collections and indexes are created unless
+    ``setup`` is False, e.g. in worker processes of a bulk import. The file
+    sink always gets time-series measurements, since it can't store bucket
+    updates, and nothing is created.
+
+    Returns:
+        PerCarStore: The store or None for the packet layout.
+    """
+    if F1_STORAGE_LAYOUT != PER_CAR:
+        return None
+    if sink == FILE_SINK:
+        return PerCarStore(None)
+    per_car = PerCarStore(
+        database if database is not None else get_mongo_client().f1,
+        use_buckets=not supports_timeseries(get_mongo_client()),
+    )
+    if setup:
+        per_car.setup()
+    return per_car
+
+
+def run_f1_telemetry_ingest(sink: str = F1_SINK) -> None:
+    """Run F1 telemetry ingestion.
+
+    Args:
+        sink (str): "mongodb" or "file" to write local segment files that
+            can be loaded into MongoDB later.
+    """
+    if sink == MONGODB_SINK:
+        verify_mongodb_setup()
+    writer = create_sink(sink)
+    sampler = Sampler.from_env()
+    per_car = create_per_car_store(sink=sink)
+    router = create_router(sink=sink)
+    metadata = MetadataCache.from_env()
+    publisher = Publisher()
+    consumers = []
+    if F1_LIVE_STATE_PORT:
+        live_state = LiveState()
+        server = serve_live_state(live_state)
+        print(f"Serving live state on port {server.server_address[1]}.")
+        subscription = publisher.subscribe(
+            "live_state", LIVE_STATE_PACKET_IDS, maxsize=LIVE_STATE_QUEUE_SIZE
+        )
+        consumers.append(start_consumer(subscription, live_state.update))
+    lap_writer = None
+    if F1_LAP_SUMMARY:
+        if sink == MONGODB_SINK:
+            setup_lap_summary(get_mongo_client().f1)
+            # The store consumer's writer isn't thread-safe, summaries get
+            # their own.
+            lap_writer = BufferedMongoWriter(get_mongo_client().f1)
+            summary_sink = lap_writer
+        else:
+            # The file sink is shared with the store consumer, it takes a lock.
+            summary_sink = writer
+        aggregator = LapAggregator(
+            lambda summary: summary_sink.write(LAP_SUMMARY_COLLECTION, summary)
+        )
+        # A dropped lap or telemetry packet would corrupt the lap's summary.
+        subscription = publisher.subscribe(
+            "lap_summary", LAP_SUMMARY_PACKET_IDS, policy=BLOCK
+        )
+
+        def handle_lap_packet(data):
+            aggregator.update(data)
+            summary_sink.flush_if_due()
+
+        consumers.append(
+            start_consumer(
+                subscription, handle_lap_packet, on_idle=summary_sink.flush_if_due
+            )
+        )
+    exporter = None
+    if F1_EXPORT_DIR:
+        exporter = SessionExporter(
+            F1_EXPORT_DIR,
+            row_group_size=F1_EXPORT_LIVE_ROW_GROUP_SIZE,
+            idle_timeout=F1_EXPORT_IDLE_TIMEOUT,
+        )
+        print(f"Exporting sessions to {F1_EXPORT_DIR}.")
+        subscription = publisher.subscribe("export", EXPORT_TABLES, policy=F1_QUEUE_POLICY)
+        consumers.append(
+            start_consumer(subscription, exporter.write, on_idle=exporter.close_idle)
+        )
+
+    with writer:
+        subscription = publisher.subscribe(
+            sink, PACKET_COLLECTIONS, policy=F1_QUEUE_POLICY
+        )
+        consumers.append(
+            start_consumer(
+                subscription,
+                lambda data: store_packet(
+                    writer,
+                    data,
+                    sampler=sampler,
+                    per_car=per_car,
+                    router=router,
+                    metadata=metadata,
+                ),
+                on_idle=writer.flush_if_due,
+            )
+        )
+        sequence_tracker = SequenceTracker()
+        pipeline = IngestPipeline(
+            publisher.publish,
+            packet_filter=PacketFilter.from_env(PACKET_COLLECTIONS),
+            sequence_tracker=sequence_tracker,
+        )
+        if F1_METRICS_PORT:
+            registry = MetricsRegistry()
+            registry.add_collector(pipeline_collector(pipeline))
+            registry.add_collector(sequence_collector(sequence_tracker))
+            registry.add_collector(publisher_collector(publisher))
+            registry.add_collector(writer_collector(writer))
+            server = serve_metrics(registry)
+            print(f"Serving metrics on port {server.server_address[1]}.")
+        pipeline.run_forever()
+        publisher.close()
+        for consumer in consumers:
+            consumer.join()
+    if lap_writer is not None:
+        lap_writer.close()
+        print(f"Lap summaries: flushed={lap_writer.flushed}, failed={lap_writer.failed}")
+    if exporter is not None:
+        exporter.close()
+        print(f"Export: {exporter.stats()}")
+    print(f"Ingest stopped: {pipeline.stats()}, flushed={writer.flushed}, "
+          f"failed={writer.failed}")
+    for name, stats in publisher.stats().items():
+        print(f"{name}: {stats}")
+    if metadata is not None:
+        print(f"Metadata: {metadata.stats()}")
+    if PARSER_REGISTRY.unsupported_format or PARSER_REGISTRY.wrong_size:
+        print(f"Rejected packets: {PARSER_REGISTRY.stats()}")
+    for (session_uid, packet_id), stats in sequence_tracker.stats().items():
+        if stats["gaps"] or stats["duplicates"] or stats["reordered"]:
+            print(f"session {session_uid} packet {packet_id}: {stats}")
+    for collection, stats in sampler.stats().items():
+        print(f"{collection}: kept {stats['packets_kept']}/{stats['packets_seen']} "
+              f"packets, {stats['reduction']:.1%} fewer fields")
@@ -0,0 +1,109 @@
+"""Header-only prefilter for F1 telemetry packets.
+
+Decides from the 29 byte packet header which packets and which cars are
+kept, before anything is decoded.
+"""
+import os
+from dotenv import load_dotenv
+from f1_telemetry.data.struct_parsers import PACKET_HEADER_LAYOUT
+
+load_dotenv()
+
+# Comma separated packet ids to keep, all supported packets if empty.
+F1_PACKET_IDS = str(os.environ.get("F1_PACKET_IDS", ""))
+# "all", or a comma separated list of car indices, "player" and "secondary".
+F1_CARS = str(os.environ.get("F1_CARS", "all"))
+
+PACKET_ID_OFFSET = PACKET_HEADER_LAYOUT.offsets["m_packetId"]
+PLAYER_CAR_INDEX_OFFSET = PACKET_HEADER_LAYOUT.offsets["m_playerCarIndex"]
+SECONDARY_PLAYER_CAR_INDEX_OFFSET = PACKET_HEADER_LAYOUT.offsets[
+    "m_secondaryPlayerCarIndex"
+]
+PLAYER = "player"
+SECONDARY = "secondary"
+
+
+def parse_packet_ids(value: str) -> frozenset:
+    """Parse a comma separated list of packet ids.
+
+    Returns:
+        frozenset: Packet ids or None if the list is empty.
+    """
+    packet_ids = [item.strip() for item in value.split(",") if item.strip()]
+    if not packet_ids:
+        return None
+    return frozenset(int(packet_id) for packet_id in packet_ids)
+
+
+def parse_cars(value: str) -> tuple:
+    """Parse the car selection.
+
+    Returns:
+        tuple: Car indices and "player"/"secondary" markers, or None for
+        all cars.
+    """
+    cars = []
+    for item in value.split(","):
+        item = item.strip().lower()
+        if not item:
+            continue
+        if item == "all":
+            return None
+        if item in (PLAYER, SECONDARY):
+            cars.append(item)
+        else:
+            cars.append(int(item))
+    return tuple(cars) or None
+
+
+class PacketFilter:
+    """Select packets and cars from the packet header alone.
+
+    Args:
+        packet_ids (iterable): Packet ids to keep, None keeps all.
+        cars (iterable): Car indices to decode. "player" and "secondary"
+            are resolved from m_playerCarIndex and
+            m_secondaryPlayerCarIndex of every packet. None keeps all cars.
+    """
+
+    def __init__(self, packet_ids=None, cars=None):
+        self.packet_ids = frozenset(packet_ids) if packet_ids is not None else None
+        self.cars = tuple(cars) if cars is not None else None
+        self._fixed_cars = None
+        if self.cars is not None and PLAYER not in self.cars and SECONDARY not in self.cars:
+            self._fixed_cars = tuple(sorted(set(self.cars)))
+
+    @classmethod
+    def from_env(cls, default_packet_ids=None):
+        """Build the filter from F1_PACKET_IDS and F1_CARS.
+
+        Args:
+            default_packet_ids (iterable): Packet ids kept if F1_PACKET_IDS
+                is not set.
+        """
+        packet_ids = parse_packet_ids(F1_PACKET_IDS)
+        if packet_ids is None:
+            packet_ids = default_packet_ids
+        return cls(packet_ids, parse_cars(F1_CARS))
+
+    def accepts(self, message) -> bool:
+        """Check whether a packet type is kept."""
+        return self.packet_ids is None or message[PACKET_ID_OFFSET] in self.packet_ids
+
+    def car_indices(self, message) -> tuple:
+        """Car indices to decode from a packet.
+
+        Returns:
+            tuple: Sorted car indices or None if all cars are kept.
+        """
+        if self.cars is None or self._fixed_cars is not None:
+            return self._fixed_cars
+        indices = set()
+        for car in self.cars:
+            if car == PLAYER:
+                indices.add(message[PLAYER_CAR_INDEX_OFFSET])
+            elif car == SECONDARY:
+                indices.add(message[SECONDARY_PLAYER_CAR_INDEX_OFFSET])
+            else:
+                indices.add(car)
+        return tuple(sorted(indices))
@@ -0,0 +1,290 @@
+"""Compile declarative packet schemas into struct decoders.
+
+A schema is a tuple of fields. Each field is a tuple of
+``(name, type)`` or ``(name, type, count)`` where ``type`` is either a
+struct format character, a fixed size string such as ``"48s"`` or another
+schema for nested records. ``count`` turns the field into an array.
+
+All layouts are little-endian without padding, matching the F1 UDP
+specification.
+"""
+import struct
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+NUMPY_TYPES = {
+    "B": "u1",
+    "b": "i1",
+    "H": "<u2",
+    "h": "<i2",
+    "I": "<u4",
+    "L": "<u4",
+    "i": "<i4",
+    "l": "<i4",
+    "Q": "<u8",
+    "q": "<i8",
+    "f": "<f4",
+    "d": "<f8",
+}
+ARRAY_TYPECODES = {"L": "I", "l": "i"}
+
+
+def _decode_string(value: bytes) -> str:
+    return value.split(b"\x00", 1)[0].decode("utf-8", errors="replace")
+
+
+class RecordLayout:
+    """Compiled layout of a fixed-size record.
+
+    The decoders are generated once from the schema: ``unpack(data, offset)``
+    reads the whole record with a single precompiled struct call and builds
+    the nested dicts from constant tuple indices, ``from_values(values)``
+    does the same for an already unpacked tuple.
+
+    ``unpack_columns(data, offset)`` is the columnar variant: arrays of flat
+    records come back as one array per field instead of a list of dicts.
+
+    Args:
+        fields (tuple): Schema of the record.
+
+    Attributes:
+        format (str): Struct format without byte order prefix.
+        struct (struct.Struct): Precompiled little-endian struct.
+        size (int): Size of the record in bytes.
+        names (tuple): Field names in layout order.
+        offsets (dict): Byte offset of every field within the record.
+        is_flat (bool): True if all fields are single numeric values.
+    """
+
+    def __init__(self, fields: tuple):
+        self.fields = tuple(self._normalize(field) for field in fields)
+        self.names = tuple(name for name, _, _ in self.fields)
+        self.format = "".join(self._field_format(f) for f in self.fields)
+        self.struct = struct.Struct("<" + self.format)
+        self.size = self.struct.size
+        self.is_flat = all(
+            isinstance(kind, str) and not kind.endswith("s") and count is None
+            for _, kind, count in self.fields
+        )
+
+        self.offsets = {}
+        offset = 0
+        for field in self.fields:
+            self.offsets[field[0]] = offset
+            offset += struct.calcsize("<" + self._field_format(field))
+
+        self._compile()
+        self._column_steps = None
+
+    @staticmethod
+    def _normalize(field):
+        name, kind = field[0], field[1]
+        count = field[2] if len(field) > 2 else None
+        if isinstance(kind, tuple):
+            kind = RecordLayout(kind)
+        return name, kind, count
+
+    @staticmethod
+    def _field_format(field) -> str:
+        _, kind, count = field
+        fmt = kind.format if isinstance(kind, RecordLayout) else kind
+        return fmt * (count or 1)
+
+    def _expression(self, index: int) -> tuple:
+        """Build a dict display reading this record from the value tuple ``v``.
+
+        Returns:
+            tuple: Source of the expression and the index after the record.
+        """
+        items = []
+        for name, kind, count in self.fields:
+            if isinstance(kind, RecordLayout):
+                if count is None:
+                    value, index = kind._expression(index)
+                else:
+                    values = []
+                    for _ in range(count):
+                        value, index = kind._expression(index)
+                        values.append(value)
+                    value = "[" + ", ".join(values) + "]"
+            elif count is not None:
+                values = (f"v[{i}]" for i in range(index, index + count))
+                value = "[" + ", ".join(values) + "]"
+                index += count
+            elif kind.endswith("s"):
+                value = f"_decode_string(v[{index}])"
+                index += 1
+            else:
+                value = f"v[{index}]"
+                index += 1
+            items.append(f"{name!r}: {value}")
+        return "{" + ", ".join(items) + "}", index
+
+    def _compile(self) -> None:
+        expression, _ = self._expression(0)
+        source = (
+            f"def unpack(data, offset=0):\n"
+            f"    v = unpack_from(data, offset)\n"
+            f"    return {expression}\n"
+            f"def from_values(v):\n"
+            f"    return {expression}\n"
+        )
+        namespace = {
+            "unpack_from": self.struct.unpack_from,
+            "_decode_string": _decode_string,
+        }
+        exec(compile(source, "<packet_schema>", "exec"), namespace)
+        self.unpack = namespace["unpack"]
+        self.from_values = namespace["from_values"]
+
+    def unpack_many(self, data, offset: int, count: int) -> list:
+        """Decode consecutive records from a buffer.
+
+        Args:
+            data (bytes): Buffer holding the records.
+            offset (int): Byte offset of the first record.
+            count (int): Number of records.
+
+        Returns:
+            list: One dict per record.
+        """
+        unpack = self.unpack
+        size = self.size
+        return [unpack(data, offset + i * size) for i in range(count)]
+
+    def unpack_columns(self, data, offset: int = 0) -> dict:
+        """Decode a record with arrays of flat records as columns.
+
+        Every field of an array of flat records becomes one array holding
+        that field for all records, e.g. ``m_speed`` of all 22 cars. With
+        numpy installed the arrays are views into ``data`` via
+        ``np.frombuffer``, otherwise they are ``array.array`` copies.
+
+        Args:
+            data (bytes): Buffer holding the record.
+            offset (int): Byte offset of the record.
+
+        Returns:
+            dict: Field names mapped to values or column dicts.
+        """
+        if self._column_steps is None:
+            self._column_steps = self._compile_column_steps()
+        record = {}
+        for step in self._column_steps:
+            step(data, offset, record)
+        return record
+
+    def column_decoder(self, count: int):
+        """Build a decoder returning ``count`` consecutive records as columns.
+
+        Args:
+            count (int): Number of records.
+
+        Returns:
+            callable: ``decode(data, offset)`` returning a dict of arrays.
+        """
+        if not self.is_flat:
+            raise TypeError("Only flat records can be decoded as columns.")
+        if np is not None:
+            dtype = np.dtype(
+                [(name, NUMPY_TYPES[kind]) for name, kind, _ in self.fields]
+            )
+            names = self.names
+
+            def decode(data, offset):
+                records = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+                return {name: records[name] for name in names}
+
+            return decode
+
+        block = struct.Struct("<" + self.format * count)
+        step = len(self.fields)
+        columns = [
+            (name, ARRAY_TYPECODES.get(kind, kind), index)
+            for index, (name, kind, _) in enumerate(self.fields)
+        ]
+
+        def decode(data, offset):
+            values = block.unpack_from(data, offset)
+            return {
+                name: array(typecode, values[index::step])
+                for name, typecode, index in columns
+            }
+
+        return decode
+
+    def selected_decoder(self, field: str):
+        """Build a decoder that only decodes selected records of an array.
+
+        Args:
+            field (str): Name of an array of records, e.g. the 22 cars.
+
+        Returns:
+            callable: ``decode(data, indices, offset=0)`` returning the
+            record with every unselected array entry set to None, so the
+            kept entries stay at their index.
+        """
+        steps = []
+        selected = None
+        for name, kind, count in self.fields:
+            field_offset = self.offsets[name]
+            if name == field:
+                if not isinstance(kind, RecordLayout) or count is None:
+                    raise TypeError(f"{field} is not an array of records.")
+                selected = len(steps)
+                steps.append((name, kind.unpack, field_offset, kind.size, count))
+            else:
+                field_layout = RecordLayout(((name, kind, count),))
+                steps.append(_field_step(field_layout, field_offset))
+        if selected is None:
+            raise KeyError(field)
+
+        def decode(data, indices, offset=0):
+            if len(data) - offset < self.size:
+                raise struct.error(f"packet requires a buffer of {self.size} bytes")
+            record = {}
+            for position, step in enumerate(steps):
+                if position != selected:
+                    step(data, offset, record)
+                    continue
+                name, unpack, field_offset, size, count = step
+                records = [None] * count
+                base = offset + field_offset
+                for index in indices:
+                    if index < count:
+                        records[index] = unpack(data, base + index * size)
+                record[name] = records
+            return record
+
+        return decode
+
+    def _compile_column_steps(self) -> list:
+        steps = []
+        for name, kind, count in self.fields:
+            field_offset = self.offsets[name]
+            if isinstance(kind, RecordLayout) and count is not None and kind.is_flat:
+                steps.append(_column_step(name, kind.column_decoder(count), field_offset))
+            else:
+                field_layout = RecordLayout(((name, kind, count),))
+                steps.append(_field_step(field_layout, field_offset))
+        return steps
+
+
+def _column_step(name, decode, field_offset):
+    def step(data, offset, record):
+        record[name] = decode(data, offset + field_offset)
+
+    return step
+
+
+def _field_step(field_layout, field_offset):
+    unpack = field_layout.unpack
+
+    def step(data, offset, record):
+        record.update(unpack(data, offset + field_offset))
+
+    return step
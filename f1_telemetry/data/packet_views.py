@@ -0,0 +1,205 @@
+"""Lazy packet views that decode fields when they are read.
+
+The packet parsers decode every field of every car into dicts. Consumers
+that only need a few fields, e.g. speed and gear of the player car, can
+wrap the raw datagram in a view instead:
+
+    view = packet_view(message)
+    view.m_header.m_playerCarIndex
+    view.m_carTelemetryData[0].m_speed
+
+A view holds the buffer and the byte offset of its record. Every field is
+a property that unpacks just that field with a precompiled struct at its
+offset from ``RecordLayout.offsets``, nested records and arrays of records
+are views over the same buffer. ``to_dict()`` decodes the whole record
+with the regular parser, for storage paths that need every field.
+
+Views don't copy the buffer. A memoryview of a receive buffer slot has to
+be copied with ``bytes()`` before the slot is released if the view is kept.
+"""
+import struct
+from collections.abc import Sequence
+from f1_telemetry.data.packet_schema import RecordLayout, _decode_string
+from f1_telemetry.data.struct_parsers import (
+    EVENT_CODE_OFFSET,
+    PACKET_EVENT_LAYOUTS,
+    PACKET_EVENT_NO_DETAILS_LAYOUT,
+    PACKET_FORMAT,
+    PACKET_LAYOUTS,
+)
+from f1_telemetry.data.udp_stream import PARSER_REGISTRY
+
+
+class RecordView:
+    """Base class of the generated views of a record layout.
+
+    Args:
+        data (bytes): Buffer holding the record.
+        offset (int): Byte offset of the record.
+
+    Attributes:
+        layout (RecordLayout): Layout of the record, set on the subclass.
+    """
+
+    __slots__ = ("_data", "_offset")
+    layout = None
+
+    def __init__(self, data, offset: int = 0):
+        self._data = data
+        self._offset = offset
+
+    def to_dict(self) -> dict:
+        """Decode every field of the record."""
+        return self.layout.unpack(self._data, self._offset)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} at offset {self._offset}>"
+
+
+class RecordArray(Sequence):
+    """Array of records as views, e.g. the 22 cars of a packet.
+
+    Args:
+        view_type (type): RecordView subclass of the records.
+        data (bytes): Buffer holding the records.
+        offset (int): Byte offset of the first record.
+        count (int): Number of records.
+    """
+
+    __slots__ = ("_view_type", "_data", "_offset", "_count")
+
+    def __init__(self, view_type: type, data, offset: int, count: int):
+        self._view_type = view_type
+        self._data = data
+        self._offset = offset
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("record index out of range")
+        return self._view_type(
+            self._data, self._offset + index * self._view_type.layout.size
+        )
+
+    def to_list(self) -> list:
+        """Decode every record."""
+        return [view.to_dict() for view in self]
+
+
+def _value_property(name: str, kind: str, count: int, field_offset: int):
+    unpack_from = struct.Struct("<" + kind * (count or 1)).unpack_from
+    if count is not None:
+
+        def get(self):
+            return list(unpack_from(self._data, self._offset + field_offset))
+
+    elif kind.endswith("s"):
+
+        def get(self):
+            (value,) = unpack_from(self._data, self._offset + field_offset)
+            return _decode_string(value)
+
+    else:
+
+        def get(self):
+            return unpack_from(self._data, self._offset + field_offset)[0]
+
+    get.__name__ = name
+    return property(get)
+
+
+def _record_property(name: str, kind: RecordLayout, count: int, field_offset: int):
+    view_type = view_class(kind, name)
+    if count is None:
+
+        def get(self):
+            return view_type(self._data, self._offset + field_offset)
+
+    else:
+
+        def get(self):
+            return RecordArray(
+                view_type, self._data, self._offset + field_offset, count
+            )
+
+    get.__name__ = name
+    return property(get)
+
+
+_VIEW_CLASSES = {}
+
+
+def view_class(layout: RecordLayout, name: str = "RecordView") -> type:
+    """Build the view class of a layout, once per layout.
+
+    Args:
+        layout (RecordLayout): Layout of the record.
+        name (str): Class name, used in reprs.
+
+    Returns:
+        type: RecordView subclass with one property per field.
+    """
+    view_type = _VIEW_CLASSES.get(id(layout))
+    if view_type is not None:
+        return view_type
+    namespace = {"__slots__": (), "layout": layout}
+    for field_name, kind, count in layout.fields:
+        field_offset = layout.offsets[field_name]
+        if isinstance(kind, RecordLayout):
+            field_property = _record_property(field_name, kind, count, field_offset)
+        else:
+            field_property = _value_property(field_name, kind, count, field_offset)
+        namespace[field_name] = field_property
+    view_type = type(name, (RecordView,), namespace)
+    _VIEW_CLASSES[id(layout)] = view_type
+    return view_type
+
+
+PACKET_VIEWS = {
+    packet_id: view_class(layout, "PacketView")
+    for packet_id, layout in PACKET_LAYOUTS.items()
+    if packet_id != 3
+}
+EVENT_VIEWS = {
+    code: view_class(layout, "EventView")
+    for code, layout in PACKET_EVENT_LAYOUTS.items()
+}
+EVENT_NO_DETAILS_VIEW = view_class(PACKET_EVENT_NO_DETAILS_LAYOUT, "EventView")
+# Packet views by m_packetFormat, the layouts are those of F1 23.
+FORMAT_VIEWS = {PACKET_FORMAT: PACKET_VIEWS}
+
+
+def packet_view(message) -> RecordView:
+    """Wrap a raw telemetry message in a lazy view.
+
+    The packet is checked by ``PARSER_REGISTRY`` like in ``parse_packet``,
+    so views accept the same packets as the parsers and rejected packets
+    are counted there.
+
+    Args:
+        message (bytes): Raw UDP datagram or a memoryview of it.
+
+    Returns:
+        RecordView: View of the packet or None if the packet format or type
+        is not supported, the packet has the wrong length or there are no
+        views for its format.
+    """
+    checked = PARSER_REGISTRY.check(message)
+    if checked is None:
+        return None
+    packet_format, packet_id = checked
+    views = FORMAT_VIEWS.get(packet_format.packet_format)
+    if views is None:
+        return None
+    if packet_id == 3:
+        code = bytes(message[EVENT_CODE_OFFSET : EVENT_CODE_OFFSET + 4])
+        return EVENT_VIEWS.get(code, EVENT_NO_DETAILS_VIEW)(message)
+    view_type = views.get(packet_id)
+    return view_type(message) if view_type is not None else None
@@ -0,0 +1,160 @@
+"""Packet decoders by packet format and packet id.
+
+Every game year writes its own ``m_packetFormat``, 2023 for F1 23, and the
+packet layouts change between years while the header stays readable. The
+registry holds the precompiled decoders and the exact datagram size of
+every packet type of each supported format. A packet is checked from its
+first two bytes and its length before anything is unpacked, so packets of
+an unsupported game version or truncated datagrams are rejected instead of
+being decoded into garbage.
+"""
+from f1_telemetry.data.packet_filter import PACKET_ID_OFFSET, PacketFilter
+from f1_telemetry.data.struct_parsers import PACKET_HEADER_LAYOUT
+
+PACKET_FORMAT_OFFSET = PACKET_HEADER_LAYOUT.offsets["m_packetFormat"]
+PACKET_HEADER_SIZE = PACKET_HEADER_LAYOUT.size
+
+
+class PacketFormat:
+    """Decoders of the packets of one game version.
+
+    Args:
+        packet_format (int): m_packetFormat of the packets, e.g. 2023.
+        sizes (dict): Datagram size by packet id.
+        parsers (dict): Packet parser by packet id.
+        columnar (dict): Columnar packet parser by packet id, parsers
+            without a columnar form are taken from ``parsers``.
+        selected (dict): Selected car parser by packet id.
+    """
+
+    def __init__(
+        self,
+        packet_format: int,
+        sizes: dict,
+        parsers: dict,
+        columnar: dict = None,
+        selected: dict = None,
+    ):
+        missing = set(parsers) - set(sizes)
+        if missing:
+            raise ValueError(f"No size for packet ids {sorted(missing)}.")
+        self.packet_format = packet_format
+        self.sizes = dict(sizes)
+        self.parsers = dict(parsers)
+        self.columnar = {**self.parsers, **(columnar or {})}
+        self.selected = dict(selected or {})
+
+
+class ParserRegistry:
+    """Pick the decoder of a packet by its packet format and packet id.
+
+    Args:
+        formats (iterable): PacketFormat objects to register.
+
+    Attributes:
+        formats (dict): PacketFormat by m_packetFormat.
+        unsupported_format (int): Packets of a format that isn't registered.
+        wrong_size (int): Packets whose length doesn't match their type.
+    """
+
+    def __init__(self, formats=()):
+        self.formats = {}
+        self.unsupported_format = 0
+        self.wrong_size = 0
+        for packet_format in formats:
+            self.register(packet_format)
+
+    def register(self, packet_format: PacketFormat) -> None:
+        """Add or replace the decoders of a packet format."""
+        self.formats[packet_format.packet_format] = packet_format
+
+    def has_header(self, message) -> bool:
+        """Check that a message holds a whole packet header.
+
+        Header-only readers such as PacketFilter index into the header, so
+        shorter datagrams are rejected before them and counted as wrong_size.
+        """
+        if len(message) < PACKET_HEADER_SIZE:
+            self.wrong_size += 1
+            return False
+        return True
+
+    def lookup(self, message) -> PacketFormat:
+        """PacketFormat of a message, None if the format isn't registered.
+
+        Args:
+            message (bytes): Raw datagram or a memoryview of it.
+        """
+        return self.formats.get(
+            message[PACKET_FORMAT_OFFSET] | message[PACKET_FORMAT_OFFSET + 1] << 8
+        )
+
+    def check(self, message) -> tuple:
+        """Check the packet format and the length of a message.
+
+        Rejected packets are counted as unsupported_format or wrong_size,
+        packet ids the format doesn't know are not counted.
+
+        Args:
+            message (bytes): Raw datagram or a memoryview of it.
+
+        Returns:
+            tuple: PacketFormat and packet id, or None if the packet is
+            rejected.
+        """
+        if len(message) <= PACKET_ID_OFFSET:
+            self.wrong_size += 1
+            return None
+        packet_format = self.lookup(message)
+        if packet_format is None:
+            self.unsupported_format += 1
+            return None
+        packet_id = message[PACKET_ID_OFFSET]
+        size = packet_format.sizes.get(packet_id)
+        if size is None:
+            return None
+        if len(message) != size:
+            self.wrong_size += 1
+            return None
+        return packet_format, packet_id
+
+    def parse(
+        self,
+        message,
+        columnar: bool = False,
+        packet_filter: PacketFilter = None,
+    ) -> dict:
+        """Parse a raw telemetry message with the decoder of its version.
+
+        Args:
+            message (bytes): Raw UDP datagram or a memoryview of it.
+            columnar (bool): Decode the 22-car packets as one array per field.
+            packet_filter (PacketFilter): Packet types and cars to keep.
+
+        Returns:
+            dict: Parsed packet or None if the packet format or type is not
+            supported, its length is wrong or it is filtered out.
+        """
+        checked = self.check(message)
+        if checked is None:
+            return None
+        packet_format, packet_id = checked
+        if packet_filter is not None:
+            if not packet_filter.accepts(message):
+                return None
+            if not columnar:
+                cars = packet_filter.car_indices(message)
+                if cars is not None and packet_id in packet_format.selected:
+                    return packet_format.selected[packet_id](message, cars)
+        parsers = packet_format.columnar if columnar else packet_format.parsers
+        parser = parsers.get(packet_id)
+        if parser is not None:
+            return parser(message)
+        return None
+
+    def stats(self) -> dict:
+        """Rejected packets."""
+        return {
+            "unsupported_format": self.unsupported_format,
+            "wrong_size": self.wrong_size,
+        }
@@ -0,0 +1,323 @@
+"""Threaded ingest pipeline for the F1 UDP stream.
+
+A receiver thread only drains the UDP socket into a bounded queue of raw
+datagrams. A parser thread decodes them and a writer thread hands the parsed
+packets to a storage callback, so slow writes no longer hold up recvfrom.
+
+Datagrams are received with ``recvfrom_into`` into a preallocated buffer
+pool and the parser reads straight from the pool slots, so raw packets are
+never copied on their way through the raw queue.
+"""
+import os
+import queue
+import socket
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+from f1_telemetry.data.metrics import Histogram, SequenceTracker
+from f1_telemetry.data.packet_filter import PacketFilter
+from f1_telemetry.data.udp_stream import (
+    PARSER_REGISTRY,
+    BufferPool,
+    create_udp_socket,
+    parse_packet,
+)
+
+load_dotenv()
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"
+QUEUE_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+F1_QUEUE_SIZE = int(os.environ.get("F1_QUEUE_SIZE", 4096))
+F1_QUEUE_POLICY = str(os.environ.get("F1_QUEUE_POLICY", DROP_OLDEST))
+
+RECEIVE_TIMEOUT = 0.5
+IDLE_TIMEOUT = 0.1
+# perf_counter_ns receive time of a parsed packet, carried to the sinks.
+RECEIVED_NS_KEY = "_received_ns"
+
+
+class QueueClosed(Exception):
+    """Raised by BoundedQueue.get once the queue is closed and drained."""
+
+
+class BoundedQueue:
+    """Bounded FIFO queue with a configurable policy for when it is full.
+
+    With the drop_oldest policy a put on a full queue discards the oldest
+    item, with drop_newest it discards the new item and with the block
+    policy it waits until a consumer makes room.
+
+    Args:
+        maxsize (int): Capacity of the queue.
+        policy (str): Full-queue policy, "drop_oldest", "drop_newest" or
+            "block".
+        on_drop (callable): Called with every item discarded by a drop
+            policy.
+
+    Attributes:
+        dropped (int): Items discarded by a drop policy.
+        high_water (int): Largest number of items held at once.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = F1_QUEUE_SIZE,
+        policy: str = F1_QUEUE_POLICY,
+        on_drop=None,
+    ):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1.")
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy {policy!r}.")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.on_drop = on_drop
+        self.dropped = 0
+        self.high_water = 0
+        self._items = deque()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, item) -> bool:
+        """Add an item, applying the full-queue policy.
+
+        Args:
+            item: Item to enqueue.
+
+        Returns:
+            bool: False if the item was not added because the queue was
+            closed or it was dropped by the drop_newest policy.
+        """
+        with self._lock:
+            if len(self._items) >= self.maxsize:
+                if self.policy == DROP_OLDEST:
+                    dropped = self._items.popleft()
+                    self.dropped += 1
+                    if self.on_drop is not None:
+                        self.on_drop(dropped)
+                elif self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    if self.on_drop is not None:
+                        self.on_drop(item)
+                    return False
+                else:
+                    while len(self._items) >= self.maxsize and not self._closed:
+                        self._not_full.wait()
+            if self._closed:
+                return False
+            self._items.append(item)
+            self.high_water = max(self.high_water, len(self._items))
+            self._not_empty.notify()
+            return True
+
+    def get(self, timeout: float = None):
+        """Remove and return the oldest item.
+
+        Args:
+            timeout (float): Seconds to wait for an item.
+
+        Raises:
+            queue.Empty: No item arrived within the timeout.
+            QueueClosed: The queue is closed and all items were consumed.
+        """
+        with self._lock:
+            if not self._items and not self._closed:
+                self._not_empty.wait(timeout)
+            if self._items:
+                item = self._items.popleft()
+                self._not_full.notify()
+                return item
+            if self._closed:
+                raise QueueClosed()
+            raise queue.Empty()
+
+    def close(self) -> None:
+        """Stop accepting items and wake up all waiting threads."""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+
+class IngestPipeline:
+    """Receiver, parser and writer threads connected by bounded queues.
+
+    Args:
+        handle_packet (callable): Called from the writer thread with every
+            parsed packet.
+        on_idle (callable): Called from the writer thread whenever no packet
+            arrived for a short while, e.g. to flush time-based buffers.
+        udp_socket (socket.socket): Socket to read from. A socket bound to
+            the configured F1 address is created if omitted.
+        queue_size (int): Capacity of each queue.
+        policy (str): Full-queue policy, "drop_oldest", "drop_newest" or
+            "block".
+        packet_filter (PacketFilter): Packet types and cars to keep. Packet
+            types are filtered by the receiver before queueing.
+        sequence_tracker (SequenceTracker): Counts frame gaps, duplicates
+            and reordering of the received packets.
+
+    Attributes:
+        handled (int): Packets handle_packet returned for, e.g. packets
+            published to the fan-out, not documents stored.
+        latency (dict): Histograms of the time since receive until a packet
+            is taken off the raw queue ("queue"), the parse duration
+            ("parse") and until handle_packet returned ("handle").
+    """
+
+    def __init__(
+        self,
+        handle_packet,
+        on_idle=None,
+        udp_socket: socket.socket = None,
+        queue_size: int = F1_QUEUE_SIZE,
+        policy: str = F1_QUEUE_POLICY,
+        packet_filter: PacketFilter = None,
+        sequence_tracker: SequenceTracker = None,
+    ):
+        self.handle_packet = handle_packet
+        self.on_idle = on_idle
+        self.packet_filter = packet_filter
+        self.sequence_tracker = sequence_tracker
+        self.udp_socket = udp_socket or create_udp_socket()
+        # One slot per queued datagram plus the ones held by the receiver
+        # and the parser, so acquiring a slot never has to wait.
+        self.buffer_pool = BufferPool(queue_size + 2)
+        self.raw_queue = BoundedQueue(
+            queue_size, policy, on_drop=lambda item: self.buffer_pool.release(item[0])
+        )
+        self.parsed_queue = BoundedQueue(queue_size, policy)
+        self.received = 0
+        self.filtered = 0
+        self.parsed = 0
+        self.skipped = 0
+        self.handled = 0
+        self.parse_errors = 0
+        self.handle_errors = 0
+        self.latency = {"queue": Histogram(), "parse": Histogram(), "handle": Histogram()}
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._receive, name="f1-receiver", daemon=True),
+            threading.Thread(target=self._parse, name="f1-parser", daemon=True),
+            threading.Thread(target=self._write, name="f1-writer", daemon=True),
+        ]
+
+    def start(self) -> None:
+        """Start all pipeline threads."""
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Stop receiving and wait until queued packets have been written."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def run_forever(self) -> None:
+        """Run the pipeline until interrupted with Ctrl+C."""
+        self.start()
+        try:
+            while not self._stop.is_set():
+                time.sleep(RECEIVE_TIMEOUT)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stats(self) -> dict:
+        """Counters for each pipeline stage."""
+        return {
+            "received": self.received,
+            "filtered": self.filtered,
+            "receive_dropped": self.raw_queue.dropped,
+            "receive_queued": len(self.raw_queue),
+            "parsed": self.parsed,
+            "skipped": self.skipped,
+            "parse_errors": self.parse_errors,
+            "parse_dropped": self.parsed_queue.dropped,
+            "parse_queued": len(self.parsed_queue),
+            "handled": self.handled,
+            "handle_errors": self.handle_errors,
+        }
+
+    def _receive(self) -> None:
+        self.udp_socket.settimeout(RECEIVE_TIMEOUT)
+        packet_filter = self.packet_filter
+        sequence_tracker = self.sequence_tracker
+        slot = self.buffer_pool.acquire()
+        try:
+            while not self._stop.is_set():
+                try:
+                    message, _ = self.buffer_pool.receive(self.udp_socket, slot)
+                except socket.timeout:
+                    continue
+                received_ns = time.perf_counter_ns()
+                self.received += 1
+                if not PARSER_REGISTRY.has_header(message):
+                    continue
+                if packet_filter is not None and not packet_filter.accepts(message):
+                    self.filtered += 1
+                    continue
+                if sequence_tracker is not None:
+                    sequence_tracker.observe(message)
+                # A dropped datagram's slot is released by on_drop.
+                self.raw_queue.put((slot, message, received_ns))
+                slot = self.buffer_pool.acquire()
+        finally:
+            self.buffer_pool.release(slot)
+            self.raw_queue.close()
+
+    def _parse(self) -> None:
+        queue_latency = self.latency["queue"]
+        parse_latency = self.latency["parse"]
+        try:
+            while True:
+                try:
+                    slot, message, received_ns = self.raw_queue.get()
+                except QueueClosed:
+                    break
+                started_ns = time.perf_counter_ns()
+                queue_latency.observe_ns(started_ns - received_ns)
+                try:
+                    packet = parse_packet(message, packet_filter=self.packet_filter)
+                except Exception:
+                    self.parse_errors += 1
+                    continue
+                finally:
+                    self.buffer_pool.release(slot)
+                parse_latency.observe_ns(time.perf_counter_ns() - started_ns)
+                if packet is None:
+                    self.skipped += 1
+                    continue
+                self.parsed += 1
+                packet[RECEIVED_NS_KEY] = received_ns
+                self.parsed_queue.put((packet, received_ns))
+        finally:
+            self.parsed_queue.close()
+
+    def _write(self) -> None:
+        handle_latency = self.latency["handle"]
+        while True:
+            try:
+                packet, received_ns = self.parsed_queue.get(IDLE_TIMEOUT)
+            except queue.Empty:
+                if self.on_idle is not None:
+                    self.on_idle()
+                continue
+            except QueueClosed:
+                break
+            try:
+                self.handle_packet(packet)
+                self.handled += 1
+            except Exception:
+                self.handle_errors += 1
+            handle_latency.observe_ns(time.perf_counter_ns() - received_ns)
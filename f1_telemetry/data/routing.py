@@ -0,0 +1,244 @@
+"""Route packet documents into collections and manage their indexes.
+
+By default every packet type has one collection for all sessions. With
+``F1_COLLECTION_ROUTING`` set to "session" or "day" the documents of a
+session, or of a day, go into their own collection per packet type, e.g.
+``car_telemetry_s1234`` or ``car_telemetry_20231018``. Dropping a whole
+session or day is then a collection drop instead of a delete.
+
+Every packet collection gets compound indexes on the session UID and the
+frame identifier, and the lap collection one on the session UID and the
+lap number of the cars, for queries such as "lap 12 of session X". The
+packet type is the collection itself. Per-car measurements have their own
+indexes, see timeseries.py.
+
+``F1_RETENTION_DAYS`` limits how long documents are kept. Single and
+per-session collections get a TTL index on ``_ingested_at``, per-day
+collections older than the retention are dropped when a new day starts.
+"""
+import os
+import re
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+from f1_telemetry.data.compact import COMPACT, F1_DOCUMENT_ENCODING, compact_path
+
+load_dotenv()
+
+# "single" collection per packet type, or one per "session" or per "day".
+F1_COLLECTION_ROUTING = str(os.environ.get("F1_COLLECTION_ROUTING", "single"))
+# Days documents are kept for, 0 keeps them forever.
+F1_RETENTION_DAYS = int(os.environ.get("F1_RETENTION_DAYS", 0))
+
+SINGLE = "single"
+SESSION = "session"
+DAY = "day"
+ROUTINGS = (SINGLE, SESSION, DAY)
+
+TTL_INDEX_NAME = "ingested_at_ttl"
+DAY_FORMAT = "%Y%m%d"
+ROUTED_NAME = re.compile(r"^(?P<collection>.+?)_(?:s(?P<session>\d+)|(?P<day>\d{8}))$")
+LAP_NUMBER = "m_lapData.m_currentLapNum"
+
+
+def packet_indexes(collection: str, encoding: str = F1_DOCUMENT_ENCODING) -> list:
+    """Compound indexes of a packet collection.
+
+    Args:
+        collection (str): Packet collection name, e.g. "lap".
+        encoding (str): "full" or "compact" documents, which store the
+            header under different paths.
+
+    Returns:
+        list: Index key lists for create_index.
+    """
+    if encoding == COMPACT:
+        session_uid, frame = "u", "f"
+        lap_number = compact_path(2, LAP_NUMBER)
+    else:
+        session_uid, frame = "m_header.m_sessionUID", "m_header.m_frameIdentifier"
+        lap_number = LAP_NUMBER
+    indexes = [[(session_uid, ASCENDING), (frame, ASCENDING)]]
+    if collection == "lap":
+        indexes.append([(session_uid, ASCENDING), (lap_number, ASCENDING)])
+    return indexes
+
+
+def routed_collection(name: str) -> str:
+    """Packet collection of a routed collection name, the name if not routed."""
+    match = ROUTED_NAME.match(name)
+    return match.group("collection") if match else name
+
+
+def session_collections(names, collection: str, session_uid: int) -> list:
+    """Collections that can hold documents of a session.
+
+    Args:
+        names (iterable): Existing collection names.
+        collection (str): Packet collection name.
+        session_uid (int): Session UID.
+
+    Returns:
+        list: The packet collection, its collection of the session and its
+        day collections, as far as they exist.
+    """
+    found = []
+    for name in sorted(names):
+        if name == collection:
+            found.append(name)
+            continue
+        match = ROUTED_NAME.match(name)
+        if not match or match.group("collection") != collection:
+            continue
+        if match.group("day") or int(match.group("session")) == session_uid:
+            found.append(name)
+    return found
+
+
+class CollectionRouter:
+    """Pick the collection of a packet document and set it up on first use.
+
+    Without a database, e.g. for the file sink, only the names are routed.
+
+    Args:
+        database: MongoDB database, or None.
+        collections (iterable): Packet collection names.
+        routing (str): "single", "session" or "day".
+        retention_days (int): Days documents are kept, 0 keeps them.
+        encoding (str): Document encoding the indexes are built for.
+
+    Attributes:
+        created (int): Routed collections set up by this router.
+        dropped (int): Expired day collections dropped.
+    """
+
+    def __init__(
+        self,
+        database=None,
+        collections=(),
+        routing: str = F1_COLLECTION_ROUTING,
+        retention_days: int = F1_RETENTION_DAYS,
+        encoding: str = F1_DOCUMENT_ENCODING,
+    ):
+        if routing not in ROUTINGS:
+            raise ValueError(f"Unknown collection routing {routing!r}.")
+        self.database = database
+        self.collections = frozenset(collections)
+        self.routing = routing
+        self.retention_days = retention_days
+        self.encoding = encoding
+        self.created = 0
+        self.dropped = 0
+        self._names = {}
+        self._checked_day = None
+
+    def setup(self) -> None:
+        """Create the collections and indexes needed at startup.
+
+        Single collections are created with their indexes, expired day
+        collections are dropped. Routed collections are set up when their
+        first document is routed.
+        """
+        if self.database is None:
+            return
+        existing = set(self.database.list_collection_names())
+        if self.routing == SINGLE:
+            for collection in sorted(self.collections):
+                if collection not in existing:
+                    self.database.create_collection(collection)
+                self.ensure_indexes(collection)
+        elif self.routing == DAY and self.retention_days:
+            self.drop_expired(datetime.utcnow(), existing)
+
+    def collection(self, collection: str, session_uid: int, ingested_at: datetime) -> str:
+        """Collection to write a packet document to.
+
+        Args:
+            collection (str): Packet collection name.
+            session_uid (int): Session UID of the packet.
+            ingested_at (datetime): Receive time of the packet.
+
+        Returns:
+            str: Collection name.
+        """
+        if self.routing == SINGLE:
+            return collection
+        if self.routing == SESSION:
+            key = (collection, session_uid)
+        else:
+            key = (collection, ingested_at.date())
+        name = self._names.get(key)
+        if name is None:
+            if self.routing == SESSION:
+                name = f"{collection}_s{session_uid}"
+            else:
+                name = f"{collection}_{ingested_at:{DAY_FORMAT}}"
+                if (
+                    self.retention_days
+                    and self.database is not None
+                    and key[1] != self._checked_day
+                ):
+                    self._checked_day = key[1]
+                    self.drop_expired(ingested_at)
+            self._names[key] = name
+            if self.database is not None:
+                self.ensure_indexes(name)
+                self.created += 1
+        return name
+
+    def ensure_indexes(self, name: str) -> None:
+        """Create the indexes of a packet collection, routed or not.
+
+        Collections that aren't packet collections are left alone.
+        """
+        collection = routed_collection(name)
+        if collection not in self.collections:
+            return
+        for keys in packet_indexes(collection, self.encoding):
+            self.database[name].create_index(keys)
+        if self.retention_days and self.routing != DAY:
+            self._ensure_ttl(name)
+
+    def _ensure_ttl(self, name: str) -> None:
+        seconds = int(timedelta(days=self.retention_days).total_seconds())
+        try:
+            self.database[name].create_index(
+                [("_ingested_at", ASCENDING)],
+                name=TTL_INDEX_NAME,
+                expireAfterSeconds=seconds,
+            )
+        except OperationFailure:
+            # The retention changed since the index was created.
+            self.database.command(
+                "collMod",
+                name,
+                index={"name": TTL_INDEX_NAME, "expireAfterSeconds": seconds},
+            )
+
+    def drop_expired(self, now: datetime, existing=None) -> list:
+        """Drop the day collections older than the retention.
+
+        Args:
+            now (datetime): Current time.
+            existing (iterable): Collection names, listed if omitted.
+
+        Returns:
+            list: Dropped collection names.
+        """
+        if existing is None:
+            existing = self.database.list_collection_names()
+        oldest = (now - timedelta(days=self.retention_days)).strftime(DAY_FORMAT)
+        dropped = []
+        for name in sorted(existing):
+            match = ROUTED_NAME.match(name)
+            if (
+                match
+                and match.group("day")
+                and match.group("collection") in self.collections
+                and match.group("day") < oldest
+            ):
+                self.database.drop_collection(name)
+                dropped.append(name)
+        self.dropped += len(dropped)
+        return dropped
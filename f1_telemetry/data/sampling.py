@@ -0,0 +1,298 @@
+"""Downsampling and change-only storage for high-rate packet types.
+
+Policies are configured per collection with ``F1_SAMPLING``, a semicolon
+separated list of ``collection=policy`` entries:
+
+    nth:N                  keep every Nth packet
+    hz:X                   keep at most X packets per second of session time
+    deadband:D[:field=D]   keep only car fields that changed by more than D,
+                           with optional per-field deadbands
+
+For example ``motion=hz:10;car_telemetry=deadband:0:m_engineRPM=50``.
+Collections without a policy are stored losslessly. Policies keep their
+state for the ``MAX_SESSIONS`` most recently seen sessions.
+"""
+import os
+from collections import OrderedDict, defaultdict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+F1_SAMPLING = str(os.environ.get("F1_SAMPLING", ""))
+# Full documents are stored every this many packets in deadband mode, so
+# readers can rebuild the state from the nearest keyframe.
+F1_DEADBAND_KEYFRAME_EVERY = int(os.environ.get("F1_DEADBAND_KEYFRAME_EVERY", 60))
+
+MAX_SESSIONS = 64
+
+LOSSLESS_COLLECTIONS = frozenset(
+    (
+        "session",
+        "participants",
+        "final_classification",
+        "tyre_sets",
+        "event",
+        "lobby_info",
+        "session_history",
+    )
+)
+
+
+def _session_state(sessions: OrderedDict, session_uid, create, max_sessions: int):
+    """State of a session, created if missing and moved to the end.
+
+    The least recently seen session is forgotten once more than
+    ``max_sessions`` are known.
+    """
+    state = sessions.get(session_uid)
+    if state is None:
+        state = sessions[session_uid] = create()
+        if len(sessions) > max_sessions:
+            sessions.popitem(last=False)
+    else:
+        sessions.move_to_end(session_uid)
+    return state
+
+
+class EveryNth:
+    """Keep every Nth packet of a session."""
+
+    def __init__(self, n: int, max_sessions: int = MAX_SESSIONS):
+        if n < 1:
+            raise ValueError("n must be at least 1.")
+        self.n = n
+        self.max_sessions = max_sessions
+        # Session UID mapped to [packet count].
+        self._counts = OrderedDict()
+
+    def apply(self, session_uid, data: dict) -> dict:
+        state = _session_state(self._counts, session_uid, lambda: [0], self.max_sessions)
+        count = state[0]
+        state[0] = count + 1
+        return data if count % self.n == 0 else None
+
+
+class MaxRate:
+    """Keep at most ``hz`` packets per second of session time."""
+
+    def __init__(self, hz: float, max_sessions: int = MAX_SESSIONS):
+        if hz <= 0:
+            raise ValueError("hz must be positive.")
+        self.interval = 1.0 / hz
+        self.max_sessions = max_sessions
+        # Session UID mapped to [session time of the last kept packet].
+        self._last_kept = OrderedDict()
+
+    def apply(self, session_uid, data: dict) -> dict:
+        session_time = data["m_header"]["m_sessionTime"]
+        state = _session_state(
+            self._last_kept, session_uid, lambda: [None], self.max_sessions
+        )
+        last_kept = state[0]
+        if (
+            last_kept is not None
+            and last_kept <= session_time < last_kept + self.interval
+        ):
+            return None
+        state[0] = session_time
+        return data
+
+
+class Deadband:
+    """Keep only per-car fields that changed beyond a deadband.
+
+    Car arrays (lists of dicts) are replaced by dicts holding only the fields
+    whose value moved by more than the field's deadband since it was last
+    stored. Other fields are kept as they are and count as a change when
+    they moved beyond their deadband too, except for the header and the
+    underscore fields added by the ingest. Every ``keyframe_every`` packets
+    the full document is stored. Delta documents are marked with
+    ``_delta: True``. A packet without any change is dropped.
+
+    Args:
+        default (float): Deadband of fields without their own.
+        deadbands (dict): Deadband by field name.
+        keyframe_every (int): Packets between full documents.
+        max_sessions (int): Sessions whose stored values are kept, the
+            least recently seen one is forgotten and starts over with a
+            keyframe.
+    """
+
+    def __init__(
+        self,
+        default: float = 0.0,
+        deadbands: dict = None,
+        keyframe_every: int = F1_DEADBAND_KEYFRAME_EVERY,
+        max_sessions: int = MAX_SESSIONS,
+    ):
+        self.default = default
+        self.deadbands = deadbands or {}
+        self.keyframe_every = keyframe_every
+        self.max_sessions = max_sessions
+        # Session UID mapped to [packet count, stored car arrays, stored
+        # packet fields], least recently seen session first.
+        self._sessions = OrderedDict()
+
+    def apply(self, session_uid, data: dict) -> dict:
+        state = _session_state(
+            self._sessions, session_uid, lambda: [0, {}, {}], self.max_sessions
+        )
+        count, stored, stored_fields = state
+        state[0] = count + 1
+        if count % self.keyframe_every == 0:
+            for name, value in data.items():
+                if _is_car_array(value):
+                    stored[name] = [dict(car) if car else car for car in value]
+                elif _is_compared(name):
+                    stored_fields[name] = value
+            return data
+
+        fields = {
+            name: value
+            for name, value in data.items()
+            if _is_compared(name) and not _is_car_array(value)
+        }
+        field_changes = self._changes(fields, stored_fields)
+        stored_fields.update(field_changes)
+        changed_any = bool(field_changes)
+        delta = {}
+        for name, value in data.items():
+            if not _is_car_array(value):
+                delta[name] = value
+                continue
+            previous_cars = stored.get(name)
+            delta_cars = []
+            for index, car in enumerate(value):
+                if not car:
+                    delta_cars.append(car)
+                    continue
+                previous = previous_cars[index] if previous_cars else None
+                if not previous:
+                    changes = dict(car)
+                    if previous_cars:
+                        previous_cars[index] = dict(car)
+                else:
+                    changes = self._changes(car, previous)
+                    previous.update(changes)
+                changed_any = changed_any or bool(changes)
+                delta_cars.append(changes)
+            delta[name] = delta_cars
+        if not changed_any:
+            return None
+        delta["_delta"] = True
+        return delta
+
+    def _changes(self, car: dict, previous: dict) -> dict:
+        changes = {}
+        deadbands = self.deadbands
+        default = self.default
+        for field, value in car.items():
+            old = previous.get(field)
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)):
+                if abs(value - old) > deadbands.get(field, default):
+                    changes[field] = value
+            elif value != old:
+                changes[field] = value
+        return changes
+
+
+def _is_car_array(value) -> bool:
+    return isinstance(value, list) and any(isinstance(car, dict) for car in value)
+
+
+def _is_compared(name: str) -> bool:
+    return name != "m_header" and not name.startswith("_")
+
+
+def _count_fields(data: dict) -> int:
+    fields = 0
+    for value in data.values():
+        if _is_car_array(value):
+            fields += sum(len(car) for car in value if car)
+        else:
+            fields += 1
+    return fields
+
+
+def parse_policy(value: str):
+    """Parse one policy such as ``nth:3``, ``hz:10`` or ``deadband:0.5``.
+
+    Returns:
+        Policy object or None for lossless storage.
+    """
+    name, _, argument = value.strip().partition(":")
+    name = name.lower()
+    if name in ("", "all"):
+        return None
+    if name == "nth":
+        return EveryNth(int(argument))
+    if name == "hz":
+        return MaxRate(float(argument))
+    if name == "deadband":
+        default, *overrides = argument.split(":") if argument else ("0",)
+        deadbands = {}
+        for override in overrides:
+            field, _, band = override.partition("=")
+            deadbands[field.strip()] = float(band)
+        return Deadband(float(default or 0), deadbands)
+    raise ValueError(f"Unknown sampling policy {value!r}.")
+
+
+class Sampler:
+    """Apply the per-collection sampling policies and count the reduction.
+
+    Args:
+        policies (dict): Collection name mapped to a policy object.
+    """
+
+    def __init__(self, policies: dict = None):
+        policies = policies or {}
+        lossy = LOSSLESS_COLLECTIONS.intersection(policies)
+        if lossy:
+            raise ValueError(f"{', '.join(sorted(lossy))} must be stored losslessly.")
+        self.policies = policies
+        self._counters = defaultdict(lambda: [0, 0, 0, 0])
+
+    @classmethod
+    def from_env(cls):
+        """Build the sampler from F1_SAMPLING."""
+        policies = {}
+        for entry in F1_SAMPLING.split(";"):
+            if not entry.strip():
+                continue
+            collection, _, policy = entry.partition("=")
+            policy = parse_policy(policy)
+            if policy is not None:
+                policies[collection.strip()] = policy
+        return cls(policies)
+
+    def apply(self, collection: str, data: dict) -> dict:
+        """Apply the policy of a collection to a parsed packet.
+
+        Returns:
+            dict: Document to store or None if the packet is dropped.
+        """
+        policy = self.policies.get(collection)
+        if policy is None:
+            return data
+        counters = self._counters[collection]
+        counters[0] += 1
+        counters[2] += _count_fields(data)
+        result = policy.apply(data["m_header"]["m_sessionUID"], data)
+        if result is not None:
+            counters[1] += 1
+            counters[3] += _count_fields(result)
+        return result
+
+    def stats(self) -> dict:
+        """Packets and fields seen and kept per sampled collection."""
+        stats = {}
+        for collection, (seen, kept, fields_seen, fields_kept) in self._counters.items():
+            stats[collection] = {
+                "packets_seen": seen,
+                "packets_kept": kept,
+                "fields_seen": fields_seen,
+                "fields_kept": fields_kept,
+                "reduction": 1 - fields_kept / fields_seen if fields_seen else 0.0,
+            }
+        return stats
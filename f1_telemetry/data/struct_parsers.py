@@ -1,666 +1,677 @@
 """Parser functions for F1 2023 telemetry data.
+
+Every packet is described by a schema table below. The tables are compiled
+once at import into precompiled ``struct.Struct`` decoders and the
+``parse_*`` functions are generated from them.
+
+The ``parse_packet_*_columns`` functions decode the 22-car packets in
+columnar form, returning one array per car field instead of 22 dicts. The
+``parse_packet_*_selected`` functions only decode the given car indices.
 """
-import struct
+from f1_telemetry.data.packet_schema import RecordLayout
 
 ## PACKET HEADER
-PACKET_HEADER_DATA_FORMAT = "<HBBBBBQfLLBB"
-HEADER_SIZE = 12
+PACKET_HEADER = (
+    ("m_packetFormat", "H"),
+    ("m_gameYear", "B"),
+    ("m_gameMajorVersion", "B"),
+    ("m_gameMinorVersion", "B"),
+    ("m_packetVersion", "B"),
+    ("m_packetId", "B"),
+    ("m_sessionUID", "Q"),
+    ("m_sessionTime", "f"),
+    ("m_frameIdentifier", "L"),
+    ("m_overallFrameIdentifier", "L"),
+    ("m_playerCarIndex", "B"),
+    ("m_secondaryPlayerCarIndex", "B"),
+)
+PACKET_HEADER_LAYOUT = RecordLayout(PACKET_HEADER)
+PACKET_HEADER_DATA_FORMAT = "<" + PACKET_HEADER_LAYOUT.format
+HEADER_SIZE = len(PACKET_HEADER)
 
 
 def parse_packet_header(data, is_unpacked=False):
     if is_unpacked:
-        unpacked_data = data
-    else:
-        unpacked_data = struct.unpack_from(PACKET_HEADER_DATA_FORMAT, data)
-
-    packet_header_dict = {
-        "m_packetFormat": unpacked_data[0],
-        "m_gameYear": unpacked_data[1],
-        "m_gameMajorVersion": unpacked_data[2],
-        "m_gameMinorVersion": unpacked_data[3],
-        "m_packetVersion": unpacked_data[4],
-        "m_packetId": unpacked_data[5],
-        "m_sessionUID": unpacked_data[6],
-        "m_sessionTime": unpacked_data[7],
-        "m_frameIdentifier": unpacked_data[8],
-        "m_overallFrameIdentifier": unpacked_data[9],
-        "m_playerCarIndex": unpacked_data[10],
-        "m_secondaryPlayerCarIndex": unpacked_data[11],
-    }
-
-    return packet_header_dict
+        return PACKET_HEADER_LAYOUT.from_values(data)
+    return PACKET_HEADER_LAYOUT.unpack(data)
 
 
 ## CAR MOTION DATA
-CAR_MOTION_DATA_FORMAT = "ffffffhhhhhhffffff"
-PACKET_MOTION_DATA_FORMAT = PACKET_HEADER_DATA_FORMAT + (CAR_MOTION_DATA_FORMAT * 22)
-
-
-def parse_car_motion_data(unpacked_data):
-    car_motion_data_dict = {
-        "m_worldPositionX": unpacked_data[0],
-        "m_worldPositionY": unpacked_data[1],
-        "m_worldPositionZ": unpacked_data[2],
-        "m_worldVelocityX": unpacked_data[3],
-        "m_worldVelocityY": unpacked_data[4],
-        "m_worldVelocityZ": unpacked_data[5],
-        "m_worldForwardDirX": unpacked_data[6],
-        "m_worldForwardDirY": unpacked_data[7],
-        "m_worldForwardDirZ": unpacked_data[8],
-        "m_worldRightDirX": unpacked_data[9],
-        "m_worldRightDirY": unpacked_data[10],
-        "m_worldRightDirZ": unpacked_data[11],
-        "m_gForceLateral": unpacked_data[12],
-        "m_gForceLongitudinal": unpacked_data[13],
-        "m_gForceVertical": unpacked_data[14],
-        "m_yaw": unpacked_data[15],
-        "m_pitch": unpacked_data[16],
-        "m_roll": unpacked_data[17],
-    }
-
-    return car_motion_data_dict
-
-
-def parse_packet_motion_data(data):
-    unpacked_data = struct.unpack_from(PACKET_MOTION_DATA_FORMAT, data)
-
-    header_dict = parse_packet_header(unpacked_data[0:12], True)
-    unpacked_without_header = unpacked_data[len(header_dict) : :]
-
-    car_motion_data_array = []
-    for i in range(22):
-        car_motion_data_array.append(
-            parse_car_motion_data(
-                unpacked_without_header[
-                    i
-                    * len(CAR_MOTION_DATA_FORMAT) : (i + 1)
-                    * len(CAR_MOTION_DATA_FORMAT)
-                ]
-            )
-        )
-    packet_motion_data_dict = {
-        "m_header": header_dict,
-        "m_carMotionData": car_motion_data_array,
-    }
-
-    return packet_motion_data_dict
-
+CAR_MOTION_DATA = (
+    ("m_worldPositionX", "f"),
+    ("m_worldPositionY", "f"),
+    ("m_worldPositionZ", "f"),
+    ("m_worldVelocityX", "f"),
+    ("m_worldVelocityY", "f"),
+    ("m_worldVelocityZ", "f"),
+    ("m_worldForwardDirX", "h"),
+    ("m_worldForwardDirY", "h"),
+    ("m_worldForwardDirZ", "h"),
+    ("m_worldRightDirX", "h"),
+    ("m_worldRightDirY", "h"),
+    ("m_worldRightDirZ", "h"),
+    ("m_gForceLateral", "f"),
+    ("m_gForceLongitudinal", "f"),
+    ("m_gForceVertical", "f"),
+    ("m_yaw", "f"),
+    ("m_pitch", "f"),
+    ("m_roll", "f"),
+)
+PACKET_MOTION_DATA = (
+    ("m_header", PACKET_HEADER),
+    ("m_carMotionData", CAR_MOTION_DATA, 22),
+)
 
 ## SESSION DATA
-MARSHAL_ZONE_FORMAT = "fb"
-WEATHER_FORECAST_SAMPLE_FORMAT = "BBBbbbbB"
-packet_session_data_format = (
-    PACKET_HEADER_DATA_FORMAT
-    + "BbbBHBbBHHBBBBBB"
-    + (MARSHAL_ZONE_FORMAT * 21)
-    + "BBB"
-    + (WEATHER_FORECAST_SAMPLE_FORMAT * 56)
-    + "BBLLLBBBBBBBBBBBBBBLBBBBBBBB"
+MARSHAL_ZONE = (
+    ("m_zoneStart", "f"),
+    ("m_zoneFlag", "b"),
+)
+WEATHER_FORECAST_SAMPLE = (
+    ("m_sessionType", "B"),
+    ("m_timeOffset", "B"),
+    ("m_weather", "B"),
+    ("m_trackTemperature", "b"),
+    ("m_trackTemperatureChange", "b"),
+    ("m_airTemperature", "b"),
+    ("m_airTemperatureChange", "b"),
+    ("m_rainPercentage", "B"),
+)
+PACKET_SESSION_DATA = (
+    ("m_header", PACKET_HEADER),
+    ("m_weather", "B"),
+    ("m_trackTemperature", "b"),
+    ("m_airTemperature", "b"),
+    ("m_totalLaps", "B"),
+    ("m_trackLength", "H"),
+    ("m_sessionType", "B"),
+    ("m_trackId", "b"),
+    ("m_formula", "B"),
+    ("m_sessionTimeLeft", "H"),
+    ("m_sessionDuration", "H"),
+    ("m_pitSpeedLimit", "B"),
+    ("m_gamePaused", "B"),
+    ("m_isSpectating", "B"),
+    ("m_spectatorCarIndex", "B"),
+    ("m_sliProNativeSupport", "B"),
+    ("m_numMarshalZones", "B"),
+    ("m_marshalZones", MARSHAL_ZONE, 21),
+    ("m_safetyCarStatus", "B"),
+    ("m_networkGame", "B"),
+    ("m_numWeatherForecastSamples", "B"),
+    ("m_weatherForecastSamples", WEATHER_FORECAST_SAMPLE, 56),
+    ("m_forecastAccuracy", "B"),
+    ("m_aiDifficulty", "B"),
+    ("m_seasonLinkIdentifier", "L"),
+    ("m_weekendLinkIdentifier", "L"),
+    ("m_sessionLinkIdentifier", "L"),
+    ("m_pitStopWindowIdealLap", "B"),
+    ("m_pitStopWindowLatestLap", "B"),
+    ("m_pitStopRejoinPosition", "B"),
+    ("m_steeringAssist", "B"),
+    ("m_brakingAssist", "B"),
+    ("m_gearboxAssist", "B"),
+    ("m_pitAssist", "B"),
+    ("m_pitReleaseAssist", "B"),
+    ("m_ERSAssist", "B"),
+    ("m_DRSAssist", "B"),
+    ("m_dynamicRacingLine", "B"),
+    ("m_dynamicRacingLineType", "B"),
+    ("m_gameMode", "B"),
+    ("m_ruleSet", "B"),
+    ("m_timeOfDay", "L"),
+    ("m_sessionLength", "B"),
+    ("m_speedUnitsLeadPlayer", "B"),
+    ("m_temperatureUnitsLeadPlayer", "B"),
+    ("m_speedUnitsSecondaryPlayer", "B"),
+    ("m_temperatureUnitsSecondaryPlayer", "B"),
+    ("m_numSafetyCarPeriods", "B"),
+    ("m_numVirtualSafetyCarPeriods", "B"),
+    ("m_numRedFlagPeriods", "B"),
 )
-
-
-def parse_marshal_zone(unpacked_data):
-    marshal_zone_dict = {
-        "m_zoneStart": unpacked_data[0],
-        "m_zoneFlag": unpacked_data[1],
-    }
-
-    return marshal_zone_dict
-
-
-def parse_weather_forecast_sample(unpacked_data):
-    weather_forecast_sample_dict = {
-        "m_sessionType": unpacked_data[0],
-        "m_timeOffset": unpacked_data[1],
-        "m_weather": unpacked_data[2],
-        "m_trackTemperature": unpacked_data[3],
-        "m_trackTemperatureChange": unpacked_data[4],
-        "m_airTemperature": unpacked_data[5],
-        "m_airTemperatureChange": unpacked_data[6],
-        "m_rainPercentage": unpacked_data[7],
-    }
-
-    return weather_forecast_sample_dict
-
-
-def parse_packet_session_data(data):
-    unpacked_data = struct.unpack_from(packet_session_data_format, data)
-
-    header_dict = parse_packet_header(unpacked_data[0:12], True)
-    unpacked_without_header = unpacked_data[len(header_dict) : :]
-
-    unpacked_marshal_zones = unpacked_without_header[
-        16 : (len(MARSHAL_ZONE_FORMAT) * 21 + 16)
-    ]
-    marshal_zones_array = []
-    for i in range(21):
-        marshal_zones_array.append(
-            parse_marshal_zone(
-                unpacked_marshal_zones[
-                    i * len(MARSHAL_ZONE_FORMAT) : (i + 1) * len(MARSHAL_ZONE_FORMAT)
-                ]
-            )
-        )
-
-    unpacked_weather_forecast_samples = unpacked_without_header[
-        61 : (61 + len(WEATHER_FORECAST_SAMPLE_FORMAT) * 56)
-    ]
-    weather_forecast_samples_array = []
-    for i in range(56):
-        weather_forecast_samples_array.append(
-            parse_weather_forecast_sample(
-                unpacked_weather_forecast_samples[
-                    i
-                    * len(WEATHER_FORECAST_SAMPLE_FORMAT) : (i + 1)
-                    * len(WEATHER_FORECAST_SAMPLE_FORMAT)
-                ]
-            )
-        )
-
-    packet_session_data_dict = {
-        "m_header": header_dict,
-        "m_weather": unpacked_data[12],
-        "m_trackTemperature": unpacked_data[13],
-        "m_airTemperature": unpacked_data[14],
-        "m_totalLaps": unpacked_data[15],
-        "m_trackLength": unpacked_data[16],
-        "m_sessionType": unpacked_data[17],
-        "m_trackId": unpacked_data[18],
-        "m_formula": unpacked_data[19],
-        "m_sessionTimeLeft": unpacked_data[20],
-        "m_sessionDuration": unpacked_data[21],
-        "m_pitSpeedLimit": unpacked_data[22],
-        "m_gamePaused": unpacked_data[23],
-        "m_isSpectating": unpacked_data[24],
-        "m_spectatorCarIndex": unpacked_data[25],
-        "m_sliProNativeSupport": unpacked_data[26],
-        "m_numMarshalZones": unpacked_data[27],
-        "m_marshalZones": marshal_zones_array,
-        "m_safetyCarStatus": unpacked_data[70],
-        "m_networkGame": unpacked_data[71],
-        "m_numWeatherForecastSamples": unpacked_data[72],
-        "m_weatherForecastSamples": weather_forecast_samples_array,
-        "m_forecastAccuracy": unpacked_data[521],
-        "m_aiDifficulty": unpacked_data[522],
-        "m_seasonLinkIdentifier": unpacked_data[523],
-        "m_weekendLinkIdentifier": unpacked_data[524],
-        "m_sessionLinkIdentifier": unpacked_data[525],
-        "m_pitStopWindowIdealLap": unpacked_data[526],
-        "m_pitStopWindowLatestLap": unpacked_data[527],
-        "m_pitStopRejoinPosition": unpacked_data[528],
-        "m_steeringAssist": unpacked_data[529],
-        "m_brakingAssist": unpacked_data[530],
-        "m_gearboxAssist": unpacked_data[531],
-        "m_pitAssist": unpacked_data[532],
-        "m_pitReleaseAssist": unpacked_data[533],
-        "m_ERSAssist": unpacked_data[534],
-        "m_DRSAssist": unpacked_data[535],
-        "m_dynamicRacingLine": unpacked_data[536],
-        "m_dynamicRacingLineType": unpacked_data[537],
-        "m_gameMode": unpacked_data[538],
-        "m_ruleSet": unpacked_data[539],
-        "m_timeOfDay": unpacked_data[540],
-        "m_sessionLength": unpacked_data[541],
-        "m_speedUnitsLeadPlayer": unpacked_data[542],
-        "m_temperatureUnitsLeadPlayer": unpacked_data[543],
-        "m_speedUnitsSecondaryPlayer": unpacked_data[544],
-        "m_temperatureUnitsSecondaryPlayer": unpacked_data[545],
-        "m_numSafetyCarPeriods": unpacked_data[546],
-        "m_numVirtualSafetyCarPeriods": unpacked_data[547],
-        "m_numRedFlagPeriods": unpacked_data[548],
-    }
-
-    return packet_session_data_dict
-
 
 ## LAP DATA
-LAP_DATA_FORMAT = "IIHBHBHHfffBBBBBBBBBBBBBBBHHB"
-
-
-def parse_lap_data(unpacked_data):
-    lap_data_dict = {
-        "m_lastLapTimeInMS": unpacked_data[0],
-        "m_currentLapTimeInMS": unpacked_data[1],
-        "m_sector1TimeInMS": unpacked_data[2],
-        "m_sector1TimeMinutes": unpacked_data[3],
-        "m_sector2TimeInMS": unpacked_data[4],
-        "m_sector2TimeMinutes": unpacked_data[5],
-        "m_deltaToCarInFrontInMS": unpacked_data[6],
-        "m_deltaToRaceLeaderInMS": unpacked_data[7],
-        "m_lapDistance": unpacked_data[8],
-        "m_totalDistance": unpacked_data[9],
-        "m_safetyCarDelta": unpacked_data[10],
-        "m_carPosition": unpacked_data[11],
-        "m_currentLapNum": unpacked_data[12],
-        "m_pitStatus": unpacked_data[13],
-        "m_numPitStops": unpacked_data[14],
-        "m_sector": unpacked_data[15],
-        "m_currentLapInvalid": unpacked_data[16],
-        "m_penalties": unpacked_data[17],
-        "m_totalWarnings": unpacked_data[18],
-        "m_cornerCuttingWarnings": unpacked_data[19],
-        "m_numUnservedDriveThroughPens": unpacked_data[20],
-        "m_numUnservedStopGoPens": unpacked_data[21],
-        "m_gridPosition": unpacked_data[22],
-        "m_driverStatus": unpacked_data[23],
-        "m_resultStatus": unpacked_data[24],
-        "m_pitLaneTimerActive": unpacked_data[25],
-        "m_pitLaneTimeInLaneInMS": unpacked_data[26],
-        "m_pitStopTimerInMS": unpacked_data[27],
-        "m_pitStopShouldServePen": unpacked_data[28],
-    }
-
-    return lap_data_dict
-
-
-PACKET_LAP_DATA_FORMAT = PACKET_HEADER_DATA_FORMAT + (LAP_DATA_FORMAT * 22) + "BB"
-
-
-def parse_packet_lap_data(data):
-    unpacked_data = struct.unpack_from(PACKET_LAP_DATA_FORMAT, data)
-    header_dict = parse_packet_header(unpacked_data[0:HEADER_SIZE], True)
-
-    unpacked_lap_data = unpacked_data[HEADER_SIZE:]
-    lap_data_array = []
-
-    for i in range(22):
-        start = i * len(LAP_DATA_FORMAT)
-        end = (i + 1) * len(LAP_DATA_FORMAT)
-        lap_data_array.append(parse_lap_data(unpacked_lap_data[start:end]))
-
-    packet_lap_data_dict = {
-        "m_header": header_dict,
-        "m_lapData": lap_data_array,
-        "m_timeTrialPBCarIdx": unpacked_data[-2],
-        "m_timeTrialRivalCarIdx": unpacked_data[-1],
-    }
-
-    return packet_lap_data_dict
-
+LAP_DATA = (
+    ("m_lastLapTimeInMS", "I"),
+    ("m_currentLapTimeInMS", "I"),
+    ("m_sector1TimeInMS", "H"),
+    ("m_sector1TimeMinutes", "B"),
+    ("m_sector2TimeInMS", "H"),
+    ("m_sector2TimeMinutes", "B"),
+    ("m_deltaToCarInFrontInMS", "H"),
+    ("m_deltaToRaceLeaderInMS", "H"),
+    ("m_lapDistance", "f"),
+    ("m_totalDistance", "f"),
+    ("m_safetyCarDelta", "f"),
+    ("m_carPosition", "B"),
+    ("m_currentLapNum", "B"),
+    ("m_pitStatus", "B"),
+    ("m_numPitStops", "B"),
+    ("m_sector", "B"),
+    ("m_currentLapInvalid", "B"),
+    ("m_penalties", "B"),
+    ("m_totalWarnings", "B"),
+    ("m_cornerCuttingWarnings", "B"),
+    ("m_numUnservedDriveThroughPens", "B"),
+    ("m_numUnservedStopGoPens", "B"),
+    ("m_gridPosition", "B"),
+    ("m_driverStatus", "B"),
+    ("m_resultStatus", "B"),
+    ("m_pitLaneTimerActive", "B"),
+    ("m_pitLaneTimeInLaneInMS", "H"),
+    ("m_pitStopTimerInMS", "H"),
+    ("m_pitStopShouldServePen", "B"),
+)
+PACKET_LAP_DATA = (
+    ("m_header", PACKET_HEADER),
+    ("m_lapData", LAP_DATA, 22),
+    ("m_timeTrialPBCarIdx", "B"),
+    ("m_timeTrialRivalCarIdx", "B"),
+)
 
 ## PARTICIPANT DATA
-PARTICIPANT_DATA_FORMAT = "BBBBBBB48sBBB"
-PACKET_PARTICIPANTS_DATA_FORMAT = (
-    PACKET_HEADER_DATA_FORMAT + "B" + (PARTICIPANT_DATA_FORMAT * 22)
+PARTICIPANT_DATA = (
+    ("m_aiControlled", "B"),
+    ("m_driverId", "B"),
+    ("m_networkId", "B"),
+    ("m_teamId", "B"),
+    ("m_myTeam", "B"),
+    ("m_raceNumber", "B"),
+    ("m_nationality", "B"),
+    ("m_name", "48s"),
+    ("m_yourTelemetry", "B"),
+    ("m_showOnlineNames", "B"),
+    ("m_platform", "B"),
+)
+PACKET_PARTICIPANTS_DATA = (
+    ("m_header", PACKET_HEADER),
+    ("m_numActiveCars", "B"),
+    ("m_participants", PARTICIPANT_DATA, 22),
 )
-
-
-def parse_participant_data(unpacked_data):
-    name_utf8 = unpacked_data[7].decode("utf-8").rstrip("\x00")
-    if len(name_utf8) > 48:
-        name_utf8 = name_utf8[:48]  # Ensure it's not longer than 48 characters
-
-    participant_data_dict = {
-        "m_aiControlled": unpacked_data[0],
-        "m_driverId": unpacked_data[1],
-        "m_networkId": unpacked_data[2],
-        "m_teamId": unpacked_data[3],
-        "m_myTeam": unpacked_data[4],
-        "m_raceNumber": unpacked_data[5],
-        "m_nationality": unpacked_data[6],
-        "m_name": name_utf8,
-        "m_yourTelemetry": unpacked_data[8],
-        "m_showOnlineNames": unpacked_data[9],
-        "m_platform": unpacked_data[10],
-    }
-
-    return participant_data_dict
-
-
-def parse_packet_participants_data(data):
-    unpacked_data = struct.unpack_from(PACKET_PARTICIPANTS_DATA_FORMAT, data)
-    header_dict = parse_packet_header(unpacked_data[0:HEADER_SIZE], True)
-
-    unpacked_participants_data = unpacked_data[HEADER_SIZE + 1 :]
-
-    participants_data_array = []
-
-    for i in range(22):
-        start = i * (
-            len(PARTICIPANT_DATA_FORMAT) - 2
-        )  # reduce by two because of the 48s char array
-        end = (i + 1) * (
-            len(PARTICIPANT_DATA_FORMAT) - 2
-        )  # reduce by two because of the 48s char array
-        participants_data_array.append(
-            parse_participant_data(unpacked_participants_data[start:end])
-        )
-
-    packet_participants_data_dict = {
-        "m_header": header_dict,
-        "m_numActiveCars": unpacked_data[HEADER_SIZE],
-        "m_participants": participants_data_array,
-    }
-
-    return packet_participants_data_dict
-
 
 ## CAR SETUPS DATA
-CAR_SETUP_DATA_FORMAT = "BBBBffffBBBBBBBBffffBf"
-PACKET_CAR_SETUP_DATA_FORMAT = PACKET_HEADER_DATA_FORMAT + (CAR_SETUP_DATA_FORMAT * 22)
-
-
-def parse_car_setup_data(unpacked_data):
-    car_setup_data_dict = {
-        "m_frontWing": unpacked_data[0],
-        "m_rearWing": unpacked_data[1],
-        "m_onThrottle": unpacked_data[2],
-        "m_offThrottle": unpacked_data[3],
-        "m_frontCamber": unpacked_data[4],
-        "m_rearCamber": unpacked_data[5],
-        "m_frontToe": unpacked_data[6],
-        "m_rearToe": unpacked_data[7],
-        "m_frontSuspension": unpacked_data[8],
-        "m_rearSuspension": unpacked_data[9],
-        "m_frontAntiRollBar": unpacked_data[10],
-        "m_rearAntiRollBar": unpacked_data[11],
-        "m_frontSuspensionHeight": unpacked_data[12],
-        "m_rearSuspensionHeight": unpacked_data[13],
-        "m_brakePressure": unpacked_data[14],
-        "m_brakeBias": unpacked_data[15],
-        "m_rearLeftTyrePressure": unpacked_data[16],
-        "m_rearRightTyrePressure": unpacked_data[17],
-        "m_frontLeftTyrePressure": unpacked_data[18],
-        "m_frontRightTyrePressure": unpacked_data[19],
-        "m_ballast": unpacked_data[20],
-        "m_fuelLoad": unpacked_data[21],
-    }
-
-    return car_setup_data_dict
-
-
-def parse_packet_car_setup_data(data):
-    unpacked_data = struct.unpack_from(PACKET_CAR_SETUP_DATA_FORMAT, data)
-    header_dict = parse_packet_header(unpacked_data[0:HEADER_SIZE], True)
-
-    car_setups_array = []
-    car_setups_data_start = HEADER_SIZE
-
-    for i in range(22):  # Loop over each car setup
-        start_index = car_setups_data_start + (i * len(CAR_SETUP_DATA_FORMAT))
-        end_index = start_index + len(CAR_SETUP_DATA_FORMAT)
-        car_setup_data = unpacked_data[start_index:end_index]
-        car_setups_array.append(parse_car_setup_data(car_setup_data))
-
-    packet_car_setup_data_dict = {
-        "m_header": header_dict,
-        "m_carSetups": car_setups_array,
-    }
-
-    return packet_car_setup_data_dict
-
+CAR_SETUP_DATA = (
+    ("m_frontWing", "B"),
+    ("m_rearWing", "B"),
+    ("m_onThrottle", "B"),
+    ("m_offThrottle", "B"),
+    ("m_frontCamber", "f"),
+    ("m_rearCamber", "f"),
+    ("m_frontToe", "f"),
+    ("m_rearToe", "f"),
+    ("m_frontSuspension", "B"),
+    ("m_rearSuspension", "B"),
+    ("m_frontAntiRollBar", "B"),
+    ("m_rearAntiRollBar", "B"),
+    ("m_frontSuspensionHeight", "B"),
+    ("m_rearSuspensionHeight", "B"),
+    ("m_brakePressure", "B"),
+    ("m_brakeBias", "B"),
+    ("m_rearLeftTyrePressure", "f"),
+    ("m_rearRightTyrePressure", "f"),
+    ("m_frontLeftTyrePressure", "f"),
+    ("m_frontRightTyrePressure", "f"),
+    ("m_ballast", "B"),
+    ("m_fuelLoad", "f"),
+)
+PACKET_CAR_SETUP_DATA = (
+    ("m_header", PACKET_HEADER),
+    ("m_carSetups", CAR_SETUP_DATA, 22),
+)
 
 ## CAR TELEMETRY DATA
-CAR_TELEMETRY_DATA_FORMAT = "HfffBbHBBHHHHHBBBBBBBBHffffBBBB"
-PACKET_CAR_TELEMETRY_DATA_FORMAT = (
-    PACKET_HEADER_DATA_FORMAT + (CAR_TELEMETRY_DATA_FORMAT * 22) + "BBb"
+CAR_TELEMETRY_DATA = (
+    ("m_speed", "H"),
+    ("m_throttle", "f"),
+    ("m_steer", "f"),
+    ("m_brake", "f"),
+    ("m_clutch", "B"),
+    ("m_gear", "b"),
+    ("m_engineRPM", "H"),
+    ("m_drs", "B"),
+    ("m_revLightsPercent", "B"),
+    ("m_revLightsBitValue", "H"),
+    ("m_brakesTemperatureRL", "H"),
+    ("m_brakesTemperatureRR", "H"),
+    ("m_brakesTemperatureFL", "H"),
+    ("m_brakesTemperatureFR", "H"),
+    ("m_tyresSurfaceTemperatureRL", "B"),
+    ("m_tyresSurfaceTemperatureRR", "B"),
+    ("m_tyresSurfaceTemperatureFL", "B"),
+    ("m_tyresSurfaceTemperatureFR", "B"),
+    ("m_tyresInnerTemperatureRL", "B"),
+    ("m_tyresInnerTemperatureRR", "B"),
+    ("m_tyresInnerTemperatureFL", "B"),
+    ("m_tyresInnerTemperatureFR", "B"),
+    ("m_engineTemperature", "H"),
+    ("m_tyresPressureRL", "f"),
+    ("m_tyresPressureRR", "f"),
+    ("m_tyresPressureFL", "f"),
+    ("m_tyresPressureFR", "f"),
+    ("m_surfaceTypeRL", "B"),
+    ("m_surfaceTypeRR", "B"),
+    ("m_surfaceTypeFL", "B"),
+    ("m_surfaceTypeFR", "B"),
+)
+PACKET_CAR_TELEMETRY_DATA = (
+    ("m_header", PACKET_HEADER),
+    ("m_carTelemetryData", CAR_TELEMETRY_DATA, 22),
+    ("m_mfdPanelIndex", "B"),
+    ("m_mfdPanelIndexSecondaryPlayer", "B"),
+    ("m_suggestedGear", "b"),
 )
-
-
-def parse_car_telemetry_data(unpacked_data):
-    car_telemetry_data_dict = {
-        "m_speed": unpacked_data[0],
-        "m_throttle": unpacked_data[1],
-        "m_steer": unpacked_data[2],
-        "m_brake": unpacked_data[3],
-        "m_clutch": unpacked_data[4],
-        "m_gear": unpacked_data[5],
-        "m_engineRPM": unpacked_data[6],
-        "m_drs": unpacked_data[7],
-        "m_revLightsPercent": unpacked_data[8],
-        "m_revLightsBitValue": unpacked_data[9],
-        "m_brakesTemperatureRL": unpacked_data[10],
-        "m_brakesTemperatureRR": unpacked_data[11],
-        "m_brakesTemperatureFL": unpacked_data[12],
-        "m_brakesTemperatureFR": unpacked_data[13],
-        "m_tyresSurfaceTemperatureRL": unpacked_data[14],
-        "m_tyresSurfaceTemperatureRR": unpacked_data[15],
-        "m_tyresSurfaceTemperatureFL": unpacked_data[16],
-        "m_tyresSurfaceTemperatureFR": unpacked_data[17],
-        "m_tyresInnerTemperatureRL": unpacked_data[18],
-        "m_tyresInnerTemperatureRR": unpacked_data[19],
-        "m_tyresInnerTemperatureFL": unpacked_data[20],
-        "m_tyresInnerTemperatureFR": unpacked_data[21],
-        "m_engineTemperature": unpacked_data[22],
-        "m_tyresPressureRL": unpacked_data[23],
-        "m_tyresPressureRR": unpacked_data[24],
-        "m_tyresPressureFL": unpacked_data[25],
-        "m_tyresPressureFR": unpacked_data[26],
-        "m_surfaceTypeRL": unpacked_data[27],
-        "m_surfaceTypeRR": unpacked_data[28],
-        "m_surfaceTypeFL": unpacked_data[29],
-        "m_surfaceTypeFR": unpacked_data[30],
-    }
-
-    return car_telemetry_data_dict
-
-
-def parse_packet_car_telemetry_data(data):
-    unpacked_data = struct.unpack_from(PACKET_CAR_TELEMETRY_DATA_FORMAT, data)
-    header_dict = parse_packet_header(unpacked_data[0:HEADER_SIZE], True)
-    car_telemetry_data_start = HEADER_SIZE
-
-    car_telemetry_data_array = []
-    for i in range(22):
-        start_index = car_telemetry_data_start + (i * len(CAR_TELEMETRY_DATA_FORMAT))
-        end_index = start_index + len(CAR_TELEMETRY_DATA_FORMAT)
-        car_telemetry_data = unpacked_data[start_index:end_index]
-        car_telemetry_data_array.append(parse_car_telemetry_data(car_telemetry_data))
-
-    mfd_panel_index_idx = HEADER_SIZE + (len(CAR_TELEMETRY_DATA_FORMAT) * 22)
-    packet_car_telemetry_data_dict = {
-        "m_header": header_dict,
-        "m_carTelemetryData": car_telemetry_data_array,
-        "m_mfdPanelIndex": unpacked_data[mfd_panel_index_idx],
-        "m_mfdPanelIndexSecondaryPlayer": unpacked_data[mfd_panel_index_idx + 1],
-        "m_suggestedGear": unpacked_data[mfd_panel_index_idx + 2],
-    }
-
-    return packet_car_telemetry_data_dict
-
 
 ## CAR STATUS DATA
-CAR_STATUS_DATA_FORMAT = "BBBBBfffHHBBHBBBbfffBfffB"
-PACKET_CAR_STATUS_DATA_FORMAT = PACKET_HEADER_DATA_FORMAT + (
-    CAR_STATUS_DATA_FORMAT * 22
+CAR_STATUS_DATA = (
+    ("m_tractionControl", "B"),
+    ("m_antiLockBrakes", "B"),
+    ("m_fuelMix", "B"),
+    ("m_frontBrakeBias", "B"),
+    ("m_pitLimiterStatus", "B"),
+    ("m_fuelInTank", "f"),
+    ("m_fuelCapacity", "f"),
+    ("m_fuelRemainingLaps", "f"),
+    ("m_maxRPM", "H"),
+    ("m_idleRPM", "H"),
+    ("m_maxGears", "B"),
+    ("m_drsAllowed", "B"),
+    ("m_drsActivationDistance", "H"),
+    ("m_actualTyreCompound", "B"),
+    ("m_visualTyreCompound", "B"),
+    ("m_tyresAgeLaps", "B"),
+    ("m_vehicleFiaFlags", "b"),
+    ("m_enginePowerICE", "f"),
+    ("m_enginePowerMGUK", "f"),
+    ("m_ersStoreEnergy", "f"),
+    ("m_ersDeployMode", "B"),
+    ("m_ersHarvestedThisLapMGUK", "f"),
+    ("m_ersHarvestedThisLapMGUH", "f"),
+    ("m_ersDeployedThisLap", "f"),
+    ("m_networkPaused", "B"),
+)
+PACKET_CAR_STATUS_DATA = (
+    ("m_header", PACKET_HEADER),
+    ("m_carStatusData", CAR_STATUS_DATA, 22),
 )
-
-
-def parse_car_status_data(unpacked_data):
-    car_status_data_dict = {
-        "m_tractionControl": unpacked_data[0],
-        "m_antiLockBrakes": unpacked_data[1],
-        "m_fuelMix": unpacked_data[2],
-        "m_frontBrakeBias": unpacked_data[3],
-        "m_pitLimiterStatus": unpacked_data[4],
-        "m_fuelInTank": unpacked_data[5],
-        "m_fuelCapacity": unpacked_data[6],
-        "m_fuelRemainingLaps": unpacked_data[7],
-        "m_maxRPM": unpacked_data[8],
-        "m_idleRPM": unpacked_data[9],
-        "m_maxGears": unpacked_data[10],
-        "m_drsAllowed": unpacked_data[11],
-        "m_drsActivationDistance": unpacked_data[12],
-        "m_actualTyreCompound": unpacked_data[13],
-        "m_visualTyreCompound": unpacked_data[14],
-        "m_tyresAgeLaps": unpacked_data[15],
-        "m_vehicleFiaFlags": unpacked_data[16],
-        "m_enginePowerICE": unpacked_data[17],
-        "m_enginePowerMGUK": unpacked_data[18],
-        "m_ersStoreEnergy": unpacked_data[19],
-        "m_ersDeployMode": unpacked_data[20],
-        "m_ersHarvestedThisLapMGUK": unpacked_data[21],
-        "m_ersHarvestedThisLapMGUH": unpacked_data[22],
-        "m_ersDeployedThisLap": unpacked_data[23],
-        "m_networkPaused": unpacked_data[24],
-    }
-
-    return car_status_data_dict
-
-
-def parse_packet_car_status_data(data):
-    unpacked_data = struct.unpack_from(PACKET_CAR_STATUS_DATA_FORMAT, data)
-    header_dict = parse_packet_header(unpacked_data[0:HEADER_SIZE], True)
-    car_status_data_start = HEADER_SIZE
-
-    car_status_data_array = []
-    for i in range(22):
-        start_index = car_status_data_start + (i * len(CAR_STATUS_DATA_FORMAT))
-        end_index = start_index + len(CAR_STATUS_DATA_FORMAT)
-        car_status_data = unpacked_data[start_index:end_index]
-        car_status_data_array.append(parse_car_status_data(car_status_data))
-
-    packet_car_status_data_dict = {
-        "m_header": header_dict,
-        "m_carStatusData": car_status_data_array,
-    }
-
-    return packet_car_status_data_dict
-
 
 ## CAR DAMAGE DATA
-CAR_DAMAGE_DATA_FORMAT = "ffffBBBBBBBBBBBBBBBBBBBBBBBBBB"
-PACKET_CAR_DAMAGE_DATA_FORMAT = PACKET_HEADER_DATA_FORMAT + (
-    CAR_DAMAGE_DATA_FORMAT * 22
+CAR_DAMAGE_DATA = (
+    ("m_tyresWearRL", "f"),
+    ("m_tyresWearRR", "f"),
+    ("m_tyresWearFL", "f"),
+    ("m_tyresWearFR", "f"),
+    ("m_tyresDamageRL", "B"),
+    ("m_tyresDamageRR", "B"),
+    ("m_tyresDamageFL", "B"),
+    ("m_tyresDamageFR", "B"),
+    ("m_brakesDamageRL", "B"),
+    ("m_brakesDamageRR", "B"),
+    ("m_brakesDamageFL", "B"),
+    ("m_brakesDamageFR", "B"),
+    ("m_frontLeftWingDamage", "B"),
+    ("m_frontRightWingDamage", "B"),
+    ("m_rearWingDamage", "B"),
+    ("m_floorDamage", "B"),
+    ("m_diffuserDamage", "B"),
+    ("m_sidepodDamage", "B"),
+    ("m_drsFault", "B"),
+    ("m_ersFault", "B"),
+    ("m_gearBoxDamage", "B"),
+    ("m_engineDamage", "B"),
+    ("m_engineMGUHWear", "B"),
+    ("m_engineESWear", "B"),
+    ("m_engineCEWear", "B"),
+    ("m_engineICEWear", "B"),
+    ("m_engineMGUKWear", "B"),
+    ("m_engineTCWear", "B"),
+    ("m_engineBlown", "B"),
+    ("m_engineSeized", "B"),
+)
+PACKET_CAR_DAMAGE_DATA = (
+    ("m_header", PACKET_HEADER),
+    ("m_carDamageData", CAR_DAMAGE_DATA, 22),
 )
-
-
-def parse_car_damage_data(unpacked_data):
-    car_damage_data_dict = {
-        "m_tyresWearRL": unpacked_data[0],
-        "m_tyresWearRR": unpacked_data[1],
-        "m_tyresWearFL": unpacked_data[2],
-        "m_tyresWearFR": unpacked_data[3],
-        "m_tyresDamageRL": unpacked_data[4],
-        "m_tyresDamageRR": unpacked_data[5],
-        "m_tyresDamageFL": unpacked_data[6],
-        "m_tyresDamageFR": unpacked_data[7],
-        "m_brakesDamageRL": unpacked_data[8],
-        "m_brakesDamageRR": unpacked_data[9],
-        "m_brakesDamageFL": unpacked_data[10],
-        "m_brakesDamageFR": unpacked_data[11],
-        "m_frontLeftWingDamage": unpacked_data[12],
-        "m_frontRightWingDamage": unpacked_data[13],
-        "m_rearWingDamage": unpacked_data[14],
-        "m_floorDamage": unpacked_data[15],
-        "m_diffuserDamage": unpacked_data[16],
-        "m_sidepodDamage": unpacked_data[17],
-        "m_drsFault": unpacked_data[18],
-        "m_ersFault": unpacked_data[19],
-        "m_gearBoxDamage": unpacked_data[20],
-        "m_engineDamage": unpacked_data[21],
-        "m_engineMGUHWear": unpacked_data[22],
-        "m_engineESWear": unpacked_data[23],
-        "m_engineCEWear": unpacked_data[24],
-        "m_engineICEWear": unpacked_data[25],
-        "m_engineMGUKWear": unpacked_data[26],
-        "m_engineTCWear": unpacked_data[27],
-        "m_engineBlown": unpacked_data[28],
-        "m_engineSeized": unpacked_data[29],
-    }
-
-    return car_damage_data_dict
-
-
-def parse_packet_car_damage_data(data):
-    unpacked_data = struct.unpack_from(PACKET_CAR_DAMAGE_DATA_FORMAT, data)
-    header_dict = parse_packet_header(unpacked_data[0:HEADER_SIZE], True)
-    car_damage_data_start = HEADER_SIZE
-
-    car_damage_data_array = []
-    for i in range(22):
-        start_index = car_damage_data_start + (i * len(CAR_DAMAGE_DATA_FORMAT))
-        end_index = start_index + len(CAR_DAMAGE_DATA_FORMAT)
-        car_damage_data = unpacked_data[start_index:end_index]
-        car_damage_data_array.append(parse_car_damage_data(car_damage_data))
-
-    packet_car_damage_data_dict = {
-        "m_header": header_dict,
-        "m_carDamageData": car_damage_data_array,
-    }
-
-    return packet_car_damage_data_dict
 
 ## FINAL CLASSIFICATION DATA
-FINAL_CLASSIFICATION_DATA_FORMAT = "BBBBBBIdBBBBBBBBBBBBBBBBBBBBBBBBBBB"
-PACKET_FINAL_CLASSIFICATION_DATA_FORMAT = PACKET_HEADER_DATA_FORMAT + "B" + FINAL_CLASSIFICATION_DATA_FORMAT * 22
-
-def parse_final_classification_data(unpacked_data):
-    final_classification_data_dict = {
-        "m_position": unpacked_data[0],
-        "m_numLaps": unpacked_data[1],
-        "m_gridPosition": unpacked_data[2],
-        "m_points": unpacked_data[3],
-        "m_numPitStops": unpacked_data[4],
-        "m_resultStatus": unpacked_data[5],
-        "m_bestLapTimeInMS": unpacked_data[6],
-        "m_totalRaceTime": unpacked_data[7],
-        "m_penaltiesTime": unpacked_data[8],
-        "m_numPenalties": unpacked_data[9],
-        "m_numTyreStints": unpacked_data[10],
-        "m_tyreStintsActual": list(unpacked_data[11:19]),
-        "m_tyreStintsVisual": list(unpacked_data[19:27]),
-        "m_tyreStintsEndLaps": list(unpacked_data[27:35]),
-    }
-
-    return final_classification_data_dict
-
-def parse_packet_final_classification_data(data):
-    unpacked_data = struct.unpack_from(PACKET_FINAL_CLASSIFICATION_DATA_FORMAT, data)
-    header_dict = parse_packet_header(unpacked_data[:HEADER_SIZE], True)
-    final_classification_data_start = HEADER_SIZE + 1
-
-    classification_data_array = []
-    for i in range(22):
-        start_index = final_classification_data_start + (i * len(FINAL_CLASSIFICATION_DATA_FORMAT))
-        end_index = start_index + len(FINAL_CLASSIFICATION_DATA_FORMAT)
-        classification_data = unpacked_data[start_index:end_index]
-        classification_data_array.append(parse_final_classification_data(classification_data))
-
-    packet_final_classification_data_dict = {
-        "m_header": header_dict,
-        "m_numCars": unpacked_data[12],
-        "m_classificationData": classification_data_array,
-    }
-
-    return packet_final_classification_data_dict
+FINAL_CLASSIFICATION_DATA = (
+    ("m_position", "B"),
+    ("m_numLaps", "B"),
+    ("m_gridPosition", "B"),
+    ("m_points", "B"),
+    ("m_numPitStops", "B"),
+    ("m_resultStatus", "B"),
+    ("m_bestLapTimeInMS", "I"),
+    ("m_totalRaceTime", "d"),
+    ("m_penaltiesTime", "B"),
+    ("m_numPenalties", "B"),
+    ("m_numTyreStints", "B"),
+    ("m_tyreStintsActual", "B", 8),
+    ("m_tyreStintsVisual", "B", 8),
+    ("m_tyreStintsEndLaps", "B", 8),
+)
+PACKET_FINAL_CLASSIFICATION_DATA = (
+    ("m_header", PACKET_HEADER),
+    ("m_numCars", "B"),
+    ("m_classificationData", FINAL_CLASSIFICATION_DATA, 22),
+)
 
 ## TYRE SETS DATA
-TYRE_SET_DATA_FORMAT = "BBBBBBBhB"
-PACKET_TYRE_SETS_DATA_FORMAT = PACKET_HEADER_DATA_FORMAT + "B" + TYRE_SET_DATA_FORMAT * 20 + "B"
-
-def parse_tyre_set_data(unpacked_data):
-    tyre_set_data_dict = {
-        "m_actualTyreCompound": unpacked_data[0],
-        "m_visualTyreCompound": unpacked_data[1],
-        "m_wear": unpacked_data[2],
-        "m_available": unpacked_data[3],
-        "m_recommendedSession": unpacked_data[4],
-        "m_lifeSpan": unpacked_data[5],
-        "m_usableLife": unpacked_data[6],
-        "m_lapDeltaTime": unpacked_data[7],
-        "m_fitted": unpacked_data[8],
-    }
+TYRE_SET_DATA = (
+    ("m_actualTyreCompound", "B"),
+    ("m_visualTyreCompound", "B"),
+    ("m_wear", "B"),
+    ("m_available", "B"),
+    ("m_recommendedSession", "B"),
+    ("m_lifeSpan", "B"),
+    ("m_usableLife", "B"),
+    ("m_lapDeltaTime", "h"),
+    ("m_fitted", "B"),
+)
+PACKET_TYRE_SETS_DATA = (
+    ("m_header", PACKET_HEADER),
+    ("m_carIdx", "B"),
+    ("m_tyreSetData", TYRE_SET_DATA, 20),
+    ("m_fittedIdx", "B"),
+)
 
-    return tyre_set_data_dict
+## EVENT DATA
+# The event details are a union, their layout depends on the event code.
+EVENT_DETAILS = {
+    "FTLP": (("vehicleIdx", "B"), ("lapTime", "f")),
+    "RTMT": (("vehicleIdx", "B"),),
+    "TMPT": (("vehicleIdx", "B"),),
+    "RCWN": (("vehicleIdx", "B"),),
+    "PENA": (
+        ("penaltyType", "B"),
+        ("infringementType", "B"),
+        ("vehicleIdx", "B"),
+        ("otherVehicleIdx", "B"),
+        ("time", "B"),
+        ("lapNum", "B"),
+        ("placesGained", "B"),
+    ),
+    "SPTP": (
+        ("vehicleIdx", "B"),
+        ("speed", "f"),
+        ("isOverallFastestInSession", "B"),
+        ("isDriverFastestInSession", "B"),
+        ("fastestVehicleIdxInSession", "B"),
+        ("fastestSpeedInSession", "f"),
+    ),
+    "STLG": (("numLights", "B"),),
+    "DTSV": (("vehicleIdx", "B"),),
+    "SGSV": (("vehicleIdx", "B"),),
+    "FLBK": (("flashbackFrameIdentifier", "L"), ("flashbackSessionTime", "f")),
+    "BUTN": (("buttonStatus", "L"),),
+    "OVTK": (("overtakingVehicleIdx", "B"), ("beingOvertakenVehicleIdx", "B")),
+}
+EVENT_DETAILS_SIZE = 12
+PACKET_EVENT_HEADER = (
+    ("m_header", PACKET_HEADER),
+    ("m_eventStringCode", "4s"),
+)
+# All detail fields of all events, the shape of a decoded event for
+# storage and export. Events only have the fields of their code.
+EVENT_DETAILS_UNION = tuple(
+    {
+        name: (name, kind)
+        for details in EVENT_DETAILS.values()
+        for name, kind in details
+    }.values()
+)
+PACKET_EVENT_DATA = PACKET_EVENT_HEADER + (("m_eventDetails", EVENT_DETAILS_UNION),)
+
+## LOBBY INFO DATA
+LOBBY_INFO_DATA = (
+    ("m_aiControlled", "B"),
+    ("m_teamId", "B"),
+    ("m_nationality", "B"),
+    ("m_platform", "B"),
+    ("m_name", "48s"),
+    ("m_carNumber", "B"),
+    ("m_readyStatus", "B"),
+)
+PACKET_LOBBY_INFO_DATA = (
+    ("m_header", PACKET_HEADER),
+    ("m_numPlayers", "B"),
+    ("m_lobbyPlayers", LOBBY_INFO_DATA, 22),
+)
 
-def parse_packet_tyre_sets_data(data):
-    unpacked_data = struct.unpack_from(PACKET_TYRE_SETS_DATA_FORMAT, data)
-    header_dict = parse_packet_header(unpacked_data[:HEADER_SIZE], True)
-    tyre_sets_data_start = HEADER_SIZE + 1
+## SESSION HISTORY DATA
+LAP_HISTORY_DATA = (
+    ("m_lapTimeInMS", "I"),
+    ("m_sector1TimeInMS", "H"),
+    ("m_sector1TimeMinutes", "B"),
+    ("m_sector2TimeInMS", "H"),
+    ("m_sector2TimeMinutes", "B"),
+    ("m_sector3TimeInMS", "H"),
+    ("m_sector3TimeMinutes", "B"),
+    ("m_lapValidBitFlags", "B"),
+)
+TYRE_STINT_HISTORY_DATA = (
+    ("m_endLap", "B"),
+    ("m_tyreActualCompound", "B"),
+    ("m_tyreVisualCompound", "B"),
+)
+PACKET_SESSION_HISTORY_DATA = (
+    ("m_header", PACKET_HEADER),
+    ("m_carIdx", "B"),
+    ("m_numLaps", "B"),
+    ("m_numTyreStints", "B"),
+    ("m_bestLapTimeLapNum", "B"),
+    ("m_bestSector1LapNum", "B"),
+    ("m_bestSector2LapNum", "B"),
+    ("m_bestSector3LapNum", "B"),
+    ("m_lapHistoryData", LAP_HISTORY_DATA, 100),
+    ("m_tyreStintsHistoryData", TYRE_STINT_HISTORY_DATA, 8),
+)
 
-    tyre_sets_data_array = []
-    for i in range(20):
-        start_index = tyre_sets_data_start + (i * len(TYRE_SET_DATA_FORMAT))
-        end_index = start_index + len(TYRE_SET_DATA_FORMAT)
-        tyre_set_data = unpacked_data[start_index:end_index]
-        tyre_sets_data_array.append(parse_tyre_set_data(tyre_set_data))
+## MOTION EX DATA
+# Player car only, wheel arrays are in the order RL, RR, FL, FR.
+PACKET_MOTION_EX_DATA = (
+    ("m_header", PACKET_HEADER),
+    *(
+        (f"{field}{corner}", "f")
+        for field in (
+            "m_suspensionPosition",
+            "m_suspensionVelocity",
+            "m_suspensionAcceleration",
+            "m_wheelSpeed",
+            "m_wheelSlipRatio",
+            "m_wheelSlipAngle",
+            "m_wheelLatForce",
+            "m_wheelLongForce",
+        )
+        for corner in ("RL", "RR", "FL", "FR")
+    ),
+    ("m_heightOfCOGAboveGround", "f"),
+    ("m_localVelocityX", "f"),
+    ("m_localVelocityY", "f"),
+    ("m_localVelocityZ", "f"),
+    ("m_angularVelocityX", "f"),
+    ("m_angularVelocityY", "f"),
+    ("m_angularVelocityZ", "f"),
+    ("m_angularAccelerationX", "f"),
+    ("m_angularAccelerationY", "f"),
+    ("m_angularAccelerationZ", "f"),
+    ("m_frontWheelsAngle", "f"),
+    ("m_wheelVertForceRL", "f"),
+    ("m_wheelVertForceRR", "f"),
+    ("m_wheelVertForceFL", "f"),
+    ("m_wheelVertForceFR", "f"),
+)
 
-    packet_tyre_sets_data_dict = {
-        "m_header": header_dict,
-        "m_carIdx": unpacked_data[12],
-        "m_tyreSetData": tyre_sets_data_array,
-        "m_fittedIdx": unpacked_data[-1],
-    }
 
-    return packet_tyre_sets_data_dict
\ No newline at end of file
+## COMPILED LAYOUTS
+CAR_MOTION_DATA_LAYOUT = RecordLayout(CAR_MOTION_DATA)
+PACKET_MOTION_DATA_LAYOUT = RecordLayout(PACKET_MOTION_DATA)
+MARSHAL_ZONE_LAYOUT = RecordLayout(MARSHAL_ZONE)
+WEATHER_FORECAST_SAMPLE_LAYOUT = RecordLayout(WEATHER_FORECAST_SAMPLE)
+PACKET_SESSION_DATA_LAYOUT = RecordLayout(PACKET_SESSION_DATA)
+LAP_DATA_LAYOUT = RecordLayout(LAP_DATA)
+PACKET_LAP_DATA_LAYOUT = RecordLayout(PACKET_LAP_DATA)
+PARTICIPANT_DATA_LAYOUT = RecordLayout(PARTICIPANT_DATA)
+PACKET_PARTICIPANTS_DATA_LAYOUT = RecordLayout(PACKET_PARTICIPANTS_DATA)
+CAR_SETUP_DATA_LAYOUT = RecordLayout(CAR_SETUP_DATA)
+PACKET_CAR_SETUP_DATA_LAYOUT = RecordLayout(PACKET_CAR_SETUP_DATA)
+CAR_TELEMETRY_DATA_LAYOUT = RecordLayout(CAR_TELEMETRY_DATA)
+PACKET_CAR_TELEMETRY_DATA_LAYOUT = RecordLayout(PACKET_CAR_TELEMETRY_DATA)
+CAR_STATUS_DATA_LAYOUT = RecordLayout(CAR_STATUS_DATA)
+PACKET_CAR_STATUS_DATA_LAYOUT = RecordLayout(PACKET_CAR_STATUS_DATA)
+CAR_DAMAGE_DATA_LAYOUT = RecordLayout(CAR_DAMAGE_DATA)
+PACKET_CAR_DAMAGE_DATA_LAYOUT = RecordLayout(PACKET_CAR_DAMAGE_DATA)
+FINAL_CLASSIFICATION_DATA_LAYOUT = RecordLayout(FINAL_CLASSIFICATION_DATA)
+PACKET_FINAL_CLASSIFICATION_DATA_LAYOUT = RecordLayout(PACKET_FINAL_CLASSIFICATION_DATA)
+TYRE_SET_DATA_LAYOUT = RecordLayout(TYRE_SET_DATA)
+PACKET_TYRE_SETS_DATA_LAYOUT = RecordLayout(PACKET_TYRE_SETS_DATA)
+PACKET_EVENT_HEADER_LAYOUT = RecordLayout(PACKET_EVENT_HEADER)
+PACKET_EVENT_DATA_LAYOUT = RecordLayout(PACKET_EVENT_DATA)
+# One layout per event code, so an event is decoded with a single struct call.
+PACKET_EVENT_LAYOUTS = {
+    code.encode(): RecordLayout(PACKET_EVENT_HEADER + (("m_eventDetails", details),))
+    for code, details in EVENT_DETAILS.items()
+}
+PACKET_EVENT_NO_DETAILS_LAYOUT = RecordLayout(PACKET_EVENT_HEADER + (("m_eventDetails", ()),))
+EVENT_CODE_OFFSET = PACKET_EVENT_HEADER_LAYOUT.offsets["m_eventStringCode"]
+PACKET_EVENT_DATA_SIZE = PACKET_EVENT_HEADER_LAYOUT.size + EVENT_DETAILS_SIZE
+LOBBY_INFO_DATA_LAYOUT = RecordLayout(LOBBY_INFO_DATA)
+PACKET_LOBBY_INFO_DATA_LAYOUT = RecordLayout(PACKET_LOBBY_INFO_DATA)
+LAP_HISTORY_DATA_LAYOUT = RecordLayout(LAP_HISTORY_DATA)
+TYRE_STINT_HISTORY_DATA_LAYOUT = RecordLayout(TYRE_STINT_HISTORY_DATA)
+PACKET_SESSION_HISTORY_DATA_LAYOUT = RecordLayout(PACKET_SESSION_HISTORY_DATA)
+PACKET_MOTION_EX_DATA_LAYOUT = RecordLayout(PACKET_MOTION_EX_DATA)
+
+# Packet layouts by packet id.
+PACKET_LAYOUTS = {
+    0: PACKET_MOTION_DATA_LAYOUT,
+    1: PACKET_SESSION_DATA_LAYOUT,
+    2: PACKET_LAP_DATA_LAYOUT,
+    3: PACKET_EVENT_DATA_LAYOUT,
+    4: PACKET_PARTICIPANTS_DATA_LAYOUT,
+    5: PACKET_CAR_SETUP_DATA_LAYOUT,
+    6: PACKET_CAR_TELEMETRY_DATA_LAYOUT,
+    7: PACKET_CAR_STATUS_DATA_LAYOUT,
+    8: PACKET_FINAL_CLASSIFICATION_DATA_LAYOUT,
+    9: PACKET_LOBBY_INFO_DATA_LAYOUT,
+    10: PACKET_CAR_DAMAGE_DATA_LAYOUT,
+    11: PACKET_SESSION_HISTORY_DATA_LAYOUT,
+    12: PACKET_TYRE_SETS_DATA_LAYOUT,
+    13: PACKET_MOTION_EX_DATA_LAYOUT,
+}
+# m_packetFormat of the packets described by these layouts.
+PACKET_FORMAT = 2023
+# Datagram sizes by packet id, events are padded to the largest details.
+PACKET_SIZES = {
+    **{packet_id: layout.size for packet_id, layout in PACKET_LAYOUTS.items()},
+    3: PACKET_EVENT_DATA_SIZE,
+}
+
+## STRUCT FORMATS
+CAR_MOTION_DATA_FORMAT = CAR_MOTION_DATA_LAYOUT.format
+PACKET_MOTION_DATA_FORMAT = "<" + PACKET_MOTION_DATA_LAYOUT.format
+MARSHAL_ZONE_FORMAT = MARSHAL_ZONE_LAYOUT.format
+WEATHER_FORECAST_SAMPLE_FORMAT = WEATHER_FORECAST_SAMPLE_LAYOUT.format
+PACKET_SESSION_DATA_FORMAT = "<" + PACKET_SESSION_DATA_LAYOUT.format
+packet_session_data_format = PACKET_SESSION_DATA_FORMAT
+LAP_DATA_FORMAT = LAP_DATA_LAYOUT.format
+PACKET_LAP_DATA_FORMAT = "<" + PACKET_LAP_DATA_LAYOUT.format
+PARTICIPANT_DATA_FORMAT = PARTICIPANT_DATA_LAYOUT.format
+PACKET_PARTICIPANTS_DATA_FORMAT = "<" + PACKET_PARTICIPANTS_DATA_LAYOUT.format
+CAR_SETUP_DATA_FORMAT = CAR_SETUP_DATA_LAYOUT.format
+PACKET_CAR_SETUP_DATA_FORMAT = "<" + PACKET_CAR_SETUP_DATA_LAYOUT.format
+CAR_TELEMETRY_DATA_FORMAT = CAR_TELEMETRY_DATA_LAYOUT.format
+PACKET_CAR_TELEMETRY_DATA_FORMAT = "<" + PACKET_CAR_TELEMETRY_DATA_LAYOUT.format
+CAR_STATUS_DATA_FORMAT = CAR_STATUS_DATA_LAYOUT.format
+PACKET_CAR_STATUS_DATA_FORMAT = "<" + PACKET_CAR_STATUS_DATA_LAYOUT.format
+CAR_DAMAGE_DATA_FORMAT = CAR_DAMAGE_DATA_LAYOUT.format
+PACKET_CAR_DAMAGE_DATA_FORMAT = "<" + PACKET_CAR_DAMAGE_DATA_LAYOUT.format
+FINAL_CLASSIFICATION_DATA_FORMAT = FINAL_CLASSIFICATION_DATA_LAYOUT.format
+PACKET_FINAL_CLASSIFICATION_DATA_FORMAT = (
+    "<" + PACKET_FINAL_CLASSIFICATION_DATA_LAYOUT.format
+)
+TYRE_SET_DATA_FORMAT = TYRE_SET_DATA_LAYOUT.format
+PACKET_TYRE_SETS_DATA_FORMAT = "<" + PACKET_TYRE_SETS_DATA_LAYOUT.format
+PACKET_EVENT_DATA_FORMAT = (
+    "<" + PACKET_EVENT_HEADER_LAYOUT.format + f"{EVENT_DETAILS_SIZE}x"
+)
+LOBBY_INFO_DATA_FORMAT = LOBBY_INFO_DATA_LAYOUT.format
+PACKET_LOBBY_INFO_DATA_FORMAT = "<" + PACKET_LOBBY_INFO_DATA_LAYOUT.format
+LAP_HISTORY_DATA_FORMAT = LAP_HISTORY_DATA_LAYOUT.format
+TYRE_STINT_HISTORY_DATA_FORMAT = TYRE_STINT_HISTORY_DATA_LAYOUT.format
+PACKET_SESSION_HISTORY_DATA_FORMAT = "<" + PACKET_SESSION_HISTORY_DATA_LAYOUT.format
+PACKET_MOTION_EX_DATA_FORMAT = "<" + PACKET_MOTION_EX_DATA_LAYOUT.format
+
+## GENERATED PARSERS
+parse_car_motion_data = CAR_MOTION_DATA_LAYOUT.from_values
+parse_packet_motion_data = PACKET_MOTION_DATA_LAYOUT.unpack
+parse_marshal_zone = MARSHAL_ZONE_LAYOUT.from_values
+parse_weather_forecast_sample = WEATHER_FORECAST_SAMPLE_LAYOUT.from_values
+parse_packet_session_data = PACKET_SESSION_DATA_LAYOUT.unpack
+parse_lap_data = LAP_DATA_LAYOUT.from_values
+parse_packet_lap_data = PACKET_LAP_DATA_LAYOUT.unpack
+parse_participant_data = PARTICIPANT_DATA_LAYOUT.from_values
+parse_packet_participants_data = PACKET_PARTICIPANTS_DATA_LAYOUT.unpack
+parse_car_setup_data = CAR_SETUP_DATA_LAYOUT.from_values
+parse_packet_car_setup_data = PACKET_CAR_SETUP_DATA_LAYOUT.unpack
+parse_car_telemetry_data = CAR_TELEMETRY_DATA_LAYOUT.from_values
+parse_packet_car_telemetry_data = PACKET_CAR_TELEMETRY_DATA_LAYOUT.unpack
+parse_car_status_data = CAR_STATUS_DATA_LAYOUT.from_values
+parse_packet_car_status_data = PACKET_CAR_STATUS_DATA_LAYOUT.unpack
+parse_car_damage_data = CAR_DAMAGE_DATA_LAYOUT.from_values
+parse_packet_car_damage_data = PACKET_CAR_DAMAGE_DATA_LAYOUT.unpack
+parse_final_classification_data = FINAL_CLASSIFICATION_DATA_LAYOUT.from_values
+parse_packet_final_classification_data = PACKET_FINAL_CLASSIFICATION_DATA_LAYOUT.unpack
+parse_tyre_set_data = TYRE_SET_DATA_LAYOUT.from_values
+parse_packet_tyre_sets_data = PACKET_TYRE_SETS_DATA_LAYOUT.unpack
+parse_lobby_info_data = LOBBY_INFO_DATA_LAYOUT.from_values
+parse_packet_lobby_info_data = PACKET_LOBBY_INFO_DATA_LAYOUT.unpack
+parse_lap_history_data = LAP_HISTORY_DATA_LAYOUT.from_values
+parse_tyre_stint_history_data = TYRE_STINT_HISTORY_DATA_LAYOUT.from_values
+parse_packet_session_history_data = PACKET_SESSION_HISTORY_DATA_LAYOUT.unpack
+parse_packet_motion_ex_data = PACKET_MOTION_EX_DATA_LAYOUT.unpack
+
+
+def parse_packet_event_data(data) -> dict:
+    """Decode an event packet with the layout of its event code.
+
+    Events without details, e.g. SSTA or DRSE, and unknown codes get empty
+    m_eventDetails.
+    """
+    code = bytes(data[EVENT_CODE_OFFSET : EVENT_CODE_OFFSET + 4])
+    return PACKET_EVENT_LAYOUTS.get(code, PACKET_EVENT_NO_DETAILS_LAYOUT).unpack(data)
+
+
+## COLUMNAR PARSERS
+parse_packet_motion_columns = PACKET_MOTION_DATA_LAYOUT.unpack_columns
+parse_packet_lap_columns = PACKET_LAP_DATA_LAYOUT.unpack_columns
+parse_packet_car_setup_columns = PACKET_CAR_SETUP_DATA_LAYOUT.unpack_columns
+parse_packet_car_telemetry_columns = PACKET_CAR_TELEMETRY_DATA_LAYOUT.unpack_columns
+parse_packet_car_status_columns = PACKET_CAR_STATUS_DATA_LAYOUT.unpack_columns
+parse_packet_car_damage_columns = PACKET_CAR_DAMAGE_DATA_LAYOUT.unpack_columns
+
+## SELECTED CAR PARSERS
+parse_packet_motion_selected = PACKET_MOTION_DATA_LAYOUT.selected_decoder(
+    "m_carMotionData"
+)
+parse_packet_lap_selected = PACKET_LAP_DATA_LAYOUT.selected_decoder("m_lapData")
+parse_packet_participants_selected = PACKET_PARTICIPANTS_DATA_LAYOUT.selected_decoder(
+    "m_participants"
+)
+parse_packet_car_setup_selected = PACKET_CAR_SETUP_DATA_LAYOUT.selected_decoder(
+    "m_carSetups"
+)
+parse_packet_car_telemetry_selected = PACKET_CAR_TELEMETRY_DATA_LAYOUT.selected_decoder(
+    "m_carTelemetryData"
+)
+parse_packet_car_status_selected = PACKET_CAR_STATUS_DATA_LAYOUT.selected_decoder(
+    "m_carStatusData"
+)
+parse_packet_final_classification_selected = (
+    PACKET_FINAL_CLASSIFICATION_DATA_LAYOUT.selected_decoder("m_classificationData")
+)
+parse_packet_car_damage_selected = PACKET_CAR_DAMAGE_DATA_LAYOUT.selected_decoder(
+    "m_carDamageData"
+)
+parse_packet_lobby_info_selected = PACKET_LOBBY_INFO_DATA_LAYOUT.selected_decoder(
+    "m_lobbyPlayers"
+)
@@ -0,0 +1,354 @@
+"""Multi-rig ingest sharded across worker processes.
+
+The supervisor receives datagrams on one or more UDP ports, drops packet
+types that are not stored based on the header, and hands the raw datagrams
+in batches to N worker processes. Packets are sharded by source address or
+by session UID, so all packets of one rig or session end up in the same
+worker and sampling and lap tracking stay consistent. Each worker decodes
+and stores with its own MongoDB client, and every document is tagged with
+the address of the rig that sent it. Datagrams that fail to decode are
+counted, any other error ends the worker and stops the supervisor. A
+worker that falls behind never holds up the others, batches for it are
+dropped and counted once its inbox is full.
+"""
+import multiprocessing
+import os
+import queue
+import selectors
+import signal
+import socket
+import struct
+import time
+from dotenv import load_dotenv
+from f1_telemetry.data.mongodb_ingest import (
+    PACKET_COLLECTIONS,
+    BufferedMongoWriter,
+    create_per_car_store,
+    create_router,
+    get_mongo_client,
+    store_packet,
+    verify_mongodb_setup,
+)
+from f1_telemetry.data.metadata import MetadataCache
+from f1_telemetry.data.packet_filter import PacketFilter
+from f1_telemetry.data.sampling import Sampler
+from f1_telemetry.data.struct_parsers import PACKET_HEADER_LAYOUT
+from f1_telemetry.data.udp_stream import (
+    F1_UDP_SERVER_ADDRESS,
+    MAX_PACKET_SIZE,
+    PARSER_REGISTRY,
+    create_udp_socket,
+    format_source,
+    parse_packet,
+)
+
+load_dotenv()
+
+F1_INGEST_WORKERS = int(os.environ.get("F1_INGEST_WORKERS", os.cpu_count() or 1))
+# "source" shards by sender address, "session" by m_sessionUID.
+F1_SHARD_BY = str(os.environ.get("F1_SHARD_BY", "source"))
+F1_SHARD_BATCH_SIZE = int(os.environ.get("F1_SHARD_BATCH_SIZE", 64))
+F1_SHARD_BATCH_INTERVAL = float(os.environ.get("F1_SHARD_BATCH_INTERVAL", 0.05))
+WORKER_QUEUE_SIZE = 1024
+
+SHARD_BY_SOURCE = "source"
+SHARD_BY_SESSION = "session"
+SESSION_UID = struct.Struct("<Q")
+SESSION_UID_OFFSET = PACKET_HEADER_LAYOUT.offsets["m_sessionUID"]
+
+
+def shard_index(message: bytes, source: str, shards: int, shard_by: str) -> int:
+    """Pick the worker for a datagram.
+
+    Args:
+        message (bytes): Raw datagram.
+        source (str): Sender address as "host:port".
+        shards (int): Number of workers.
+        shard_by (str): "source" or "session".
+
+    Returns:
+        int: Worker index.
+    """
+    if shard_by == SHARD_BY_SESSION:
+        (session_uid,) = SESSION_UID.unpack_from(message, SESSION_UID_OFFSET)
+        return session_uid % shards
+    return hash(source) % shards
+
+
+def ingest_worker(inbox, results) -> None:
+    """Decode and store datagram batches until a None batch arrives.
+
+    Datagrams that can't be decoded are counted as errors. Documents MongoDB
+    doesn't store are counted as failed by the writer, other exceptions end
+    the worker.
+
+    Args:
+        inbox (multiprocessing.Queue): Lists of datagram and source tuples.
+        results (multiprocessing.Queue): Receives the worker's counters.
+    """
+    # Ctrl+C reaches the whole process group, the supervisor stops workers.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    packet_filter = PacketFilter.from_env(PACKET_COLLECTIONS)
+    sampler = Sampler.from_env()
+    # Collections are set up once by run_supervised_ingest.
+    per_car = create_per_car_store(setup=False)
+    router = create_router()
+    metadata = MetadataCache.from_env()
+    packets = 0
+    errors = 0
+    with BufferedMongoWriter(get_mongo_client().f1) as writer:
+        while True:
+            try:
+                batch = inbox.get(timeout=writer.flush_interval)
+            except queue.Empty:
+                writer.flush_if_due()
+                continue
+            if batch is None:
+                break
+            for message, source in batch:
+                packets += 1
+                try:
+                    data = parse_packet(message, packet_filter=packet_filter)
+                except (struct.error, ValueError):
+                    errors += 1
+                    continue
+                if data is not None:
+                    store_packet(
+                        writer,
+                        data,
+                        sampler=sampler,
+                        per_car=per_car,
+                        source=source,
+                        router=router,
+                        metadata=metadata,
+                    )
+    results.put(
+        {
+            "pid": os.getpid(),
+            "packets": packets,
+            "errors": errors,
+            "stored": writer.flushed,
+            "failed": writer.failed,
+        }
+    )
+
+
+class IngestSupervisor:
+    """Receive on several UDP ports and shard packets across processes.
+
+    Args:
+        ports (list): UDP ports to listen on.
+        workers (int): Number of worker processes.
+        shard_by (str): "source" or "session".
+        address (str): Address to bind to.
+        packet_filter (PacketFilter): Packet types to forward, all if omitted.
+        batch_size (int): Datagrams per batch handed to a worker.
+        batch_interval (float): Seconds after which partial batches are sent.
+
+    Attributes:
+        dropped (list): Datagrams dropped per worker because its inbox was
+            full.
+    """
+
+    def __init__(
+        self,
+        ports: list,
+        workers: int = F1_INGEST_WORKERS,
+        shard_by: str = F1_SHARD_BY,
+        address: str = F1_UDP_SERVER_ADDRESS,
+        packet_filter: PacketFilter = None,
+        batch_size: int = F1_SHARD_BATCH_SIZE,
+        batch_interval: float = F1_SHARD_BATCH_INTERVAL,
+    ):
+        if shard_by not in (SHARD_BY_SOURCE, SHARD_BY_SESSION):
+            raise ValueError(f"Unknown shard key {shard_by!r}.")
+        if workers < 1:
+            raise ValueError("workers must be at least 1.")
+        self.ports = ports
+        self.workers = workers
+        self.shard_by = shard_by
+        self.address = address
+        self.packet_filter = packet_filter
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.received = 0
+        self.filtered = 0
+        self.forwarded = [0] * workers
+        self.dropped = [0] * workers
+        self.sources = set()
+        self._sockets = []
+        self._processes = []
+        self._inboxes = []
+        self._results = None
+
+    def start(self) -> None:
+        """Bind the sockets and start the worker processes."""
+        context = multiprocessing.get_context("spawn")
+        self._results = context.Queue()
+        for _ in range(self.workers):
+            inbox = context.Queue(WORKER_QUEUE_SIZE)
+            process = context.Process(
+                target=ingest_worker, args=(inbox, self._results), daemon=True
+            )
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+        for port in self.ports:
+            udp_socket = create_udp_socket(self.address, port)
+            udp_socket.setblocking(False)
+            self._sockets.append(udp_socket)
+
+    def run_forever(self) -> list:
+        """Receive until Ctrl+C, then stop the workers.
+
+        The workers are stopped and flush what they were sent even if
+        receiving fails.
+
+        Returns:
+            list: Counters of every worker.
+
+        Raises:
+            RuntimeError: If a worker exited, after stopping the others.
+        """
+        self.start()
+        try:
+            self.serve()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            results = self.stop()
+        return results
+
+    def serve(self, stop=None) -> None:
+        """Receive and forward datagrams.
+
+        Args:
+            stop (threading.Event): Returns once set, runs forever if omitted.
+
+        Raises:
+            RuntimeError: If a worker exited, e.g. on a storage error.
+        """
+        selector = selectors.DefaultSelector()
+        for udp_socket in self._sockets:
+            selector.register(udp_socket, selectors.EVENT_READ)
+        batches = [[] for _ in range(self.workers)]
+        last_send = time.monotonic()
+        try:
+            while stop is None or not stop.is_set():
+                for key, _ in selector.select(self.batch_interval):
+                    self._drain(key.fileobj, batches)
+                if time.monotonic() - last_send >= self.batch_interval:
+                    self.check_workers()
+                    for index, batch in enumerate(batches):
+                        if batch:
+                            self._send(index, batch)
+                            batches[index] = []
+                    last_send = time.monotonic()
+        finally:
+            for index, batch in enumerate(batches):
+                if batch and self._processes[index].is_alive():
+                    self._send(index, batch)
+            selector.close()
+
+    def check_workers(self) -> None:
+        """Raise if a worker process exited.
+
+        Raises:
+            RuntimeError: With the pid and exit code of the first dead worker.
+        """
+        for process in self._processes:
+            if not process.is_alive():
+                raise RuntimeError(
+                    f"Ingest worker {process.pid} exited with code {process.exitcode}."
+                )
+
+    def stop(self) -> list:
+        """Stop the workers after they stored what they were sent.
+
+        Returns:
+            list: Counters of every worker.
+        """
+        for udp_socket in self._sockets:
+            udp_socket.close()
+        for inbox, process in zip(self._inboxes, self._processes):
+            if process.is_alive():
+                inbox.put(None)
+        for process in self._processes:
+            process.join()
+        results = []
+        for _ in self._processes:
+            try:
+                results.append(self._results.get(timeout=1))
+            except queue.Empty:
+                break
+        return results
+
+    def stats(self) -> dict:
+        """Supervisor counters."""
+        return {
+            "received": self.received,
+            "filtered": self.filtered,
+            "forwarded": list(self.forwarded),
+            "dropped": list(self.dropped),
+            "wrong_size": PARSER_REGISTRY.wrong_size,
+            "sources": sorted(self.sources),
+        }
+
+    def _drain(self, udp_socket: socket.socket, batches: list) -> None:
+        packet_filter = self.packet_filter
+        while True:
+            try:
+                message, address = udp_socket.recvfrom(MAX_PACKET_SIZE)
+            except BlockingIOError:
+                return
+            self.received += 1
+            if not PARSER_REGISTRY.has_header(message):
+                continue
+            if packet_filter is not None and not packet_filter.accepts(message):
+                self.filtered += 1
+                continue
+            source = format_source(address)
+            self.sources.add(source)
+            index = shard_index(message, source, self.workers, self.shard_by)
+            batch = batches[index]
+            batch.append((message, source))
+            if len(batch) >= self.batch_size:
+                self._send(index, batch)
+                batches[index] = []
+
+    def _send(self, index: int, batch: list) -> None:
+        try:
+            self._inboxes[index].put_nowait(batch)
+        except queue.Full:
+            self.check_workers()
+            self.dropped[index] += len(batch)
+            return
+        self.forwarded[index] += len(batch)
+
+
+def run_supervised_ingest(
+    ports: list, workers: int = F1_INGEST_WORKERS, shard_by: str = F1_SHARD_BY
+) -> None:
+    """Run the sharded multi-rig ingest until interrupted with Ctrl+C.
+
+    Args:
+        ports (list): UDP ports to listen on.
+        workers (int): Number of worker processes.
+        shard_by (str): "source" or "session".
+    """
+    verify_mongodb_setup()
+    create_per_car_store()
+    supervisor = IngestSupervisor(
+        ports,
+        workers,
+        shard_by,
+        packet_filter=PacketFilter.from_env(PACKET_COLLECTIONS),
+    )
+    results = supervisor.run_forever()
+    print(f"Ingest stopped: {supervisor.stats()}")
+    for result in results:
+        print(
+            f"worker {result['pid']}: {result['packets']} packets, "
+            f"stored {result['stored']}, failed {result['failed']}, "
+            f"errors {result['errors']}"
+        )
@@ -0,0 +1,172 @@
+"""Per-car time-series storage layout.
+
+Instead of one document per packet holding 22 car entries, every car entry
+becomes its own measurement keyed by session UID, car index and session
+time. Measurements go into native MongoDB time-series collections (server
+5.0+) or, on older servers, into fixed-size bucket documents per session,
+car and lap. The indexes needed for per-driver lap queries are created at
+startup.
+"""
+import os
+from dotenv import load_dotenv
+from pymongo import ASCENDING, UpdateOne
+from f1_telemetry.data.metadata import CARS_KEY
+
+load_dotenv()
+
+# "packets" stores one document per packet, "per_car" one measurement per car.
+F1_STORAGE_LAYOUT = str(os.environ.get("F1_STORAGE_LAYOUT", "packets"))
+F1_BUCKET_SIZE = int(os.environ.get("F1_BUCKET_SIZE", 200))
+
+PACKETS = "packets"
+PER_CAR = "per_car"
+
+CAR_ARRAYS = {
+    "motion": "m_carMotionData",
+    "lap": "m_lapData",
+    "car_setup": "m_carSetups",
+    "car_telemetry": "m_carTelemetryData",
+    "car_status": "m_carStatusData",
+    "car_damage": "m_carDamageData",
+}
+TIMESERIES_SUFFIX = "_ts"
+BUCKETS_SUFFIX = "_buckets"
+TIMESERIES_MIN_VERSION = (5, 0)
+
+
+def int64_session_uid(session_uid: int) -> int:
+    """Map the unsigned 64 bit session UID onto a signed BSON int64."""
+    return session_uid - (1 << 64) if session_uid >= (1 << 63) else session_uid
+
+
+def supports_timeseries(client) -> bool:
+    """Check whether the server supports native time-series collections."""
+    version = client.server_info().get("version", "0.0")
+    major_minor = tuple(int(part) for part in version.split(".")[:2])
+    return major_minor >= TIMESERIES_MIN_VERSION
+
+
+class PerCarStore:
+    """Explode car packets into per-car measurements.
+
+    Args:
+        database: MongoDB database.
+        use_buckets (bool): Store fixed-size buckets instead of native
+            time-series measurements.
+        bucket_size (int): Measurements per bucket document.
+
+    Attributes:
+        collections (frozenset): Packet collections stored per car.
+    """
+
+    collections = frozenset(CAR_ARRAYS)
+
+    def __init__(self, database, use_buckets: bool = False, bucket_size: int = F1_BUCKET_SIZE):
+        self.database = database
+        self.use_buckets = use_buckets
+        self.bucket_size = bucket_size
+        self._laps = {}
+
+    @staticmethod
+    def target_collection(collection: str, use_buckets: bool) -> str:
+        """Name of the per-car collection of a packet collection."""
+        return collection + (BUCKETS_SUFFIX if use_buckets else TIMESERIES_SUFFIX)
+
+    def setup(self) -> None:
+        """Create the per-car collections and their indexes if missing."""
+        existing = set(self.database.list_collection_names())
+        for collection in sorted(self.collections):
+            name = self.target_collection(collection, self.use_buckets)
+            if self.use_buckets:
+                if name not in existing:
+                    self.database.create_collection(name)
+                self.database[name].create_index(
+                    [
+                        ("meta.session_uid", ASCENDING),
+                        ("meta.car_index", ASCENDING),
+                        ("lap", ASCENDING),
+                        ("start_time", ASCENDING),
+                    ]
+                )
+            else:
+                if name not in existing:
+                    self.database.create_collection(
+                        name,
+                        timeseries={
+                            "timeField": "ts",
+                            "metaField": "meta",
+                            "granularity": "seconds",
+                        },
+                    )
+                self.database[name].create_index(
+                    [
+                        ("meta.session_uid", ASCENDING),
+                        ("meta.car_index", ASCENDING),
+                        ("lap", ASCENDING),
+                        ("session_time", ASCENDING),
+                    ]
+                )
+
+    def store(
+        self, writer, collection: str, data: dict, ingested_at, received_ns: int = None
+    ) -> None:
+        """Buffer the per-car measurements of a parsed packet.
+
+        Args:
+            writer (BufferedMongoWriter): Writer buffering the documents.
+            collection (str): Packet collection name.
+            data (dict): Parsed packet with the raw integer session UID.
+            ingested_at (datetime): Receive time, used as time field.
+            received_ns (int): perf_counter_ns receive time for the
+                writer's receive-to-flushed latency.
+        """
+        header = data["m_header"]
+        session_uid = int64_session_uid(header["m_sessionUID"])
+        session_time = header["m_sessionTime"]
+        frame = header["m_frameIdentifier"]
+        source = data.get("_source")
+        cars_meta = data.get(CARS_KEY)
+        cars = data[CAR_ARRAYS[collection]]
+        if collection == "lap":
+            for car_index, car in enumerate(cars):
+                if car and "m_currentLapNum" in car:
+                    self._laps[(session_uid, car_index)] = car["m_currentLapNum"]
+
+        target = self.target_collection(collection, self.use_buckets)
+        for car_index, car in enumerate(cars):
+            if not car:
+                continue
+            meta = {"session_uid": session_uid, "car_index": car_index}
+            if source is not None:
+                meta["source"] = source
+            if cars_meta and car_index < len(cars_meta) and cars_meta[car_index]:
+                meta.update(cars_meta[car_index])
+            lap = self._laps.get((session_uid, car_index))
+            measurement = {
+                "ts": ingested_at,
+                "session_time": session_time,
+                "frame": frame,
+                "lap": lap,
+                **car,
+            }
+            if self.use_buckets:
+                writer.write_operation(
+                    target, self._bucket_update(meta, lap, measurement), received_ns
+                )
+            else:
+                measurement["meta"] = meta
+                writer.write(target, measurement, received_ns)
+
+    def _bucket_update(self, meta: dict, lap, measurement: dict) -> UpdateOne:
+        session_time = measurement["session_time"]
+        query = {f"meta.{key}": value for key, value in meta.items()}
+        return UpdateOne(
+            {**query, "lap": lap, "count": {"$lt": self.bucket_size}},
+            {
+                "$push": {"samples": measurement},
+                "$min": {"start_time": session_time},
+                "$max": {"end_time": session_time},
+                "$inc": {"count": 1},
+            },
+            upsert=True,
+        )
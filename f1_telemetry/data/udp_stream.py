@@ -1,6 +1,9 @@
 """Handle F1 UDP stream and write data to influx."""
 import socket
+from queue import SimpleQueue
 from f1_telemetry.data.struct_parsers import *
+from f1_telemetry.data.packet_filter import PacketFilter
+from f1_telemetry.data.parser_registry import PacketFormat, ParserRegistry
 from dotenv import load_dotenv
 import os
 
@@ -8,35 +11,200 @@ load_dotenv()
 
 F1_UDP_SERVER_ADDRESS = str(os.environ.get("F1_UDP_SERVER_ADDRESS", "127.0.0.1"))
 F1_UDP_SERVER_PORT = int(os.environ.get("F1_UDP_SERVER_PORT", 20777))
+# Comma separated ports for ingests listening on several ports.
+F1_UDP_SERVER_PORTS = str(os.environ.get("F1_UDP_SERVER_PORTS", F1_UDP_SERVER_PORT))
 
+MAX_PACKET_SIZE = 2048
 
-def get_udp_messages() -> dict:
+PACKET_PARSERS = {
+    0: parse_packet_motion_data,
+    1: parse_packet_session_data,
+    2: parse_packet_lap_data,
+    3: parse_packet_event_data,
+    4: parse_packet_participants_data,
+    5: parse_packet_car_setup_data,
+    6: parse_packet_car_telemetry_data,
+    7: parse_packet_car_status_data,
+    8: parse_packet_final_classification_data,
+    9: parse_packet_lobby_info_data,
+    10: parse_packet_car_damage_data,
+    11: parse_packet_session_history_data,
+    12: parse_packet_tyre_sets_data,
+    13: parse_packet_motion_ex_data,
+}
+
+COLUMNAR_PACKET_PARSERS = {
+    **PACKET_PARSERS,
+    0: parse_packet_motion_columns,
+    2: parse_packet_lap_columns,
+    5: parse_packet_car_setup_columns,
+    6: parse_packet_car_telemetry_columns,
+    7: parse_packet_car_status_columns,
+    10: parse_packet_car_damage_columns,
+}
+
+SELECTED_PACKET_PARSERS = {
+    0: parse_packet_motion_selected,
+    2: parse_packet_lap_selected,
+    4: parse_packet_participants_selected,
+    5: parse_packet_car_setup_selected,
+    6: parse_packet_car_telemetry_selected,
+    7: parse_packet_car_status_selected,
+    8: parse_packet_final_classification_selected,
+    9: parse_packet_lobby_info_selected,
+    10: parse_packet_car_damage_selected,
+}
+
+# Decoders of every supported game version, picked per packet.
+PARSER_REGISTRY = ParserRegistry(
+    (
+        PacketFormat(
+            PACKET_FORMAT,
+            PACKET_SIZES,
+            PACKET_PARSERS,
+            COLUMNAR_PACKET_PARSERS,
+            SELECTED_PACKET_PARSERS,
+        ),
+    )
+)
+
+
+class BufferPool:
+    """Pool of preallocated receive buffers.
+
+    All slots share one bytearray, so receiving into a slot with
+    ``recvfrom_into`` allocates nothing. A slot has to be released once the
+    datagram in it has been parsed; consumers that keep the raw bytes must
+    copy them first.
+
+    Args:
+        slots (int): Number of slots.
+        slot_size (int): Size of each slot in bytes.
+    """
+
+    def __init__(self, slots: int, slot_size: int = MAX_PACKET_SIZE):
+        if slots < 1:
+            raise ValueError("slots must be at least 1.")
+        self.slots = slots
+        self.slot_size = slot_size
+        self._buffer = bytearray(slots * slot_size)
+        view = memoryview(self._buffer)
+        self._views = [
+            view[i * slot_size : (i + 1) * slot_size] for i in range(slots)
+        ]
+        self._free = SimpleQueue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+    def acquire(self, timeout: float = None) -> int:
+        """Take a free slot, waiting until one is released.
+
+        Raises:
+            queue.Empty: No slot was released within the timeout.
+        """
+        return self._free.get(timeout=timeout)
+
+    def release(self, slot: int) -> None:
+        """Return a slot to the pool."""
+        self._free.put(slot)
+
+    def view(self, slot: int) -> memoryview:
+        """Writable view of a slot."""
+        return self._views[slot]
+
+    def receive(self, udp_socket: socket.socket, slot: int) -> tuple:
+        """Receive one datagram into a slot.
+
+        Returns:
+            Tuple: View of the received bytes and the sender address.
+        """
+        view = self._views[slot]
+        nbytes, address = udp_socket.recvfrom_into(view)
+        return view[:nbytes], address
+
+
+def create_udp_socket(
+    address: str = F1_UDP_SERVER_ADDRESS, port: int = F1_UDP_SERVER_PORT
+) -> socket.socket:
+    """Create a UDP socket bound to the F1 telemetry address.
+
+    Args:
+        address (str): Address to bind to.
+        port (int): Port to bind to.
+
+    Returns:
+        socket.socket: Bound UDP socket.
+    """
+    f1_udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    f1_udp_socket.bind((address, port))
+    return f1_udp_socket
+
+
+def parse_packet(
+    message, columnar: bool = False, packet_filter: PacketFilter = None
+) -> dict:
+    """Parse a raw telemetry message.
+
+    The parser is picked from the packet format and packet id bytes, so
+    the header is only unpacked once by the packet parser itself. Packets
+    of unsupported game versions and packets with the wrong length are
+    rejected, see ``PARSER_REGISTRY``. Parsed dicts don't reference
+    ``message``, but columnar numpy arrays are views into it.
+
+    Args:
+        message (bytes): Raw UDP datagram or a memoryview of it.
+        columnar (bool): Decode the 22-car packets as one array per field.
+        packet_filter (PacketFilter): Packet types and cars to keep. Cars
+            that are not kept are None in the car array. Columnar decoding
+            always returns all cars.
+
+    Returns:
+        dict: Parsed packet or None if the packet format or type is not
+        supported, the packet is truncated or filtered out.
+    """
+    return PARSER_REGISTRY.parse(message, columnar, packet_filter)
+
+
+def parse_ports(value: str) -> list:
+    """Parse a comma separated list of ports."""
+    return [int(port) for port in str(value).split(",") if port.strip()]
+
+
+def format_source(address: tuple) -> str:
+    """Format a sender address as "host:port"."""
+    return f"{address[0]}:{address[1]}"
+
+
+def get_udp_messages(
+    columnar: bool = False, packet_filter: PacketFilter = None, with_source: bool = False
+) -> dict:
     """Get latest telemetry message from udp socket and send to Influxdb.
 
+    Args:
+        columnar (bool): Decode the 22-car packets as one array per field.
+        packet_filter (PacketFilter): Packet types and cars to keep.
+        with_source (bool): Yield tuples of the packet and its sender
+            address as "host:port".
+
     Returns:
         Tuple: Telemetry message class and message type.
     """
-    server_address = (F1_UDP_SERVER_ADDRESS, F1_UDP_SERVER_PORT)
-    f1_udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    f1_udp_socket.bind(server_address)
+    f1_udp_socket = create_udp_socket()
+    buffer_pool = BufferPool(1)
+    slot = buffer_pool.acquire()
 
     while True:
-        message, _ = f1_udp_socket.recvfrom(2048)
-        packet_header = parse_packet_header(message)
-
-        packet_ids = {
-            0: parse_packet_motion_data,
-            1: parse_packet_session_data,
-            2: parse_packet_lap_data,
-            4: parse_packet_participants_data,
-            5: parse_packet_car_setup_data,
-            6: parse_packet_car_telemetry_data,
-            7: parse_packet_car_status_data,
-            8: parse_packet_final_classification_data,
-            10: parse_packet_car_damage_data,
-            12: parse_packet_tyre_sets_data
-        }
-        parser = packet_ids.get(packet_header["m_packetId"])
-        if parser is not None:
-            packet_data = parser(message)
+        message, address = buffer_pool.receive(f1_udp_socket, slot)
+        if not PARSER_REGISTRY.has_header(message):
+            continue
+        if packet_filter is not None and not packet_filter.accepts(message):
+            continue
+        if columnar:
+            message = bytes(message)
+        packet_data = parse_packet(message, columnar, packet_filter)
+        if packet_data is None:
+            continue
+        if with_source:
+            yield packet_data, format_source(address)
+        else:
             yield packet_data
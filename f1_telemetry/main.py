@@ -1,6 +1,175 @@
 """F1 telemetry ingest app."""
-from f1_telemetry.data.mongodb_ingest import run_f1_telemetry_ingest
+import argparse
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="F1 telemetry ingest app.")
+    commands = parser.add_subparsers(dest="command")
+    ingest_parser = commands.add_parser(
+        "ingest", help="Ingest F1 telemetry to MongoDB (default)."
+    )
+    ingest_parser.add_argument(
+        "--asyncio", action="store_true",
+        help="Use the asyncio ingest with Motor instead of the threaded pipeline.",
+    )
+    ingest_parser.add_argument(
+        "--ports", default=None,
+        help="Comma separated UDP ports for the asyncio ingest.",
+    )
+    ingest_parser.add_argument(
+        "--sink", choices=("mongodb", "file"), default=None,
+        help="Write to MongoDB or to local segment files, threaded ingest only.",
+    )
+
+    capture_parser = commands.add_parser(
+        "capture", help="Append raw UDP datagrams to a capture file."
+    )
+    capture_parser.add_argument("path")
+
+    replay_parser = commands.add_parser(
+        "replay", help="Send the datagrams of a capture file to a UDP port."
+    )
+    replay_parser.add_argument("path")
+    replay_parser.add_argument("--address", default=None)
+    replay_parser.add_argument("--port", type=int, default=None)
+    replay_parser.add_argument(
+        "--speed", type=float, default=1.0,
+        help="Replay speed relative to the capture, 0 for max rate.",
+    )
+    replay_parser.add_argument(
+        "--pipeline", action="store_true",
+        help="Replay into an in-process ingest pipeline and report what it kept up with.",
+    )
+
+    import_parser = commands.add_parser(
+        "import", help="Bulk import a capture file into MongoDB without UDP."
+    )
+    import_parser.add_argument("path")
+    import_parser.add_argument(
+        "--processes", type=int, default=None, help="Worker processes."
+    )
+
+    load_parser = commands.add_parser(
+        "load", help="Load the segment files of the file sink into MongoDB."
+    )
+    load_parser.add_argument("directory", nargs="?", default=None)
+
+    supervise_parser = commands.add_parser(
+        "supervise", help="Ingest several rigs with one worker process per shard."
+    )
+    supervise_parser.add_argument(
+        "--ports", default=None, help="Comma separated UDP ports."
+    )
+    supervise_parser.add_argument(
+        "--workers", type=int, default=None, help="Worker processes."
+    )
+    supervise_parser.add_argument(
+        "--shard-by", choices=("source", "session"), default=None,
+        help="Shard by sender address or session UID.",
+    )
+
+    export_parser = commands.add_parser(
+        "export", help="Export a capture or a stored session to Parquet or Arrow files."
+    )
+    export_source = export_parser.add_mutually_exclusive_group(required=True)
+    export_source.add_argument("--capture", default=None, help="Capture file.")
+    export_source.add_argument(
+        "--session", type=int, default=None, help="Session UID stored in MongoDB."
+    )
+    export_parser.add_argument("--output", required=True, help="Output directory.")
+    export_parser.add_argument("--format", choices=("parquet", "arrow"), default=None)
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        if args.ports is not None and not args.asyncio:
+            ingest_parser.error("--ports requires --asyncio.")
+        if args.sink is not None and args.asyncio:
+            ingest_parser.error("--sink is not supported with --asyncio.")
+
+    if args.command == "capture":
+        from f1_telemetry.data.capture import capture
+
+        print(f"Capturing F1 telemetry to {args.path}.")
+        captured = capture(args.path)
+        print(f"Captured {captured} packets.")
+    elif args.command == "replay":
+        from f1_telemetry.data.capture import replay, replay_into_pipeline
+
+        if args.pipeline:
+            result = replay_into_pipeline(args.path, speed=args.speed)
+        else:
+            target = {}
+            if args.address is not None:
+                target["address"] = args.address
+            if args.port is not None:
+                target["port"] = args.port
+            result = replay(args.path, speed=args.speed, **target)
+        print(result)
+    elif args.command == "import":
+        from f1_telemetry.data.bulk_import import import_capture
+
+        options = {}
+        if args.processes is not None:
+            options["processes"] = args.processes
+        result = import_capture(args.path, **options)
+        print(
+            f"Imported {result['packets']} packets, stored {result['stored']} "
+            f"documents in {result['seconds']:.1f} s "
+            f"({result['packets_per_second']:.0f} packets/s)."
+        )
+    elif args.command == "export":
+        from f1_telemetry.data.export import export_capture, export_mongodb
+
+        options = {}
+        if args.format is not None:
+            options["file_format"] = args.format
+        if args.capture is not None:
+            result = export_capture(args.capture, args.output, **options)
+        else:
+            result = export_mongodb(args.session, args.output, **options)
+        print(
+            f"Exported {result['packets']} packets as {result['rows']} rows "
+            f"to {result['files']} files in {result['seconds']:.1f} s."
+        )
+    elif args.command == "load":
+        from f1_telemetry.data.file_sink import F1_SINK_DIR, load_segments
+
+        result = load_segments(args.directory or F1_SINK_DIR)
+        print(
+            f"Loaded {result['segments']} segments, stored {result['stored']} "
+            f"documents, {result['failed'] + result['duplicates']} already "
+            f"stored, in "
+            f"{result['seconds']:.1f} s."
+        )
+    elif args.command == "supervise":
+        from f1_telemetry.data.supervisor import run_supervised_ingest
+        from f1_telemetry.data.udp_stream import F1_UDP_SERVER_PORTS, parse_ports
+
+        options = {}
+        if args.workers is not None:
+            options["workers"] = args.workers
+        if args.shard_by is not None:
+            options["shard_by"] = args.shard_by
+        ports = parse_ports(args.ports or F1_UDP_SERVER_PORTS)
+        print(f"Ingesting F1 telemetry from ports {ports} to MongoDB.")
+        run_supervised_ingest(ports, **options)
+    elif getattr(args, "asyncio", False):
+        from f1_telemetry.data.async_ingest import run_async_f1_telemetry_ingest
+        from f1_telemetry.data.udp_stream import parse_ports
+
+        ports = parse_ports(args.ports) if args.ports else None
+        print(f"Ingesting F1 telemetry to MongoDB with asyncio.")
+        run_async_f1_telemetry_ingest(ports)
+    else:
+        from f1_telemetry.data.mongodb_ingest import F1_SINK, run_f1_telemetry_ingest
+
+        sink = getattr(args, "sink", None) or F1_SINK
+        if sink == "file":
+            print(f"Ingesting F1 telemetry to local segment files.")
+        else:
+            print(f"Ingesting F1 telemetry to MongoDB.")
+        run_f1_telemetry_ingest(sink)
+
 
 if __name__ == "__main__":
-    print(f"Ingesting F1 telemetry to MongoDB.")
-    run_f1_telemetry_ingest()
+    main()